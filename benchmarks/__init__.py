@@ -0,0 +1 @@
+"""Benchmarks of uptainer, running the loader against a local stub registry and local git remotes."""
@@ -0,0 +1,139 @@
+"""Console script of the benchmarks, run with 'python -m benchmarks'."""
+
+import json
+import logging
+import platform
+import resource
+import structlog
+import typer
+from datetime import UTC, datetime
+from os import cpu_count
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Annotated, Any
+from uptainer.config import RunConfig
+from benchmarks.registry import StubRegistry
+from benchmarks.scenarios import QUICK_SCENARIOS, SCENARIOS, Benchmark
+from benchmarks.startup import run_startup
+
+app = typer.Typer()
+
+
+def compare(results: list[dict[str, Any]], baseline: list[dict[str, Any]], threshold: float) -> list[str]:
+    """Compare the median times, the measures ending with '_seconds', with the ones of a previous run.
+
+    Args:
+        results (list): Results of this run.
+        baseline (list): Results of the previous run, the points are matched by scenario and params.
+        threshold (float): Max slowdown allowed, like 0.2 for 20%.
+
+    Returns:
+        A line for each point slower than the baseline more than the threshold.
+    """
+    previous = {(item["scenario"], json.dumps(item["params"], sort_keys=True)): item for item in baseline}
+    regressions = []
+    for item in results:
+        old = previous.get((item["scenario"], json.dumps(item["params"], sort_keys=True)))
+        if old is None:
+            continue
+        for measure in sorted(key for key in item if key.endswith("seconds") and key in old and key != "stage_seconds"):
+            ratio = item[measure]["median"] / max(old[measure]["median"], 1e-9)
+            if ratio > 1 + threshold:
+                regressions.append(f"{item['scenario']} {item['params']} {measure}: {ratio:.2f}x slower")
+    return regressions
+
+
+@app.command()
+def main(  # noqa D417
+    output: Annotated[Path, typer.Option(help="JSON file where write the results")] = "benchmark-results.json",
+    scenario: Annotated[list[str] | None, typer.Option(help="Scenario to run, repeatable, default all")] = None,
+    quick: Annotated[bool, typer.Option(help="Run smaller sizes, for a quick check")] = False,
+    repeats: Annotated[int, typer.Option(help="Runs of each point, the median is compared", min=1)] = 3,
+    workers: Annotated[int, typer.Option(help="Number of repos to check concurrently", min=1)] = 4,
+    baseline: Annotated[Path | None, typer.Option(help="Results of a previous run to compare with")] = None,
+    threshold: Annotated[float, typer.Option(help="Slowdown over the baseline reported as regression", min=0)] = 0.2,
+    debug: Annotated[bool, typer.Option(help="Enable the uptainer logs")] = False,
+) -> None:
+    """Run the benchmarks against a local stub registry and local git remotes, writing the results as JSON.
+
+    Args:
+        output (Path): JSON file where write the results.
+        scenario (list): Names of the scenarios to run, all of them when not given.
+        quick (bool): Run the smaller sizes of the scenarios.
+        repeats (int): Number of runs of each point.
+        workers (int): Number of repos checked concurrently by the loader.
+        baseline (Path): JSON file of a previous run, the points slower than the threshold are reported.
+        threshold (float): Slowdown over the baseline reported as regression, like 0.2 for 20%.
+        debug (bool): Enable the logs of uptainer, at warning level otherwise.
+
+    Returns:
+        None
+    """
+    structlog.configure(
+        wrapper_class=structlog.make_filtering_bound_logger(logging.DEBUG if debug else logging.WARNING)
+    )
+    log = structlog.get_logger()
+    scenarios = QUICK_SCENARIOS if quick else SCENARIOS
+    names = scenario or list(scenarios)
+    unknown = [name for name in names if name not in scenarios]
+    if unknown:
+        typer.echo(f"Unknown scenarios: {', '.join(unknown)}, available: {', '.join(scenarios)}", err=True)
+        raise typer.Exit(code=2)
+    run_config = RunConfig()
+    run_config.workers = workers
+    registry = StubRegistry()
+    registry.start()
+    results = []
+    try:
+        with TemporaryDirectory(prefix="uptainer-benchmark-") as tmpdir:
+            benchmark = Benchmark(log=log, registry=registry, workdir=Path(tmpdir) / "work", run_config=run_config)
+            benchmark.repeats = repeats
+            for name in names:
+                for params in scenarios[name]:
+                    if name == "startup":
+                        result = {"scenario": name, **run_startup(params=params, repeats=repeats)}
+                        results.append(result)
+                        typer.echo(f"{name} {params}: {result['seconds']['median']:.3f}s")
+                        continue
+                    result = {"scenario": name, **benchmark.run_point(params=params)}
+                    results.append(result)
+                    typer.echo(
+                        f"{name} {params}: update {result['update_seconds']['median']:.3f}s, "
+                        f"noop {result['noop_seconds']['median']:.3f}s, "
+                        f"peak {result['peak_memory_bytes'] / 1024 / 1024:.1f} MB, requests {result['requests']}"
+                    )
+    finally:
+        registry.shutdown()
+    output.write_text(
+        json.dumps(
+            {
+                "created": datetime.now(tz=UTC).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": cpu_count(),
+                "quick": quick,
+                "repeats": repeats,
+                "workers": workers,
+                "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                "results": results,
+            },
+            indent=2,
+        )
+        + "\n"
+    )
+    typer.echo(f"Results written to '{output}'")
+    if not all(result["success"] for result in results):
+        typer.echo("Some runs failed, run again with --debug for the details.", err=True)
+        raise typer.Exit(code=1)
+    if baseline:
+        regressions = compare(
+            results=results, baseline=json.loads(baseline.read_text())["results"], threshold=threshold
+        )
+        for line in regressions:
+            typer.echo(f"Regression: {line}", err=True)
+        if regressions:
+            raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
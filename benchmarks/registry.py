@@ -0,0 +1,254 @@
+"""Local stub of the DockerHub and GitHub packages APIs, serving paginated tag lists of any size."""
+
+from datetime import UTC, datetime, timedelta
+from hashlib import sha1
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps
+from threading import Lock, Thread
+from typing import Any
+from urllib.parse import parse_qs, urlencode, urlparse
+
+BASE_TIME = datetime(2024, 1, 1, tzinfo=UTC)
+DOCKERHUB_PATH_PARTS = 6
+GITHUB_VERSIONS_PATH_PARTS = 6
+GITHUB_PACKAGES_PATH_PARTS = 3
+
+
+def get_tags(count: int, release_every: int = 1) -> list[tuple[str, datetime]]:
+    """Return the tags of an image, newest first, one hour apart.
+
+    Args:
+        count (int): Number of tags.
+        release_every (int): One tag every this number is a release like 'v1.0.12', the others are like 'sha-000001'.
+
+    Returns:
+        A list of (<tag name>, <last update>), the releases are in semver order.
+    """
+    releases = len(range(0, count, release_every))
+    tags = []
+    for idx in range(count):
+        if idx % release_every == 0:
+            number = releases - 1 - idx // release_every
+            name = f"v1.{number // 1000}.{number % 1000}"
+        else:
+            name = f"sha-{idx:06x}"
+        tags.append((name, BASE_TIME - timedelta(hours=idx)))
+    return tags
+
+
+def get_date(date: datetime) -> str:
+    """Return a date in the format of the APIs.
+
+    Args:
+        date (datetime): Date in UTC.
+
+    Returns:
+        A string like '2024-01-01T00:00:00Z'.
+    """
+    return date.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class RegistryHandler(BaseHTTPRequestHandler):
+    server: "StubRegistry"
+    # Keep the connections alive like the real APIs, so the sessions of the providers are reused.
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        """Reply with a page of tags, or 404 when the image is unknown.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.server.count_request()
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if len(parts) == DOCKERHUB_PATH_PARTS and parts[0] == "v2" and parts[5] == "tags":
+            self.reply_dockerhub(parent=parts[2], project=parts[4], query=query)
+        elif len(parts) == GITHUB_VERSIONS_PATH_PARTS and parts[0] == "users" and parts[5] == "versions":
+            self.reply_github(parent=parts[1], project=parts[4], query=query)
+        elif len(parts) == GITHUB_PACKAGES_PATH_PARTS and parts[0] == "users" and parts[2] == "packages":
+            packages = [
+                {"name": project, "updated_at": get_date(tags[0][1]) if tags else get_date(BASE_TIME)}
+                for (provider, parent, project), tags in self.server.images.items()
+                if provider == "github" and parent == parts[1]
+            ]
+            self.reply(content=packages)
+        else:
+            self.reply_status(status=404)
+
+    def reply_dockerhub(self, parent: str, project: str, query: dict[str, str]) -> None:
+        """Reply with a page of the DockerHub tags API.
+
+        Args:
+            parent (str): Namespace of the image.
+            project (str): Name of the image.
+            query (dict): Query parameters, like 'page_size', 'page' and 'name'.
+
+        Returns:
+            None
+        """
+        tags = self.server.images.get(("dockerhub", parent, project))
+        if tags is None:
+            self.reply_status(status=404)
+            return
+        tags = [tag for tag in tags if query.get("name", "") in tag[0]]
+        page_size, page = int(query.get("page_size", "10")), int(query.get("page", "1"))
+        results = tags[(page - 1) * page_size : page * page_size]
+        next_url = None
+        if page * page_size < len(tags):
+            next_url = f"{self.server.url}{urlparse(self.path).path}?{urlencode({**query, 'page': page + 1})}"
+        self.reply(
+            content={
+                "count": len(tags),
+                "next": next_url,
+                "results": [
+                    {"name": name, "last_updated": date.strftime("%Y-%m-%dT%H:%M:%S.000000Z")} for name, date in results
+                ],
+            }
+        )
+
+    def reply_github(self, parent: str, project: str, query: dict[str, str]) -> None:
+        """Reply with a page of the GitHub package versions API, with the Link header.
+
+        Args:
+            parent (str): User or org of the package.
+            project (str): Name of the package.
+            query (dict): Query parameters, like 'per_page' and 'page'.
+
+        Returns:
+            None
+        """
+        tags = self.server.images.get(("github", parent, project))
+        if tags is None:
+            self.reply_status(status=404)
+            return
+        page_size, page = int(query.get("per_page", "30")), int(query.get("page", "1"))
+        last_page = max((len(tags) + page_size - 1) // page_size, 1)
+        base_url = f"{self.server.url}{urlparse(self.path).path}"
+        links = [f'<{base_url}?{urlencode({**query, "page": last_page})}>; rel="last"']
+        if page < last_page:
+            links.insert(0, f'<{base_url}?{urlencode({**query, "page": page + 1})}>; rel="next"')
+        versions = [
+            {
+                "id": (page - 1) * page_size + idx,
+                "updated_at": get_date(date),
+                "metadata": {"package_type": "container", "container": {"tags": [name]}},
+            }
+            for idx, (name, date) in enumerate(tags[(page - 1) * page_size : page * page_size])
+        ]
+        self.reply(content=versions, headers={"Link": ", ".join(links)})
+
+    def reply(self, content: Any, headers: dict[str, str] | None = None) -> None:
+        """Send a JSON response with its ETag, or 304 when it matches the 'If-None-Match' header.
+
+        Args:
+            content (Any): Body of the response.
+            headers (dict): Other headers of the response.
+
+        Returns:
+            None
+        """
+        body = dumps(content).encode()
+        etag = f'"{sha1(body, usedforsecurity=False).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.reply_status(status=304, headers={"ETag": etag})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def reply_status(self, status: int, headers: dict[str, str] | None = None) -> None:
+        """Send a response without body.
+
+        Args:
+            status (int): Status code of the response.
+            headers (dict): Headers of the response.
+
+        Returns:
+            None
+        """
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Don't log the requests.
+
+        Args:
+            format (str): Format string of the message.
+            *args (Any): Values of the format string.
+
+        Returns:
+            None
+        """
+
+
+class StubRegistry(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        """Stub of the DockerHub and GitHub APIs, used with 'DOCKERHUB_API_ENDPOINT' and 'GITHUB_API_ENDPOINT'.
+
+        Args:
+            host (str): Address to listen on.
+            port (int): Port to listen on, 0 for a random one.
+
+        Returns:
+            None
+        """
+        super().__init__((host, port), RegistryHandler)
+        self.url = f"http://{self.server_address[0]}:{self.server_address[1]}"
+        self.images: dict[tuple[str, str, str], list[tuple[str, datetime]]] = {}
+        self.requests = 0
+        self.lock = Lock()
+
+    def add_image(self, provider: str, parent: str, project: str, tags: int, release_every: int = 1) -> None:
+        """Add an image, replacing it when it already exists.
+
+        Args:
+            provider (str): "dockerhub" or "github".
+            parent (str): Namespace, user or org of the image.
+            project (str): Name of the image.
+            tags (int): Number of tags.
+            release_every (int): One tag every this number is a release, see get_tags.
+
+        Returns:
+            None
+        """
+        self.images[(provider, parent, project)] = get_tags(count=tags, release_every=release_every)
+
+    def count_request(self) -> None:
+        """Increment the number of requests served.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.requests += 1
+
+    def start(self) -> Thread:
+        """Serve the requests in a background thread, until shutdown is called.
+
+        Args:
+            None
+
+        Returns:
+            The thread of the server.
+        """
+        thread = Thread(target=self.serve_forever, name="benchmark-registry", daemon=True)
+        thread.start()
+        return thread
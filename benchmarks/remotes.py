@@ -0,0 +1,48 @@
+"""Local bare git repos, used as 'git_ssh_url' by the benchmarks."""
+
+from pathlib import Path
+from random import Random
+import git
+
+ACTOR = git.Actor("benchmark", "benchmark@example.com")
+
+
+def create_remote(path: Path, values_files: list[str], files: int = 10, file_size: int = 1024, commits: int = 1) -> str:
+    """Create a bare repo with the values files, some data files and a history of commits on the main branch.
+
+    The content is generated with a fixed seed, so the same arguments always create the same repo.
+
+    Args:
+        path (Path): Path of the bare repo, a working copy is created next to it with the '.seed' suffix.
+        values_files (list): RELATIVE paths of the values files, created with 'image.tag: v1.0.0'.
+        files (int): Number of data files.
+        file_size (int): Size of each data file, in bytes.
+        commits (int): Number of commits, each one after the first changes a data file.
+
+    Returns:
+        The url of the bare repo, usable as 'git_ssh_url'.
+    """
+    random = Random(f"{path.name}-{files}-{file_size}-{commits}")
+    seed_path = path.with_suffix(".seed")
+    seed = git.Repo.init(seed_path, initial_branch="main")
+    paths = []
+    for fpath in values_files:
+        (seed_path / fpath).parent.mkdir(parents=True, exist_ok=True)
+        (seed_path / fpath).write_text("image:\n  tag: v1.0.0\n")
+        paths.append(fpath)
+    (seed_path / "data").mkdir(exist_ok=True)
+    for idx in range(files):
+        (seed_path / "data" / f"file{idx}.txt").write_text(random.randbytes(file_size // 2).hex())
+        paths.append(f"data/file{idx}.txt")
+    seed.index.add(paths)
+    seed.index.commit("init", author=ACTOR, committer=ACTOR)
+    for idx in range(1, commits):
+        fpath = f"data/file{idx % max(files, 1)}.txt"
+        with (seed_path / fpath).open("a") as fopen:
+            fopen.write(f"\n{random.randbytes(32).hex()}")
+        seed.index.add([fpath])
+        seed.index.commit(f"change {idx}", author=ACTOR, committer=ACTOR)
+    git.Repo.init(path, bare=True, initial_branch="main")
+    seed.create_remote("origin", str(path)).push("main")
+    seed.close()
+    return f"file://{path}"
@@ -0,0 +1,228 @@
+"""Scenarios of the benchmarks, measuring Loader.run as the repos, the tags and the git repos grow."""
+
+from os import environ
+from pathlib import Path
+from shutil import copytree, rmtree
+from statistics import median
+from time import perf_counter
+from typing import Any
+from structlog._config import BoundLoggerLazyProxy
+from uptainer.config import RunConfig
+from uptainer.loader import Loader
+from uptainer.metrics import METRICS
+from benchmarks.registry import StubRegistry
+from benchmarks.remotes import create_remote
+import tracemalloc
+
+REPOS_PER_REMOTE = 5
+DEFAULTS = {
+    "entries": 4,
+    "tags": 100,
+    "release_every": 1,
+    "selection": "latest",
+    "files": 10,
+    "file_size": 1024,
+    "commits": 10,
+}
+SCENARIOS: dict[str, list[dict[str, Any]]] = {
+    "entries": [{"entries": entries} for entries in (1, 10, 50)],
+    "tags": [{"tags": tags, "release_every": 10, "selection": "highest"} for tags in (100, 500, 2000)],
+    "repo_size": [
+        {"files": files, "file_size": file_size, "commits": commits}
+        for files, file_size, commits in ((10, 1024, 10), (200, 16384, 200), (1000, 65536, 1000))
+    ],
+    "startup": [{"command": "import"}, {"command": "help"}],
+}
+QUICK_SCENARIOS: dict[str, list[dict[str, Any]]] = {
+    "entries": [{"entries": entries} for entries in (1, 5)],
+    "tags": [{"tags": tags, "release_every": 10, "selection": "highest"} for tags in (50, 300)],
+    "repo_size": [{"files": files, "commits": commits} for files, commits in ((5, 5), (50, 50))],
+    "startup": [{"command": "import"}, {"command": "help"}],
+}
+
+
+def set_endpoints(registry: StubRegistry) -> None:
+    """Point the DockerHub and GitHub providers to the stub registry.
+
+    Args:
+        registry (StubRegistry): Stub registry started.
+
+    Returns:
+        None
+    """
+    environ["DOCKERHUB_API_ENDPOINT"] = registry.url
+    environ["GITHUB_API_ENDPOINT"] = registry.url
+    environ.setdefault("DOCKERHUB_API_TOKEN", "benchmark")
+    environ.setdefault("GITHUB_API_TOKEN", "benchmark")
+
+
+def get_stages() -> dict[str, float]:
+    """Return the seconds spent in each stage since the start, summing the labels like the provider.
+
+    Args:
+        None
+
+    Returns:
+        A dict like {"<stage>": <seconds>}.
+    """
+    stages: dict[str, float] = {}
+    with METRICS.lock:
+        timings = dict(METRICS.timings)
+    for (name, labels), (_, total) in timings.items():
+        if name == "stage_seconds":
+            stage = dict(labels)["stage"]
+            stages[stage] = stages.get(stage, 0.0) + total
+    return stages
+
+
+def get_summary(values: list[float]) -> dict[str, float]:
+    """Return the min, median and max of the measures.
+
+    Args:
+        values (list): Measures.
+
+    Returns:
+        A dict like {"min": <value>, "median": <value>, "max": <value>}.
+    """
+    return {"min": min(values), "median": median(values), "max": max(values)}
+
+
+def prepare(registry: StubRegistry, workdir: Path, params: dict[str, Any]) -> list[tuple[str, str, str]]:
+    """Add the images to the stub registry and create the template git remotes.
+
+    Half of the images are on DockerHub and half on ghcr, each remote has the values files of REPOS_PER_REMOTE repos.
+
+    Args:
+        registry (StubRegistry): Stub registry used by the providers.
+        workdir (Path): Directory where create the git remotes.
+        params (dict): Parameters of the scenario, merged with DEFAULTS.
+
+    Returns:
+        A list of (<repo name>, <image repository>, <remote name>), one for each entry.
+    """
+    entries = []
+    for idx in range(params["entries"]):
+        if idx % 2 == 0:
+            registry.add_image(
+                "dockerhub", "bench", f"app{idx}", tags=params["tags"], release_every=params["release_every"]
+            )
+            image = f"bench/app{idx}"
+        else:
+            registry.add_image(
+                "github", "bench", f"app{idx}", tags=params["tags"], release_every=params["release_every"]
+            )
+            image = f"ghcr.io/bench/app{idx}"
+        entries.append((f"App{idx}", image, f"remote{idx // REPOS_PER_REMOTE}.git"))
+    for remote in sorted({remote for _, _, remote in entries}):
+        create_remote(
+            path=workdir / "templates" / remote,
+            values_files=[
+                f"charts/{name.lower()}/values.yaml" for name, _, entry_remote in entries if entry_remote == remote
+            ],
+            files=params["files"],
+            file_size=params["file_size"],
+            commits=params["commits"],
+        )
+    return entries
+
+
+def write_config(entries: list[tuple[str, str, str]], rundir: Path, params: dict[str, Any]) -> Path:
+    """Copy the template remotes into the directory of a run and write its config file.
+
+    Args:
+        entries (list): Entries returned by prepare.
+        rundir (Path): Directory of the run.
+        params (dict): Parameters of the scenario, merged with DEFAULTS.
+
+    Returns:
+        The path of the config file.
+    """
+    copytree(
+        rundir.parent / "templates",
+        rundir / "remotes",
+        ignore=lambda _, names: [n for n in names if n.endswith(".seed")],
+    )
+    config_file = rundir / "config.yaml"
+    config_file.write_text(
+        "repos:\n"
+        + "".join(
+            f"  - name: {name}\n"
+            f"    image_repository: {image}\n"
+            f"    git_ssh_url: file://{rundir / 'remotes' / remote}\n"
+            f"    git_values_filename: charts/{name.lower()}/values.yaml\n"
+            "    values_key: image.tag\n"
+            "    version_match: v1.[0-9]+.[0-9]+\n"
+            f"    version_selection: {params['selection']}\n"
+            for name, image, remote in entries
+        )
+    )
+    return config_file
+
+
+class Benchmark:
+    def __init__(self, log: BoundLoggerLazyProxy, registry: StubRegistry, workdir: Path, run_config: RunConfig) -> None:
+        """Runner of the scenarios, measuring the loader against the stub registry and the local git remotes.
+
+        Args:
+            log (BoundLoggerLazyProxy): Log class to inject into the vars. Class: structlog
+            registry (StubRegistry): Stub registry started, the providers are pointed to it.
+            workdir (Path): Directory for the remotes and the config files, removed after each point.
+            run_config (RunConfig): Options of the runs, like the number of workers.
+
+        Returns:
+            None
+        """
+        self.log = log
+        self.registry = registry
+        self.workdir = workdir
+        self.run_config = run_config
+        self.repeats = 3
+        set_endpoints(registry=registry)
+
+    def run_point(self, params: dict[str, Any]) -> dict[str, Any]:
+        """Measure a point of a scenario.
+
+        Each repeat runs the loader on fresh copies of the remotes, so all the repos are updated and pushed, then
+        again on the same remotes, where nothing changes. A last run measures the peak of the memory with
+        tracemalloc, apart from the others since it slows them down.
+
+        Args:
+            params (dict): Parameters of the point, merged with DEFAULTS.
+
+        Returns:
+            A dict with the params and the measures.
+        """
+        params = {**DEFAULTS, **params}
+        rmtree(self.workdir, ignore_errors=True)
+        entries = prepare(registry=self.registry, workdir=self.workdir, params=params)
+        update_seconds, noop_seconds, requests = [], [], []
+        stages: dict[str, list[float]] = {}
+        success = True
+        for repeat in range(self.repeats):
+            config_file = write_config(entries=entries, rundir=self.workdir / f"run{repeat}", params=params)
+            stages_before, requests_before = get_stages(), self.registry.requests
+            start = perf_counter()
+            summary = Loader(log=self.log, config_file=config_file, run_config=self.run_config).run()
+            update_seconds.append(perf_counter() - start)
+            requests.append(self.registry.requests - requests_before)
+            for stage, seconds in get_stages().items():
+                stages.setdefault(stage, []).append(seconds - stages_before.get(stage, 0.0))
+            start = perf_counter()
+            noop_summary = Loader(log=self.log, config_file=config_file, run_config=self.run_config).run()
+            noop_seconds.append(perf_counter() - start)
+            success = success and not summary["error"] and not noop_summary["error"]
+        config_file = write_config(entries=entries, rundir=self.workdir / "memory", params=params)
+        tracemalloc.start()
+        summary = Loader(log=self.log, config_file=config_file, run_config=self.run_config).run()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        rmtree(self.workdir, ignore_errors=True)
+        return {
+            "params": params,
+            "success": success and not summary["error"],
+            "update_seconds": get_summary(update_seconds),
+            "noop_seconds": get_summary(noop_seconds),
+            "stage_seconds": {stage: round(median(values), 6) for stage, values in sorted(stages.items())},
+            "requests": median(requests),
+            "peak_memory_bytes": peak_memory,
+        }
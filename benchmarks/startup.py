@@ -0,0 +1,65 @@
+"""Startup scenario of the benchmarks, measuring the import time of the CLI in a fresh interpreter."""
+
+import json
+import re
+import subprocess
+import sys
+from time import perf_counter
+from typing import Any
+
+from benchmarks.scenarios import get_summary
+
+HEAVY_MODULES = ("box", "git", "requests", "yaml")
+IMPORTTIME_REGEX = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \| uptainer\.cli$", re.MULTILINE)
+COMMANDS = {
+    "import": ["-X", "importtime", "-c", "import uptainer.cli"],
+    "help": ["-m", "uptainer.cli", "--help"],
+}
+
+
+def get_loaded_modules(module: str) -> list[str]:
+    """Return the heavy dependencies loaded by the import of a module, in a fresh interpreter.
+
+    Args:
+        module (str): Module to import, like 'uptainer.cli'.
+
+    Returns:
+        The names of HEAVY_MODULES imported.
+    """
+    code = f"import json, sys, {module}; print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))"
+    return json.loads(subprocess.run([sys.executable, "-c", code], capture_output=True, check=True, text=True).stdout)
+
+
+def run_startup(params: dict[str, Any], repeats: int) -> dict[str, Any]:
+    """Measure a command of the CLI in a fresh interpreter, the wall time includes the interpreter startup.
+
+    Args:
+        params (dict): Parameters of the point, 'command' is "import" for 'import uptainer.cli' or "help" for
+            'uptainer --help'.
+        repeats (int): Number of runs.
+
+    Returns:
+        A dict with the params and the measures, 'import_seconds' is the import time of uptainer.cli given by
+        '-X importtime', only for "import".
+    """
+    seconds, import_seconds = [], []
+    success = True
+    for _ in range(repeats):
+        start = perf_counter()
+        process = subprocess.run(
+            [sys.executable, *COMMANDS[params["command"]]], capture_output=True, check=False, text=True
+        )
+        seconds.append(perf_counter() - start)
+        success = success and process.returncode == 0
+        match = IMPORTTIME_REGEX.search(process.stderr)
+        if match:
+            import_seconds.append(int(match.group(1)) / 1_000_000)
+    result = {
+        "params": params,
+        "success": success,
+        "seconds": get_summary(seconds),
+        "modules": {module: get_loaded_modules(module) for module in ("uptainer.cli", "uptainer.loader")},
+    }
+    if import_seconds:
+        result["import_seconds"] = get_summary(import_seconds)
+    return result
@@ -0,0 +1,375 @@
+from collections.abc import Callable, Generator, Iterator
+from datetime import datetime
+from functools import partial
+from json import dump, load
+from pathlib import Path
+from threading import Lock
+from time import time
+from typing import Any
+from structlog._config import BoundLoggerLazyProxy
+from uptainer.providers.baseprovider import BaseProvider
+from uptainer.typer import TyperImageList, TyperTagCacheEntry, TyperTagPage
+from uptainer.versions import VersionIndex
+
+
+class LazyTags:
+    def __init__(
+        self,
+        pages: Iterator[TyperTagPage] | None = None,
+        data: list[TyperImageList] | None = None,
+        fallback: list[TyperImageList] | None = None,
+        resume: Callable[[], Iterator[TyperTagPage]] | None = None,
+    ) -> None:
+        """Tags of an image, requested to the provider page by page only when the iteration needs them.
+
+        Many threads can iterate the same object: the pages already fetched are shared and each page is
+        requested only once, so a consumer that stops at the first match never pays the following pages.
+        When the known tags are only the newest ones, the pages requested after them skip the tags already known.
+
+        Args:
+            pages (Iterator): Generator of the pages returned by the provider, None when all the tags are known.
+            data (list): Tags already known.
+            fallback (list): Tags to use when the first page is not modified since the ETag sent.
+            resume (Callable): Return the pages following the fallback, None when the fallback has all the tags.
+
+        Returns:
+            None
+        """
+        self.pages = pages
+        self.items: list[TyperImageList] = list(data or [])
+        self.fallback = fallback
+        self.resume = resume
+        self.known = self.get_names(self.items) if pages is not None else set()
+        self.complete = pages is None
+        self.newest_first = True
+        self.error = False
+        self.etag: str | None = None
+        self.timestamp = time()
+        self.fetched_pages = 0
+        self.lock = Lock()
+        self.indexes: dict[str, VersionIndex] = {}
+        self.index_lock = Lock()
+
+    def fetch_next(self) -> None:
+        """Request the next page to the provider, it needs to be called holding the lock.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        page = next(self.pages, None) if self.pages else None
+        if page is None:
+            self.complete = True
+            self.close_pages()
+            return
+        self.fetched_pages += 1
+        if self.fetched_pages == 1 and self.etag is None:
+            self.etag = page["etag"]
+        if page["error"]:
+            self.error = True
+            self.complete = True
+            self.close_pages()
+        elif page["not_modified"] and self.fallback is not None:
+            self.items = list(self.fallback)
+            self.close_pages()
+            if self.resume is None:
+                self.complete = True
+            else:
+                # Nothing newer than the fallback, the older tags are requested only if the iteration needs them.
+                self.pages = self.resume()
+                self.known = self.get_names(self.items)
+        elif self.known:
+            self.items.extend(item for item in page["data"] if not self.get_names([item]) <= self.known)
+        else:
+            self.items.extend(page["data"])
+
+    def close_pages(self) -> None:
+        """Close the generator of the pages, so a provider request left in the middle releases its resources.
+
+        It needs to be called holding the lock, the tags already fetched are kept.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if isinstance(self.pages, Generator):
+            self.pages.close()
+        self.pages = None
+
+    def close(self) -> None:
+        """Stop requesting the pages of the tags, used when the tag list leaves the run.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.close_pages()
+
+    @staticmethod
+    def get_names(items: list[TyperImageList]) -> set[str]:
+        """Return the tag names of a list of tags.
+
+        Args:
+            items (list): TyperImageList objects.
+
+        Returns:
+            The set of the names.
+        """
+        return {name for item in items for name in ([item["name"]] if isinstance(item["name"], str) else item["name"])}
+
+    def __iter__(self) -> Iterator[TyperImageList]:
+        """Iterate over the tags, requesting the next page when the ones already fetched are consumed.
+
+        Args:
+            None
+
+        Returns:
+            A generator of TyperImageList objects.
+        """
+        index = 0
+        while True:
+            if index < len(self.items):
+                yield self.items[index]
+                index += 1
+                continue
+            with self.lock:
+                while index >= len(self.items) and not self.complete:
+                    self.fetch_next()
+                if index >= len(self.items):
+                    return
+
+    def get_index(self, pattern: str) -> VersionIndex:
+        """Return the sorted index of the tags that match a pattern, built only once for each pattern.
+
+        Building the index needs all the pages, so the ones not fetched yet are requested.
+
+        Args:
+            pattern (str): Regex that the tags needs to match, like the 'version_match' of the config.
+
+        Returns:
+            VersionIndex object.
+        """
+        with self.index_lock:
+            if pattern not in self.indexes:
+                self.indexes[pattern] = VersionIndex(tags=self, pattern=pattern)
+            return self.indexes[pattern]
+
+
+class TagCache:
+    def __init__(self, log: BoundLoggerLazyProxy, cache_file: Path | None = None, ttl: int = 3600) -> None:
+        """Cache of the tags returned by the providers, shared across all the repos of a run.
+
+        All the repos that use the same image share the same LazyTags object, so each page is requested
+        only once even when the repos run at the same time. When a cache file is given, the tag lists are
+        persisted on disk and reused for 'ttl' seconds, after that they are revalidated with the ETag of their
+        first page. The lists of the providers that return the newest tags first are persisted also when only
+        the first pages have been fetched, the following pages are requested only when a lookup needs them.
+
+        Args:
+            log (BoundLoggerLazyProxy): Log class to inject into the vars. Class: structlog
+            cache_file (Path): JSON file where persist the cache between runs, None to keep it only in memory.
+            ttl (int): Seconds after that a tag list loaded from the cache file needs to be revalidated.
+
+        Returns:
+            None
+        """
+        self.log = log
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.entries: dict[str, TyperTagCacheEntry] = {}
+        self.tags: dict[str, LazyTags] = {}
+        self.lock = Lock()
+        if self.cache_file:
+            self.load()
+
+    def load(self) -> None:
+        """Read the cache file, if exists, and fill the cache entries with it.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if not self.cache_file or not self.cache_file.is_file():
+            return
+        try:
+            with self.cache_file.open() as fopen:
+                content: dict[str, Any] = load(fopen)
+            for key, entry in content.items():
+                for item in entry["data"]:
+                    item["last_update"] = datetime.fromisoformat(item["last_update"])
+                self.entries[key] = TyperTagCacheEntry(
+                    etag=entry["etag"],
+                    timestamp=entry["timestamp"],
+                    data=entry["data"],
+                    complete=entry.get("complete", True),
+                )
+            self.log.debug(f"Loaded {len(self.entries)} tag lists from '{self.cache_file}'")
+        except (ValueError, KeyError, TypeError) as error:
+            self.log.warning(f"The tag cache file '{self.cache_file}' is not valid, ignoring it. Error: {error}")
+            self.entries = {}
+
+    def flush(self) -> None:
+        """Move the tag lists of the run into the cache entries, so the next run revalidates them.
+
+        The tags of the run are shared only until the flush, after that the entries are reused for 'ttl'
+        seconds like the ones loaded from the cache file. A list not fetched until the end is kept only when
+        its tags are the newest ones, so a not modified first page means that its tags are still the newest.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        with self.lock:
+            for key, tags in self.tags.items():
+                tags.close()
+                if tags.error or not (tags.complete or (tags.newest_first and tags.items)):
+                    continue
+                self.entries[key] = TyperTagCacheEntry(
+                    etag=tags.etag, timestamp=tags.timestamp, data=list(tags.items), complete=tags.complete
+                )
+            self.tags = {}
+
+    def save(self) -> None:
+        """Flush the tag lists of the run and write the cache entries into the cache file.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.flush()
+        if not self.cache_file:
+            return
+        with self.lock:
+            content = {
+                key: {
+                    "etag": entry["etag"],
+                    "timestamp": entry["timestamp"],
+                    "complete": entry["complete"],
+                    "data": [
+                        {"last_update": item["last_update"].isoformat(), "name": item["name"]} for item in entry["data"]
+                    ],
+                }
+                for key, entry in self.entries.items()
+            }
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmpfile = self.cache_file.with_suffix(f"{self.cache_file.suffix}.tmp")
+        with tmpfile.open("w") as fopen:
+            dump(content, fopen)
+        tmpfile.replace(self.cache_file)
+
+    def get_key(self, provider: BaseProvider | str, parent: str, project: str, name_filter: str = "") -> str:
+        """Return the key of the tags of an image in the cache.
+
+        Args:
+            provider (BaseProvider): Provider object, or its name.
+            parent (str): Namespace, User or Orgs of the image.
+            project (str): Project Name
+            name_filter (str): Text that the tag names contain, applied by the provider when supported.
+
+        Returns:
+            The key, like '<provider name>/<parent>/<project>?name=<name filter>'.
+        """
+        name = provider.get_cache_name() if isinstance(provider, BaseProvider) else provider
+        key = f"{name}/{parent}/{project}"
+        if name_filter:
+            key += f"?name={name_filter}"
+        return key
+
+    def is_expired(self, key: str) -> bool:
+        """Check if a tag list of the cache file needs to be revalidated with the provider.
+
+        Args:
+            key (str): Key returned by get_key.
+
+        Returns:
+            True when the tag list is in the cache file and its ttl is expired.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            return key not in self.tags and entry is not None and time() - entry["timestamp"] >= self.ttl
+
+    def revalidate(self, key: str, updated: float) -> bool:
+        """Renew the ttl of a tag list of the cache file, when the image has not been updated since it was fetched.
+
+        Args:
+            key (str): Key returned by get_key.
+            updated (float): Epoch of the last update of the image, as reported by the provider.
+
+        Returns:
+            True when the tag list has been renewed.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or key in self.tags or updated > entry["timestamp"]:
+                return False
+            self.log.debug(f"Tags of '{key}' not updated since {entry['timestamp']}, renewing them")
+            entry["timestamp"] = time()
+            return True
+
+    def expire(self, parent: str, project: str) -> None:
+        """Make the tag lists of an image expired, so the next lookup revalidates them with the provider.
+
+        The timestamp is moved back only by the ttl, so the image can still be renewed by revalidate when it has
+        not been updated since then.
+
+        Args:
+            parent (str): Namespace, User or Orgs of the image.
+            project (str): Project Name
+
+        Returns:
+            None
+        """
+        suffix = f"/{parent}/{project}".lower()
+        with self.lock:
+            for key, entry in self.entries.items():
+                if key.split("?", maxsplit=1)[0].lower().endswith(suffix):
+                    self.log.debug(f"Tags of '{key}' expired")
+                    entry["timestamp"] = min(entry["timestamp"], time() - self.ttl)
+
+    def get_tags(self, provider: BaseProvider, parent: str, project: str, name_filter: str = "") -> LazyTags:
+        """Return the tags of the image, shared with all the other callers of the run using the same filter.
+
+        Args:
+            provider (BaseProvider): Provider object to use when the tags needs to be fetched.
+            parent (str): Namespace, User or Orgs of the image.
+            project (str): Project Name
+            name_filter (str): Text that the tag names contain, applied by the provider when supported.
+
+        Returns:
+            LazyTags object.
+        """
+        key = self.get_key(provider=provider, parent=parent, project=project, name_filter=name_filter)
+        with self.lock:
+            tags = self.tags.get(key)
+            if tags is not None:
+                self.log.debug(f"Tags of '{key}' shared with another repo")
+                return tags
+            entry = self.entries.get(key)
+            get_pages = partial(provider.iter_tag_pages, parent=parent, project=project, name_filter=name_filter)
+            if entry and time() - entry["timestamp"] < self.ttl:
+                self.log.debug(f"Tags of '{key}' found in the cache file")
+                tags = LazyTags(data=entry["data"], pages=None if entry["complete"] else get_pages())
+                tags.etag = entry["etag"]
+                tags.timestamp = entry["timestamp"]
+            else:
+                tags = LazyTags(
+                    pages=get_pages(etag=entry["etag"] if entry else None),
+                    fallback=entry["data"] if entry else None,
+                    resume=get_pages if entry and not entry["complete"] else None,
+                )
+            tags.newest_first = provider.newest_first
+            self.tags[key] = tags
+            return tags
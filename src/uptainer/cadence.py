@@ -0,0 +1,66 @@
+"""Release cadence of the images, used to adapt how often they are checked."""
+
+from collections.abc import Iterable
+from datetime import UTC
+from itertools import pairwise
+from statistics import median
+from uptainer.typer import TyperImageList
+from uptainer.versions import get_pattern
+
+ADAPTIVE_RATIO = 0.1
+MAX_RELEASES = 20
+
+
+def get_release_times(tags: Iterable[TyperImageList], pattern: str) -> list[float]:
+    """Return when the last versions that match a pattern have been released.
+
+    The tags without a date, like the ones of the OCI registries, are skipped.
+
+    Args:
+        tags (Iterable): The tags found from the remote repo.
+        pattern (str): Regex that the tags needs to match, like the 'version_match' of the config.
+
+    Returns:
+        The epochs of the last MAX_RELEASES releases, newest first.
+    """
+    regex = get_pattern(pattern)
+    times = set()
+    for tagiter in tags:
+        names = [tagiter["name"]] if isinstance(tagiter["name"], str) else tagiter["name"]
+        if not any(regex.match(tag) for tag in names):
+            continue
+        last_update = tagiter["last_update"]
+        if last_update.tzinfo is None:
+            # The providers return the dates in UTC.
+            last_update = last_update.replace(tzinfo=UTC)
+        if last_update.timestamp() > 0:
+            times.add(last_update.timestamp())
+    return sorted(times, reverse=True)[:MAX_RELEASES]
+
+
+def get_adaptive_interval(release_times: list[float], now: float, min_interval: float, max_interval: float) -> float:
+    """Return the seconds to wait before checking again an image, following its release cadence.
+
+    The expected time between two releases is the median of the gaps between the last releases. The image is
+    checked more often right after a release, when the follow up fixes are likely, and when the next release
+    is expected; it backs off while the image stays quiet, the more the longer it's overdue.
+
+    Args:
+        release_times (list): Epochs of the releases, newest first, returned by get_release_times.
+        now (float): Current epoch.
+        min_interval (float): Lower bound of the interval.
+        max_interval (float): Upper bound of the interval.
+
+    Returns:
+        The interval in seconds, between min_interval and max_interval.
+    """
+    if not release_times:
+        return min_interval
+    since = max(now - release_times[0], 0.0)
+    gaps = [newer - older for newer, older in pairwise(release_times)]
+    if not gaps:
+        base = since
+    else:
+        expected = median(gaps)
+        base = min(since, expected - since) if since < expected else since - expected
+    return min(max(base * ADAPTIVE_RATIO, min_interval), max(max_interval, min_interval))
@@ -3,23 +3,96 @@
 import typer
 import structlog
 import logging
+import signal
+from enum import StrEnum
 from pathlib import Path
 from typing import Annotated
-from uptainer.loader import Loader
+from uptainer.config import RunConfig
+from uptainer.shard import parse_shard
 from structlog.contextvars import merge_contextvars
 
 app = typer.Typer()
 
 
+class CloneMode(StrEnum):
+    full = "full"
+    shallow = "shallow"
+    bare = "bare"
+
+
+class ProfileMode(StrEnum):
+    cprofile = "cprofile"
+    sample = "sample"
+
+
 @app.command()
 def main(  # noqa D417
-    config_file: Annotated[Path, typer.Option(help="Configuration file")] = "config.yml",
+    config_file: Annotated[Path, typer.Option(help="Configuration file")] = Path("config.yml"),
     debug: Annotated[bool, typer.Option(help="Enable Debug logging")] = False,
+    workers: Annotated[int, typer.Option(help="Number of repos to check concurrently", min=1)] = 1,
+    tag_cache_file: Annotated[Path | None, typer.Option(help="File where persist the tags between runs")] = None,
+    tag_cache_ttl: Annotated[int, typer.Option(help="Seconds before revalidating the cached tags", min=0)] = 3600,
+    clone_mode: Annotated[CloneMode, typer.Option(help="Git clone strategy")] = CloneMode.full,
+    git_cache_dir: Annotated[Path | None, typer.Option(help="Directory where keep the git mirrors")] = None,
+    git_cache_size: Annotated[int, typer.Option(help="Max size in MB of the git mirrors, 0 unlimited", min=0)] = 0,
+    state_file: Annotated[Path | None, typer.Option(help="SQLite file where keep the repos state")] = None,
+    push_retries: Annotated[int, typer.Option(help="Retries of a push rejected by a concurrent update", min=0)] = 3,
+    registry_concurrency: Annotated[int, typer.Option(help="Max concurrent image provider lookups", min=1)] = 8,
+    git_concurrency: Annotated[int, typer.Option(help="Max concurrent git network operations", min=1)] = 4,
+    cpu_concurrency: Annotated[int | None, typer.Option(help="Max concurrent values file updates", min=1)] = None,
+    github_batch: Annotated[bool, typer.Option(help="Revalidate cached ghcr tags with a listing per owner")] = True,
+    watch: Annotated[bool, typer.Option(help="Stay running and check each repo on its interval")] = False,
+    watch_interval: Annotated[int, typer.Option(help="Default seconds between the checks of a repo", min=1)] = 300,
+    watch_max_interval: Annotated[
+        int | None, typer.Option(help="Adapt the intervals to the release cadence, up to these seconds", min=1)
+    ] = None,
+    webhook_port: Annotated[int | None, typer.Option(help="Listen for registry webhooks on this port")] = None,
+    webhook_host: Annotated[str, typer.Option(help="Address where listen for the webhooks")] = "0.0.0.0",
+    webhook_debounce: Annotated[int, typer.Option(help="Seconds to wait after a webhook before running", min=0)] = 10,
+    metrics_file: Annotated[Path | None, typer.Option(help="Textfile where write the metrics after each run")] = None,
+    metrics_port: Annotated[int | None, typer.Option(help="Serve the metrics on this port in watch mode")] = None,
+    metrics_host: Annotated[str, typer.Option(help="Address where serve the metrics")] = "0.0.0.0",
+    profile: Annotated[ProfileMode | None, typer.Option(help="Profile each repo with cProfile or sampling")] = None,
+    profile_dir: Annotated[Path, typer.Option(help="Directory where write the profiles")] = Path("profile"),
+    profile_memory: Annotated[bool, typer.Option(help="Take a tracemalloc snapshot for each repo")] = False,
+    profile_top: Annotated[int, typer.Option(help="Number of entries in the profile report", min=1)] = 20,
+    shard: Annotated[str | None, typer.Option(help="Run only the repos of a shard, like '2/5'")] = None,
 ) -> None:
     """Main CLI function for uptainer project.
 
     Args:
         config (Path): Configuration file with PATH class.
+        debug (bool): Enable the debug logging.
+        workers (int): Number of repos to check concurrently.
+        tag_cache_file (Path): File where persist the tags found between runs.
+        tag_cache_ttl (int): Seconds after that the tags in the tag cache file are revalidated.
+        clone_mode (CloneMode): Git clone strategy, "full", "shallow" or "bare".
+        git_cache_dir (Path): Directory where keep a git mirror of each remote between runs.
+        git_cache_size (int): Max size in MB of the git mirror directory, 0 for unlimited.
+        state_file (Path): SQLite file where keep the state of the repos, for skipping the unchanged ones.
+        push_retries (int): Retries of a push rejected because the remote branch has been updated meanwhile.
+        registry_concurrency (int): Max number of lookups to the image providers at the same time.
+        git_concurrency (int): Max number of git clones, fetches and pushes at the same time.
+        cpu_concurrency (int): Max number of values files updated at the same time, None for the number of CPUs.
+        github_batch (bool): Revalidate the expired cached tags of the ghcr images listing the packages of each owner.
+        watch (bool): Stay running, checking each repo on its interval and reloading the config file when changed.
+        watch_interval (int): Seconds between two checks of a repo without the 'interval' key.
+        watch_max_interval (int): Max seconds between two checks of a repo without the 'max_interval' key, when set
+            the intervals adapt to the release cadence of the images.
+        webhook_port (int): Port where listen for the registry webhooks, it enables the watch mode.
+        webhook_host (str): Address where listen for the registry webhooks.
+        webhook_debounce (int): Seconds to wait after a webhook before running the repos of the image.
+        metrics_file (Path): File where write the metrics after each run, for the node-exporter textfile collector.
+        metrics_port (int): Port where serve the metrics on '/metrics' in the watch mode.
+        metrics_host (str): Address where serve the metrics.
+        profile (ProfileMode): Profile each repo and stage with "cprofile" or "sample", writing a file for each of
+            them and a merged report into the profile directory.
+        profile_dir (Path): Directory where write the profiles and the report.
+        profile_memory (bool): Take a tracemalloc snapshot for each repo and stage, it enables the "cprofile" mode
+            when the profile is not set.
+        profile_top (int): Number of functions, repos and allocations in the profile report.
+        shard (str): Shard of the repos to run, as '<index>/<count>' with the index starting from 1. The repos are
+            assigned to the shards by their git remote, so each runner of a CI matrix can run its own shard.
 
     Returns:
         None
@@ -50,8 +123,68 @@ def main(  # noqa D417
     if not config_file.is_file():
         log.error("The config file seems not valid.")
         raise typer.Abort()
-    loader = Loader(log=log, config_file=config_file)
-    loader.run()
+    shard_value = (1, 1)
+    if shard is not None:
+        parsed_shard = parse_shard(shard)
+        if parsed_shard is None:
+            log.error(f"The shard '{shard}' is not valid, use '<index>/<count>' like '1/3'.")
+            raise typer.Abort()
+        shard_value = parsed_shard
+    run_config = RunConfig()
+    run_config.workers = workers
+    run_config.tag_cache_file = tag_cache_file
+    run_config.tag_cache_ttl = tag_cache_ttl
+    run_config.clone_mode = clone_mode.value
+    run_config.git_cache_dir = git_cache_dir
+    run_config.git_cache_size = git_cache_size * 1024 * 1024
+    run_config.state_file = state_file
+    run_config.push_retries = push_retries
+    run_config.registry_concurrency = registry_concurrency
+    run_config.git_concurrency = git_concurrency
+    if cpu_concurrency:
+        run_config.cpu_concurrency = cpu_concurrency
+    run_config.github_batch = github_batch
+    run_config.watch_interval = watch_interval
+    run_config.watch_max_interval = watch_max_interval
+    run_config.webhook_debounce = webhook_debounce
+    run_config.metrics_file = metrics_file
+    if profile or profile_memory:
+        run_config.profile = (profile or ProfileMode.cprofile).value
+    run_config.profile_dir = profile_dir
+    run_config.profile_memory = profile_memory
+    run_config.profile_top = profile_top
+    run_config.shard_index, run_config.shard_count = shard_value
+    # Imported after parsing the options, so '--help' and the invalid options don't pay GitPython and requests.
+    from uptainer.loader import Loader
+
+    loader = Loader(log=log, config_file=config_file, run_config=run_config)
+    if watch or webhook_port is not None:
+        from uptainer.metrics import MetricsServer
+        from uptainer.watch import Watcher
+        from uptainer.webhook import WebhookServer
+
+        watcher = Watcher(log=log, loader=loader)
+        servers: list[WebhookServer | MetricsServer] = []
+        if webhook_port is not None:
+            servers.append(WebhookServer(log=log, watcher=watcher, host=webhook_host, port=webhook_port))
+        if metrics_port is not None:
+            servers.append(MetricsServer(log=log, host=metrics_host, port=metrics_port))
+        for server in servers:
+            server.start()
+        signal.signal(signal.SIGTERM, lambda *_: watcher.stop())
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            log.info("Stopped.")
+        finally:
+            for server in servers:
+                server.shutdown()
+        return
+    if metrics_port is not None:
+        log.warning("The metrics are served only in the watch mode, use '--metrics-file' for a single run.")
+    summary = loader.run()
+    if summary["error"]:
+        raise typer.Exit(code=1)
 
 
 if __name__ == "__main__":
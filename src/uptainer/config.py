@@ -1,5 +1,6 @@
 from typing import Any
-from os import environ
+from os import cpu_count, environ
+from pathlib import Path
 
 
 class Config:
@@ -12,14 +13,20 @@ class Config:
         Returns:
             None
         """
-        self.name = None
-        self.image_repository = None
-        self.git_ssh_url = None
-        self.git_ssh_privatekey = None
-        self.git_values_filename = None
-        self.values_key = None
-        self.version_match = None
-        self.git_branch = None
+        self.name = ""
+        self.image_repository = ""
+        self.git_ssh_url = ""
+        self.git_ssh_privatekey = ""
+        self.git_values_filename = ""
+        self.values_key = ""
+        self.version_match = ""
+        self.git_branch = "main"
+        self.version_constraint: str | None = None
+        self.version_selection = "latest"
+        self.image_provider: str | None = None
+        self.interval: int | None = None
+        self.min_interval: int | None = None
+        self.max_interval: int | None = None
 
     def load(self, config: dict[Any, Any]) -> None:
         """Load the config given from the file and inject it into the class vars.
@@ -48,8 +55,53 @@ class Config:
         else:
             self.git_branch = "main"
 
+        for itervar in (
+            "version_constraint",
+            "version_selection",
+            "image_provider",
+            "interval",
+            "min_interval",
+            "max_interval",
+        ):
+            if config.get(itervar):
+                setattr(self, itervar, config[itervar])
+
         if "git_ssh_privatekey" in config:
             self.git_ssh_privatekey = config["git_ssh_privatekey"]
         else:
             homedir = environ.get("HOME", "/tmp")
             self.git_ssh_privatekey = f"{homedir}/.ssh/id_rsa"
+
+
+class RunConfig:
+    def __init__(self) -> None:
+        """Configuration of the whole run, given by the CLI options and shared by all the repos.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.workers = 1
+        self.tag_cache_file: Path | None = None
+        self.tag_cache_ttl = 3600
+        self.clone_mode = "full"
+        self.git_cache_dir: Path | None = None
+        self.git_cache_size = 0
+        self.state_file: Path | None = None
+        self.push_retries = 3
+        self.registry_concurrency = 8
+        self.git_concurrency = 4
+        self.cpu_concurrency = cpu_count() or 1
+        self.github_batch = True
+        self.watch_interval = 300
+        self.watch_max_interval: int | None = None
+        self.webhook_debounce = 10
+        self.metrics_file: Path | None = None
+        self.profile: str | None = None
+        self.profile_dir = Path("profile")
+        self.profile_memory = False
+        self.profile_top = 20
+        self.shard_index = 1
+        self.shard_count = 1
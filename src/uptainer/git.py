@@ -1,27 +1,92 @@
 from structlog._config import BoundLoggerLazyProxy
-from uptainer.typer import TyperGenericReturn
+from uptainer.mirror import MirrorCache, get_dir_size
+from uptainer.metrics import METRICS
+from uptainer.typer import TyperGenericReturn, TyperPush, TyperRemoteBranch
+from collections.abc import Callable
+from random import uniform
+from time import sleep
+from typing import Any
+from pathlib import Path
+from shutil import rmtree
 import tempfile
 import git
 
 
 class Git:
-    def __init__(self, log: BoundLoggerLazyProxy, remote_url: str, branch: str, ssh_private_key: str) -> None:
+    PUSH_REJECTED_REASONS = ("[rejected]", "non-fast-forward", "fetch first", "cannot lock ref", "stale info")
+
+    def __init__(
+        self,
+        log: BoundLoggerLazyProxy,
+        remote_url: str,
+        branch: str,
+        ssh_private_key: str,
+        clone_mode: str = "full",
+    ) -> None:
         """Wrapper for all git function like clone, push, etc.
 
         Args:
             log (BoundLoggerLazyProxy): Log class to inject into the vars. Class: structlog
-            remote_url (str): Remote git url, that needs to starts with ssh:// or git@
+            remote_url (str): Remote git url, that needs to starts with ssh://, git@ or file://
             branch (str): Working git branch to use.
             ssh_private_key (str): Private key to use for pull and push data
+            clone_mode (str): "full" to clone all the history, "shallow" to clone only the last commit of
+                the branch, without blobs and with a sparse checkout of the files to update, "bare" like
+                "shallow" but without any checkout, the files to update are read from the branch tip and
+                committed with the git plumbing commands. With a mirror cache the local clone always copies
+                the history, only the sparse checkout is kept.
 
         Returns:
             None
         """
         self.private_key = ssh_private_key
-        self.work_directory = None
+        self.work_directory: str | None = None
         self.remote_url = remote_url
         self.branch = branch
         self.log = log
+        self.clone_mode = clone_mode
+        self.repo: git.Repo | None = None
+        self.sparse_paths: list[str] | None = None
+        self.push_retries = 3
+        self.push_backoff = 0.5
+        self.push_max_backoff = 8.0
+
+    def get_env(self) -> dict[str, str]:
+        """Return the environment variables to use for the git commands that contact the remote.
+
+        Args:
+            None
+
+        Returns:
+            A dict with GIT_SSH_COMMAND set to use the private key, empty for the local remotes.
+        """
+        if self.remote_url.startswith("file://"):
+            return {}
+        return {"GIT_SSH_COMMAND": f"ssh -i {self.private_key}"}
+
+    def ls_remote_branch(self) -> TyperRemoteBranch:
+        """Check on the remote that the branch exists, without cloning the repo.
+
+        Args:
+            None
+
+        Returns:
+            TyperRemoteBranch object, 'data' contains the commit SHA of the branch or None if not exists.
+        """
+        out = TyperRemoteBranch(error=False, data=None)
+        cmd = git.cmd.Git()
+        cmd.update_environment(**self.get_env())
+        try:
+            refs = str(cmd.ls_remote("--heads", self.remote_url, f"refs/heads/{self.branch}"))
+        except git.exc.GitCommandError as error:
+            self.log.error(f"Error during listing the remote branches, error: '{error}'")
+            out["error"] = True
+            return out
+        for line in refs.splitlines():
+            sha, ref = line.split("\t", 1)
+            if ref == f"refs/heads/{self.branch}":
+                out["data"] = sha
+        return out
 
     def create_workdir(self) -> str:
         """Create a working directory under TMPDIR (platform based) and set it as workdir.
@@ -37,65 +102,330 @@ class Git:
         self.log.info(f"The current working directory is: {obj.name}")
         return obj.name
 
-    def push_repo(self, fpath: str, newversion: str) -> TyperGenericReturn:
-        """Push the new changes into git.
+    def remove_workdir(self) -> None:
+        """Remove the working directory with the clone inside it, closing the git processes kept open on it.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if self.repo is not None:
+            self.repo.close()
+            self.repo = None
+        if self.work_directory:
+            rmtree(self.work_directory, ignore_errors=True)
+            self.work_directory = None
+
+    def push_repo(
+        self, fpaths: list[str], commit_msg: str, reapply: Callable[[], list[str] | None] | None = None
+    ) -> TyperGenericReturn:
+        """Push the new changes into git, using a single commit for all the files.
+
+        When the push is rejected because the remote branch has been updated by someone else, the new tip is
+        fetched, the changes are applied again on top of it with 'reapply' and the push is retried, waiting a
+        jittered backoff, up to 'push_retries' times. Without 'reapply' a rejected push is an error.
 
         Args:
-            fpath (str): RELATIVE path of the file to push.
-            newversion (str): New version to apply, needed for the commit msg.
+            fpaths (list): RELATIVE paths of the files to push.
+            commit_msg (str): Message of the commit.
+            reapply (Callable): Function that applies the changes again into the work directory, returning
+                the RELATIVE paths of the files changed, an empty list when nothing changes anymore, or
+                None on error.
 
         Returns:
             TyperGenericReturn Object
         """
         out = TyperGenericReturn(error=False)
-        commit_msg = f"chore: Update version to {newversion}"
-        try:
-            repo = git.Repo(self.work_directory)
-            if repo.is_dirty():
-                self.log.info(f"Pushing the new version with the commit msg: '{commit_msg}'")
-                repo.index.add([fpath])
-                repo.index.commit(commit_msg)
-                repo.remotes.origin.push()
-            else:
+        for attempt in range(self.push_retries + 1):
+            if attempt:
+                METRICS.inc("git_push_retries_total")
+                wait = uniform(0, min(self.push_max_backoff, self.push_backoff * 2 ** (attempt - 1)))
+                self.log.warning(f"Push rejected, retrying in {wait:.2f}s on top of the new remote branch")
+                sleep(wait)
+                new_fpaths = reapply() if self.fetch_tip() and reapply else None
+                if new_fpaths is None:
+                    break
+                fpaths = new_fpaths
+            try:
+                commit = (
+                    self.commit_bare(fpaths, commit_msg)
+                    if self.clone_mode == "bare"
+                    else self.commit(fpaths, commit_msg)
+                )
+            except (git.exc.GitCommandError, OSError, ValueError) as error:
+                self.log.error(f"Error: {error}")
+                out["error"] = True
+                return out
+            if commit is None:
                 self.log.info("No changes to push.")
-        # TODO: Adding more catch strategy
-        except Exception as error:
-            self.log.error(f"Error: {error}")
+                return out
+            self.log.info(f"Pushing the new version with the commit msg: '{commit_msg}'")
+            with METRICS.span(log=self.log, stage="push"):
+                pushed = self.push_commit(commit=commit)
+            if not pushed["rejected"]:
+                out["error"] = pushed["error"]
+                return out
+            METRICS.inc("git_push_races_lost_total")
+            if reapply is None:
+                break
+        METRICS.inc("git_push_failures_total")
+        self.log.error("The push has been rejected, the remote branch has been updated by someone else.")
+        out["error"] = True
+        return out
+
+    def commit(self, fpaths: list[str], commit_msg: str) -> str | None:
+        """Commit the files of the working tree.
+
+        Args:
+            fpaths (list): RELATIVE paths of the files to commit.
+            commit_msg (str): Message of the commit.
+
+        Returns:
+            The SHA of the new commit, None when there is nothing to commit.
+        """
+        if self.repo is None:
+            self.repo = git.Repo(self.work_directory)
+            self.repo.git.update_environment(**self.get_env())
+        if not self.repo.is_dirty():
+            return None
+        self.repo.index.add(fpaths)
+        return self.repo.index.commit(commit_msg).hexsha
+
+    def commit_bare(self, fpaths: list[str], commit_msg: str) -> str | None:
+        """Commit the files of the work directory on top of the branch tip without a working tree.
+
+        The tree of the branch tip is read into a temporary index, only the blobs of the files given are
+        written, then the new tree and commit objects are created and the local branch is moved on it.
+
+        Args:
+            fpaths (list): RELATIVE paths of the files to commit.
+            commit_msg (str): Message of the commit.
+
+        Returns:
+            The SHA of the new commit, None when there is nothing to commit.
+        """
+        if self.repo is None:
+            raise ValueError("The repo is not cloned.")
+        head = self.repo.commit(self.branch)
+        index_env = {"GIT_INDEX_FILE": f"{self.repo.git_dir}/uptainer-index"}
+        self.repo.git.read_tree(head.hexsha, env=index_env)
+        for fpath in fpaths:
+            blob = self.get_blob(tree=head.tree, fpath=fpath)
+            mode = blob.mode if blob else 0o100644
+            sha = self.repo.git.hash_object("-w", f"{self.work_directory}/{fpath}")
+            self.repo.git.update_index("--add", "--cacheinfo", f"{mode:o},{sha},{fpath}", env=index_env)
+        tree = self.repo.git.write_tree(env=index_env)
+        if tree == head.tree.hexsha:
+            return None
+        author = git.Actor.author(self.repo.config_reader())
+        committer = git.Actor.committer(self.repo.config_reader())
+        commit = self.repo.git.commit_tree(
+            tree,
+            "-p",
+            head.hexsha,
+            "-m",
+            commit_msg,
+            env={
+                "GIT_AUTHOR_NAME": author.name or "",
+                "GIT_AUTHOR_EMAIL": author.email or "",
+                "GIT_COMMITTER_NAME": committer.name or "",
+                "GIT_COMMITTER_EMAIL": committer.email or "",
+            },
+        )
+        self.repo.git.update_ref(f"refs/heads/{self.branch}", commit, head.hexsha)
+        return str(commit)
+
+    def push_commit(self, commit: str) -> TyperPush:
+        """Push a commit to the remote branch.
+
+        Args:
+            commit (str): SHA of the commit to push.
+
+        Returns:
+            TyperPush object, 'rejected' is True when the remote branch has been updated by someone else.
+        """
+        out = TyperPush(error=False, rejected=False)
+        if self.repo is None:
             out["error"] = True
+            return out
+        try:
+            self.repo.git.push("origin", f"{commit}:refs/heads/{self.branch}")
+        except git.exc.GitCommandError as error:
+            out["error"] = True
+            out["rejected"] = any(reason in str(error.stderr) for reason in self.PUSH_REJECTED_REASONS)
+            if not out["rejected"]:
+                self.log.error(f"Error during pushing the commit, error: '{error}'")
         return out
 
-    def clone_repo(self) -> TyperGenericReturn:
-        """Clone the repo provided in the temporary dir and switch to the branch.
+    def fetch_tip(self) -> bool:
+        """Fetch the tip of the remote branch and move the local branch on it, dropping the local commits.
+
+        Args:
+            None
+
+        Returns:
+            True on success.
+        """
+        if self.repo is None:
+            return False
+        fetch_args = ["origin", self.branch]
+        if Path(f"{self.repo.git_dir}/shallow").exists():
+            fetch_args.append("--depth=1")
+        try:
+            self.repo.git.fetch(*fetch_args)
+            if self.clone_mode == "bare":
+                self.repo.git.update_ref(f"refs/heads/{self.branch}", "FETCH_HEAD")
+                self.read_files(fpaths=self.sparse_paths or [])
+            else:
+                self.repo.git.reset("--hard", "FETCH_HEAD")
+        except git.exc.GitCommandError as error:
+            self.log.error(f"Error during fetching the remote branch, error: '{error}'")
+            return False
+        return True
+
+    def read_files(self, fpaths: list[str]) -> None:
+        """Write into the work directory the files of the branch tip, reading only their blobs from the repo.
+
+        On a blobless clone only these blobs are downloaded from the remote. The files not found on the
+        branch are skipped.
+
+        Args:
+            fpaths (list): RELATIVE paths of the files to read.
+
+        Returns:
+            None
+        """
+        if self.repo is None:
+            return
+        tree = self.repo.commit(self.branch).tree
+        for fpath in fpaths:
+            blob = self.get_blob(tree=tree, fpath=fpath)
+            if blob is None:
+                self.log.debug(f"File '{fpath}' not found on the branch '{self.branch}'")
+                continue
+            dest = Path(f"{self.work_directory}/{fpath}")
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            dest.write_bytes(blob.data_stream.read())
+
+    def get_blob(self, tree: git.Tree, fpath: str) -> git.Blob | None:
+        """Return the blob of a file inside a tree.
+
+        Args:
+            tree (Tree): Tree object, like the one of the branch tip.
+            fpath (str): RELATIVE path of the file.
+
+        Returns:
+            The Blob object, None when the path not exists or it's not a file.
+        """
+        try:
+            blob = tree[fpath]
+        except KeyError:
+            return None
+        return blob if isinstance(blob, git.Blob) else None
+
+    def get_head_sha(self) -> str | None:
+        """Return the SHA of the branch in the cloned repo.
 
         Args:
             None
 
+        Returns:
+            The commit SHA, None when the repo is not cloned.
+        """
+        if self.repo is None:
+            return None
+        try:
+            return self.repo.commit(self.branch).hexsha
+        except (git.exc.GitError, ValueError):
+            return None
+
+    def clone_repo(
+        self, sparse_paths: list[str] | None = None, mirror_cache: MirrorCache | None = None
+    ) -> TyperGenericReturn:
+        """Clone the repo provided in the temporary dir and switch to the branch.
+
+        When a mirror cache is given, the remote is fetched into its local mirror and the repo is cloned
+        from it, then the 'origin' remote is set back to the remote url for the push. In the "bare" clone
+        mode the repo is cloned into a '.git' directory inside the work directory, next to the files read.
+
+        Args:
+            sparse_paths (list): RELATIVE paths of the files to checkout in the "shallow" and "bare" clone
+                modes, None to checkout all the files.
+            mirror_cache (MirrorCache): Cache of the git mirrors to use, None to clone from the remote.
+
         Returns:
             Return a dict that contain a boolean value for the errors.
         """
         out = TyperGenericReturn(error=False)
-        if self.remote_url.startswith("git@") or self.remote_url.startswith("ssh://"):
-            env = {"GIT_SSH_COMMAND": f"ssh -i {self.private_key}"}
-            self.log.info(f"Pulling '{self.remote_url}' to '{self.work_directory}' using the key '{self.private_key}'")
-            try:
-                self.repo = git.Repo.clone_from(url=self.remote_url, to_path=self.work_directory, env=env)
-                self.log.info(f"Pull success. Switching to the branch '{self.branch}'")
-                branch_matched = False
-                for branch in self.repo.branches:
-                    if branch.name == self.branch:
-                        branch_matched = True
-                        break
-
-                if branch_matched:
-                    self.repo.git.checkout(self.branch)
+        self.sparse_paths = sparse_paths
+        if not self.remote_url.startswith(("git@", "ssh://", "file://")):
+            self.log.error("Uptainer supports clone only with the git@, ssh:// or file:// urls. Exiting.")
+            out["error"] = True
+            return out
+
+        remote_branch = self.ls_remote_branch()
+        if remote_branch["error"]:
+            out["error"] = True
+            return out
+        if remote_branch["data"] is None:
+            self.log.error(f"Branch '{self.branch}' not found on '{self.remote_url}'")
+            out["error"] = True
+            return out
+
+        work_directory = self.work_directory or self.create_workdir()
+        self.log.info(
+            f"Pulling '{self.remote_url}' to '{work_directory}' using the key '{self.private_key}'"
+            f" and the clone mode '{self.clone_mode}'"
+        )
+        clone_args: dict[str, Any] = {"branch": self.branch}
+        to_path = f"{work_directory}/.git" if self.clone_mode == "bare" else work_directory
+        if self.clone_mode == "shallow":
+            clone_args.update(single_branch=True, no_checkout=True)
+        if self.clone_mode == "bare":
+            clone_args.update(single_branch=True, bare=True)
+        try:
+            with METRICS.span(log=self.log, stage="clone"):
+                if mirror_cache:
+                    with mirror_cache.checkout(remote_url=self.remote_url, env=self.get_env()) as mirror:
+                        if mirror["error"] or mirror["data"] is None:
+                            out["error"] = True
+                            return out
+                        self.repo = git.Repo.clone_from(url=mirror["data"], to_path=to_path, **clone_args)
+                    self.repo.remotes.origin.set_url(self.remote_url)
                 else:
-                    self.log.error(f"Branch not found. Founds: {self.repo.branches}")
-                    out["error"] = True
-            # TODO: Adding more catch strategy
-            except git.exc.GitCommandError as error:
-                self.log.error(f"Error during pulling the repo, error: '{error}'")
-                out["error"] = True
-        else:
-            self.log.error("Uptainer currently support clone only via SSH. Exiting.")
+                    if self.clone_mode in ("shallow", "bare"):
+                        clone_args.update(depth=1, filter="blob:none")
+                    self.repo = git.Repo.clone_from(
+                        url=self.remote_url, to_path=to_path, env=self.get_env(), **clone_args
+                    )
+                self.repo.git.update_environment(**self.get_env())
+                self.checkout_files(sparse_paths=sparse_paths)
+            METRICS.inc("git_clone_bytes_total", get_dir_size(path=Path(self.repo.git_dir)))
+        # TODO: Adding more catch strategy
+        except git.exc.GitCommandError as error:
+            self.log.error(f"Error during pulling the repo, error: '{error}'")
             out["error"] = True
         return out
+
+    def checkout_files(self, sparse_paths: list[str] | None = None) -> None:
+        """Populate the work directory of the cloned repo, following the clone mode.
+
+        Args:
+            sparse_paths (list): RELATIVE paths of the files to checkout in the "shallow" and "bare" clone
+                modes, None to checkout all the files.
+
+        Returns:
+            None
+        """
+        if self.repo is None:
+            return
+        if self.clone_mode == "bare":
+            self.log.info(f"Pull success. Reading the files from the branch '{self.branch}'")
+            self.read_files(fpaths=sparse_paths or [])
+            return
+        if self.clone_mode == "shallow" and sparse_paths:
+            self.repo.git.sparse_checkout("set", "--no-cone", *[f"/{path}" for path in sparse_paths])
+        self.log.info(f"Pull success. Switching to the branch '{self.branch}'")
+        self.repo.git.checkout(self.branch)
@@ -1,24 +1,74 @@
-from yaml import safe_load
 from pathlib import Path
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import copy_context
+from typing import TYPE_CHECKING, Any
 from structlog._config import BoundLoggerLazyProxy
-from uptainer.config import Config
+from uptainer.cache import TagCache
+from uptainer.config import Config, RunConfig
 from uptainer.uptainer import UpTainer
-from uptainer.typer import TyperConfigs, TyperConfig
+from uptainer.metrics import METRICS
+from uptainer.pipeline import Pipeline
+from uptainer.shard import get_shard, get_shard_key
+from structlog.contextvars import bind_contextvars
+from uptainer.typer import (
+    TyperConfigs,
+    TyperConfig,
+    TyperDetectedVersion,
+    TyperGenericReturn,
+    TyperRunSummary,
+    TyperRepoState,
+)
+
+if TYPE_CHECKING:
+    # Imported by the stages that need them, so the CLI starts without GitPython, PyYAML and python-box.
+    from uptainer.git import Git
+    from uptainer.values import ValuesFile
 
 
 class Loader:
-    def __init__(self, log: BoundLoggerLazyProxy, config_file: Path) -> None:
+    def __init__(self, log: BoundLoggerLazyProxy, config_file: Path, run_config: RunConfig | None = None) -> None:
         """Loader class to load all the repos from the config and trasform it into uptainer Classes.
 
         Args:
             log (BoundLoggerLazyProxy): Log class to inject into the vars. Class: structlog
             config_file (Path): Config path with PATH class.
+            run_config (RunConfig): Options of the run like the number of workers, None to use the defaults.
 
         Returns:
             None
         """
         self.log = log
         self.config_file = config_file
+        self.run_config = run_config or RunConfig()
+        self.workers = max(1, self.run_config.workers)
+        self.tag_cache = TagCache(log=log, cache_file=self.run_config.tag_cache_file, ttl=self.run_config.tag_cache_ttl)
+        self.mirror_cache = None
+        if self.run_config.git_cache_dir:
+            from uptainer.mirror import MirrorCache
+
+            self.mirror_cache = MirrorCache(
+                log=log, cache_dir=self.run_config.git_cache_dir, max_size=self.run_config.git_cache_size
+            )
+        self.pipeline = Pipeline(
+            log=log,
+            registry=self.run_config.registry_concurrency,
+            git=self.run_config.git_concurrency,
+            cpu=self.run_config.cpu_concurrency,
+        )
+        self.release_times: dict[str, list[float]] = {}
+        self.state_store = None
+        if self.run_config.state_file:
+            from uptainer.state import StateStore
+
+            self.state_store = StateStore(log=log, db_file=self.run_config.state_file)
+        self.profiler = None
+        if self.run_config.profile:
+            from uptainer.profiler import Profiler
+
+            self.profiler = Profiler(log=log, output_dir=self.run_config.profile_dir, mode=self.run_config.profile)
+            self.profiler.memory = self.run_config.profile_memory
+            self.profiler.top = self.run_config.profile_top
 
     def read_config(self) -> TyperConfigs:
         """Load the config in YAML format and wrap it into a self.config_file var.
@@ -35,23 +85,429 @@ class Loader:
             self.log.error("File not exists.")
             out["error"] = True
         else:
-            out["data"] = TyperConfig(repos=safe_load(self.config_file.open())["repos"])
+            from yaml import safe_load
+
+            with self.config_file.open() as fopen:
+                out["data"] = TyperConfig(repos=safe_load(fopen)["repos"])
         return out
 
-    def run(self) -> None:
-        """Main method, it will load the config file and create a uptainer class for each of them.
+    def load_configs(self, repos: list[dict[Any, Any]]) -> list[Config]:
+        """Load the repos of the config into Config classes.
+
+        With more than one shard, only the repos of the shard of this run are loaded. The repos are assigned by
+        their git remote, so the repos that push to the same remote always run on the same shard. The run summary
+        and the watch schedule are keyed by the repo name, so a name used twice raises a ValueError.
+
+        Args:
+            repos (list): The 'repos' list in the config file.
+
+        Returns:
+            A list of Config classes, in the config order.
+        """
+        configs = []
+        names = set()
+        for repo in repos:
+            config = Config()
+            config.load(config=repo)
+            if config.name in names:
+                raise ValueError(f"The repo name '{config.name}' is used more than once, the names need to be unique.")
+            names.add(config.name)
+            configs.append(config)
+        index, count = self.run_config.shard_index, self.run_config.shard_count
+        if count > 1:
+            shard_configs = [
+                config for config in configs if get_shard(key=get_shard_key(config.git_ssh_url), count=count) == index
+            ]
+            self.log.info(f"Shard {index}/{count}: running {len(shard_configs)} of {len(configs)} repos")
+            return shard_configs
+        return configs
+
+    def group_repos(self, repos: list[dict[Any, Any]]) -> dict[tuple[str, str, str], list[Config]]:
+        """Load the repos of the config and group them by git remote, branch and ssh private key.
+
+        Args:
+            repos (list): The 'repos' list in the config file.
+
+        Returns:
+            A dict like {("<git_ssh_url>", "<git_branch>", "<git_ssh_privatekey>"): [<Config>, ...]}, in the config
+            order.
+        """
+        return self.group_configs(configs=self.load_configs(repos=repos))
+
+    def group_configs(self, configs: list[Config]) -> dict[tuple[str, str, str], list[Config]]:
+        """Group the repos by git remote, branch and ssh private key, each group is cloned with the key of its repos.
+
+        Args:
+            configs (list): Config classes of the repos.
+
+        Returns:
+            A dict like {("<git_ssh_url>", "<git_branch>", "<git_ssh_privatekey>"): [<Config>, ...]}, in the config
+            order.
+        """
+        groups: dict[tuple[str, str, str], list[Config]] = {}
+        for config in configs:
+            groups.setdefault((config.git_ssh_url, config.git_branch, config.git_ssh_privatekey), []).append(config)
+        return groups
+
+    def revalidate_github(self, configs: list[Config]) -> None:
+        """Renew the expired tag lists of the ghcr images that have not been updated, with one request for each owner.
+
+        It is a cache revalidation only: the GitHub API has no endpoint for the versions of many packages, so the
+        packages of each user or org are listed in a single request, and the tag lists of the cache file not older
+        than the last update of their package get their ttl renewed. The listing has no tags, so the images without
+        a tag list in the cache file, or with an outdated one, still request their own tags. The owners with a single
+        expired image are skipped, since revalidating its ETag costs the same request.
 
         Args:
+            configs (list): Config classes of all the repos.
+
+        Returns:
             None
+        """
+        MIN_BATCH_SIZE = 2
+        MIN_SPLITSLASHES = 3
+        packages: dict[str, set[str]] = {}
+        for config in configs:
+            image = str(config.image_repository).replace("https://", "").replace("http://", "").split("/")
+            if image[0] != "ghcr.io" or len(image) < MIN_SPLITSLASHES or config.image_provider == "oci":
+                continue
+            if self.tag_cache.is_expired(
+                key=self.tag_cache.get_key(provider="GitHub", parent=image[1], project=image[2])
+            ):
+                packages.setdefault(image[1], set()).add(image[2])
+        batches = {parent: projects for parent, projects in packages.items() if len(projects) >= MIN_BATCH_SIZE}
+        if not batches:
+            return
+        from uptainer.providers.github import GitHub
+
+        provider = GitHub(log=self.log)
+        futures = {
+            parent: self.pipeline.submit("registry", provider.get_packages_updated, parent=parent) for parent in batches
+        }
+        for parent, future in futures.items():
+            updated = future.result()
+            METRICS.inc("github_batch_requests_total")
+            if updated["error"]:
+                continue
+            for project in batches[parent]:
+                # The package names on ghcr are always lowercase.
+                package_updated = updated["data"].get(project.lower())
+                key = self.tag_cache.get_key(provider="GitHub", parent=parent, project=project)
+                if package_updated is not None and self.tag_cache.revalidate(key=key, updated=package_updated):
+                    METRICS.inc("github_batch_revalidated_total")
+
+    def run_profiled(self, name: str, stage: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Call a function, profiling it when the profiler is enabled.
+
+        Args:
+            name (str): Name of the repo, or the names of the git group joined by commas.
+            stage (str): Name of the stage, like "lookup", "clone", "apply" or "push".
+            func (Callable): Function to call.
+            *args (Any): Positional arguments of the function.
+            **kwargs (Any): Keyword arguments of the function.
+
+        Returns:
+            The value returned by the function.
+        """
+        if self.profiler is None:
+            return func(*args, **kwargs)
+        with self.profiler.profile(name=name, stage=stage):
+            return func(*args, **kwargs)
+
+    def start_lookups(self, configs: list[Config]) -> list[tuple[UpTainer, Future[TyperDetectedVersion]]]:
+        """Submit the tag lookups of the repos to the registry stage of the pipeline.
+
+        Args:
+            configs (list): Config classes of the repos.
+
+        Returns:
+            A list of (<UpTainer object>, <Future of the version detected>), in the config order.
+        """
+        lookups = []
+        for config in configs:
+            obj = UpTainer(config=config, log=self.log, tag_cache=self.tag_cache)
+            self.log.info(f"Running check named: '{config.name}'")
+            lookups.append(
+                (obj, self.pipeline.submit("registry", self.run_profiled, config.name, "lookup", obj.get_new_version))
+            )
+        return lookups
+
+    def run_group(
+        self, configs: list[Config], lookups: list[tuple[UpTainer, Future[TyperDetectedVersion]]]
+    ) -> dict[str, bool]:
+        """Run all the repos that share the same git remote, branch and key, with one clone, one commit and one push.
+
+        Without a state store the clone starts while the tag lookups are still running, and it's thrown away
+        if no repo of the group has a new version. With a state store the clone waits for the lookups, since
+        the repos unchanged from the last run are skipped without cloning.
+
+        Args:
+            configs (list): Config classes of the repos sharing the git remote, branch and key.
+            lookups (list): Tag lookups of the repos, returned by start_lookups.
+
+        Returns:
+            A dict with the success flag for each repo name.
+        """
+        from uptainer.git import Git
+
+        config = configs[0]
+        git_obj = Git(
+            log=self.log,
+            remote_url=config.git_ssh_url,
+            branch=config.git_branch,
+            ssh_private_key=config.git_ssh_privatekey,
+            clone_mode=self.run_config.clone_mode,
+        )
+        git_obj.push_retries = self.run_config.push_retries
+        try:
+            return self.update_group(git_obj=git_obj, configs=configs, lookups=lookups)
+        finally:
+            git_obj.remove_workdir()
+
+    def update_group(
+        self, git_obj: "Git", configs: list[Config], lookups: list[tuple[UpTainer, Future[TyperDetectedVersion]]]
+    ) -> dict[str, bool]:
+        """Clone, update and push the git group, called by run_group.
+
+        Args:
+            git_obj (Git): Git object of the group.
+            configs (list): Config classes of the repos sharing the git remote, branch and key.
+            lookups (list): Tag lookups of the repos, returned by start_lookups.
+
+        Returns:
+            A dict with the success flag for each repo name.
+        """
+        out = {config.name: False for config in configs}
+        clone = None
+        if not self.state_store:
+            git_obj.create_workdir()
+            clone = self.pipeline.submit(
+                "git",
+                self.run_profiled,
+                ",".join(config.name for config in configs),
+                "clone",
+                git_obj.clone_repo,
+                sparse_paths=sorted({config.git_values_filename for config in configs}),
+                mirror_cache=self.mirror_cache,
+            )
+        pending: list[tuple[UpTainer, str]] = []
+        for obj, lookup in lookups:
+            version = lookup.result()
+            if not version["error"] and version["data"] is not None:
+                pending.append((obj, version["data"]))
+                self.release_times[obj.config.name] = obj.release_times
+        if not pending:
+            if clone:
+                clone.result()
+            return out
+
+        bind_contextvars(reponame=",".join(obj.config.name for obj, _ in pending))
+        if clone is None:
+            pull_check = self.clone_changed(git_obj=git_obj, pending=pending, out=out)
+        else:
+            pull_check = clone.result()
+        work_directory = git_obj.work_directory
+        if pull_check["error"] or work_directory is None:
+            return out
+
+        with self.pipeline.stage("cpu"):
+            applied = self.apply_versions(work_directory=work_directory, pending=pending)
+        changes = [(obj, newversion) for obj, newversion, changed in applied if changed]
+        bind_contextvars(reponame=",".join(obj.config.name for obj, _ in changes))
+        if changes:
+            with self.pipeline.stage("git"):
+                push_check = self.run_profiled(
+                    ",".join(obj.config.name for obj, _ in changes),
+                    "push",
+                    git_obj.push_repo,
+                    fpaths=sorted({obj.config.git_values_filename for obj, _ in changes}),
+                    commit_msg=self.get_commit_msg([(obj.config.name, newversion) for obj, newversion in changes]),
+                    reapply=lambda: self.reapply_versions(work_directory=work_directory, pending=changes),
+                )
+            if push_check["error"]:
+                return out
+        remote_sha = git_obj.get_head_sha()
+        for obj, newversion, _ in applied:
+            out[obj.config.name] = True
+            if self.state_store and remote_sha:
+                self.state_store.set(
+                    config=obj.config,
+                    state=TyperRepoState(
+                        upstream_version=newversion, remote_sha=remote_sha, current_version=newversion
+                    ),
+                )
+        self.log.info("---> Done.")
+        return out
+
+    def clone_changed(
+        self, git_obj: "Git", pending: list[tuple[UpTainer, str]], out: dict[str, bool]
+    ) -> TyperGenericReturn:
+        """Clone the repo when some repos of the group are changed since the last run, removing the unchanged ones.
+
+        Args:
+            git_obj (Git): Git object of the group.
+            pending (list): List of (<UpTainer object>, <new version>) to check, updated in place.
+            out (dict): Success flag for each repo name, updated for the skipped repos.
+
+        Returns:
+            TyperGenericReturn object, 'error' is True when the clone fails or there is nothing to clone.
+        """
+        with self.pipeline.stage("git"):
+            pending[:] = self.skip_unchanged(git_obj=git_obj, pending=pending, out=out)
+            if not pending:
+                self.log.info("---> Done, nothing changed since the last run.")
+                return TyperGenericReturn(error=True)
+            git_obj.create_workdir()
+            pull_check: TyperGenericReturn = self.run_profiled(
+                ",".join(obj.config.name for obj, _ in pending),
+                "clone",
+                git_obj.clone_repo,
+                sparse_paths=[obj.config.git_values_filename for obj, _ in pending],
+                mirror_cache=self.mirror_cache,
+            )
+            return pull_check
+
+    def apply_versions(
+        self, work_directory: str, pending: list[tuple[UpTainer, str]]
+    ) -> list[tuple[UpTainer, str, bool]]:
+        """Update the values files of the repos in the cloned git group.
+
+        The repos share the parsed values files, so a file used by many repos is parsed only once.
+
+        Args:
+            work_directory (str): Absolute path of the cloned git repo.
+            pending (list): List of (<UpTainer object>, <new version>) to apply.
+
+        Returns:
+            List of (<UpTainer object>, <new version>, <changed>) of the repos updated without errors.
+        """
+        applied = []
+        values_files: dict[str, ValuesFile] = {}
+        for obj, newversion in pending:
+            bind_contextvars(reponame=obj.config.name)
+            obj.values_files = values_files
+            result = self.run_profiled(
+                obj.config.name, "apply", obj.apply_version, work_directory=work_directory, newversion=newversion
+            )
+            if not result["error"]:
+                applied.append((obj, newversion, result["changed"]))
+        return applied
+
+    def reapply_versions(self, work_directory: str, pending: list[tuple[UpTainer, str]]) -> list[str] | None:
+        """Apply again the versions on the work directory moved on the new remote branch, after a rejected push.
+
+        Args:
+            work_directory (str): Absolute path of the cloned git repo.
+            pending (list): List of (<UpTainer object>, <new version>) to apply.
+
+        Returns:
+            The RELATIVE paths of the values files changed, None when a repo fails.
+        """
+        applied = self.apply_versions(work_directory=work_directory, pending=pending)
+        if len(applied) < len(pending):
+            return None
+        return sorted({obj.config.git_values_filename for obj, _, changed in applied if changed})
+
+    def get_commit_msg(self, changes: list[tuple[str, str]]) -> str:
+        """Return the commit message for the versions applied.
+
+        Args:
+            changes (list): List of (<repo name>, <new version>) applied.
+
+        Returns:
+            The commit message.
+        """
+        if len(changes) == 1:
+            return f"chore: Update version to {changes[0][1]}"
+        return "chore: Update versions\n\n" + "\n".join(f"- {name}: {version}" for name, version in changes)
+
+    def skip_unchanged(
+        self, git_obj: "Git", pending: list[tuple[UpTainer, str]], out: dict[str, bool]
+    ) -> list[tuple[UpTainer, str]]:
+        """Remove the repos that have the same upstream version and remote branch SHA of the last run.
+
+        Args:
+            git_obj (Git): Git object of the group, used to read the remote branch SHA with ls-remote.
+            pending (list): List of (<UpTainer object>, <new version>) to check.
+            out (dict): Success flag for each repo name, updated for the skipped repos.
 
         Returns:
+            The repos that still need to be cloned and updated.
+        """
+        remote_branch = git_obj.ls_remote_branch()
+        if remote_branch["error"] or remote_branch["data"] is None:
+            return pending
+        changed = []
+        for obj, newversion in pending:
+            if self.state_store and self.state_store.is_unchanged(
+                config=obj.config, upstream_version=newversion, remote_sha=remote_branch["data"]
+            ):
+                self.log.info(f"Skipping '{obj.config.name}', nothing changed since the last run.")
+                out[obj.config.name] = True
+            else:
+                changed.append((obj, newversion))
+        return changed
+
+    def run(self) -> TyperRunSummary:
+        """Main method, it will load the config file and run all the repos in it.
+
+        Args:
             None
+
+        Returns:
+            TyperRunSummary Object, with a success flag for each repo name.
         """
         configdata = self.read_config()
         if configdata["error"]:
-            return
-        for repo in configdata["data"]["repos"]:
-            config = Config()
-            config.load(config=repo)
-            obj = UpTainer(config=config, log=self.log)
-            obj.run()
+            return TyperRunSummary(error=True, data={})
+        return self.run_configs(configs=self.load_configs(repos=configdata["data"]["repos"]))
+
+    def run_configs(self, configs: list[Config]) -> TyperRunSummary:
+        """Run the repos given, creating a uptainer class for each of them.
+
+        The repos are grouped by git remote, branch and key, every group runs in its own copy of the context,
+        so the log vars binded by one repo (like 'reponame') never leak into the others, even when they
+        share the same thread. The tag lookups of all the repos are submitted at the start to the registry
+        stage of the pipeline, so they run while the groups before are cloning or pushing.
+
+        Args:
+            configs (list): Config classes of the repos to run.
+
+        Returns:
+            TyperRunSummary Object, with a success flag for each repo name.
+        """
+        from git.exc import GitCommandError
+        from requests import RequestException
+
+        out = TyperRunSummary(error=False, data={})
+        groups = self.group_configs(configs=configs)
+        self.log.info(f"Checking {len(configs)} repos in {len(groups)} git groups using {self.workers} workers")
+        with self.pipeline, ThreadPoolExecutor(max_workers=self.workers) as executor:
+            if self.run_config.github_batch:
+                self.revalidate_github(configs=configs)
+            futures = []
+            for group in groups.values():
+                context = copy_context()
+                lookups = context.run(self.start_lookups, group)
+                futures.append((group, executor.submit(context.run, self.run_group, group, lookups)))
+            for group, future in futures:
+                try:
+                    out["data"].update(future.result())
+                # Avoid that a single broken group stops the summary of the others.
+                except (GitCommandError, OSError, RequestException) as error:
+                    self.log.error(f"Unexpected error on '{group[0].git_ssh_url}': {error}")
+                    for config in group:
+                        out["data"][config.name] = False
+        self.tag_cache.save()
+        if self.run_config.metrics_file:
+            METRICS.write_textfile(path=self.run_config.metrics_file)
+        if self.profiler:
+            self.profiler.write_report()
+        failed = [name for name, success in out["data"].items() if not success]
+        out["error"] = len(failed) > 0
+        self.log.info(
+            f"Run completed. Success: {len(out['data']) - len(failed)} / Failed: {len(failed)}",
+            results=out["data"],
+            metrics=METRICS.snapshot(),
+        )
+        return out
@@ -0,0 +1,264 @@
+"""Counters, gauges and timings of the run, shared by all the repos."""
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Lock, Thread
+from time import perf_counter
+from typing import Any
+from structlog._config import BoundLoggerLazyProxy
+
+Labels = tuple[tuple[str, str], ...]
+PREFIX = "uptainer_"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def format_labels(labels: Labels) -> str:
+    """Return the labels in the exposition format.
+
+    Args:
+        labels (Labels): Sorted tuple of (<name>, <value>).
+
+    Returns:
+        A string like '{stage="clone"}', empty without labels.
+    """
+    if not labels:
+        return ""
+    escaped = ((name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for name, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Metrics:
+    def __init__(self) -> None:
+        """Thread safe counters, like the number of push retries, gauges and timings of the stages.
+
+        Each value can have labels, like the provider name, given as keyword arguments.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.counters: dict[tuple[str, Labels], float] = {}
+        self.gauges: dict[tuple[str, Labels], float] = {}
+        self.timings: dict[tuple[str, Labels], tuple[int, float]] = {}
+        self.lock = Lock()
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """Increment a counter, creating it on the first call.
+
+        Args:
+            name (str): Name of the counter, like "git_push_retries_total".
+            value (float): Value to add.
+            **labels (str): Labels of the counter, like provider="GitHub".
+
+        Returns:
+            None
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def get(self, name: str, **labels: str) -> float:
+        """Return the value of a counter.
+
+        Args:
+            name (str): Name of the counter.
+            **labels (str): Labels of the counter.
+
+        Returns:
+            The value, 0 when the counter has never been incremented.
+        """
+        with self.lock:
+            return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        """Set the value of a gauge, like the API quota left.
+
+        Args:
+            name (str): Name of the gauge, like "provider_quota_remaining".
+            value (float): New value.
+            **labels (str): Labels of the gauge.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Add a measure to a timing, keeping its count and sum.
+
+        Args:
+            name (str): Name of the timing, like "stage_seconds".
+            value (float): Seconds measured.
+            **labels (str): Labels of the timing.
+
+        Returns:
+            None
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            count, total = self.timings.get(key, (0, 0.0))
+            self.timings[key] = (count + 1, total + value)
+
+    @contextmanager
+    def span(self, log: BoundLoggerLazyProxy, stage: str, **labels: str) -> Iterator[None]:
+        """Measure the time spent in a block, logging it and adding it to the 'stage_seconds' timing.
+
+        The log vars binded, like 'reponame', are added to the log by structlog.
+
+        Args:
+            log (BoundLoggerLazyProxy): Log class to inject into the vars. Class: structlog
+            stage (str): Name of the stage, like "clone".
+            **labels (str): Labels of the timing, like provider="GitHub".
+
+        Returns:
+            A context manager that measures the block.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            duration = perf_counter() - start
+            self.observe("stage_seconds", duration, stage=stage, **labels)
+            log.debug(f"Stage '{stage}' completed", stage=stage, duration=round(duration, 6), **labels)
+
+    def snapshot(self) -> dict[str, float]:
+        """Return a copy of all the counters and gauges.
+
+        Args:
+            None
+
+        Returns:
+            A dict like {"<counter name>": <value>, '<counter name>{<label>="<value>"}': <value>}.
+        """
+        with self.lock:
+            values = {**self.counters, **self.gauges}
+        return {f"{name}{format_labels(labels)}": value for (name, labels), value in values.items()}
+
+    def render(self, openmetrics: bool = True) -> str:
+        """Return all the values in the OpenMetrics text format, or in the Prometheus one.
+
+        Args:
+            openmetrics (bool): True for the OpenMetrics format, False for the Prometheus text format,
+                like the one read by the node-exporter textfile collector.
+
+        Returns:
+            The exposition text.
+        """
+        with self.lock:
+            counters, gauges, timings = dict(self.counters), dict(self.gauges), dict(self.timings)
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            family = name.removesuffix("_total") if openmetrics else name
+            lines.append(f"# TYPE {PREFIX}{family} counter")
+            for (sample, labels), value in sorted(counters.items()):
+                if sample == name:
+                    lines.append(f"{PREFIX}{name}{format_labels(labels)} {value}")
+        for name in sorted({name for name, _ in gauges}):
+            lines.append(f"# TYPE {PREFIX}{name} gauge")
+            for (sample, labels), value in sorted(gauges.items()):
+                if sample == name:
+                    lines.append(f"{PREFIX}{name}{format_labels(labels)} {value}")
+        for name in sorted({name for name, _ in timings}):
+            lines.append(f"# TYPE {PREFIX}{name} summary")
+            for (sample, labels), (count, total) in sorted(timings.items()):
+                if sample == name:
+                    lines.append(f"{PREFIX}{name}_count{format_labels(labels)} {count}")
+                    lines.append(f"{PREFIX}{name}_sum{format_labels(labels)} {total}")
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: Path) -> None:
+        """Write all the values into a file for the node-exporter textfile collector, replacing it atomically.
+
+        Args:
+            path (Path): Path of the file, its name needs to end with '.prom'.
+
+        Returns:
+            None
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmpfile = path.with_suffix(f"{path.suffix}.tmp")
+        tmpfile.write_text(self.render(openmetrics=False))
+        tmpfile.replace(path)
+
+
+METRICS = Metrics()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    server: "MetricsServer"
+
+    def do_GET(self) -> None:
+        """Reply with the metrics on '/metrics', in OpenMetrics format when the scraper accepts it.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if self.path.split("?", maxsplit=1)[0] != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+        body = self.server.metrics.render(openmetrics=openmetrics).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Log the requests with structlog, instead of stderr.
+
+        Args:
+            format (str): Format string of the message.
+            *args (Any): Values of the format string.
+
+        Returns:
+            None
+        """
+        self.server.log.debug(f"Metrics request: {format % args}")
+
+
+class MetricsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, log: BoundLoggerLazyProxy, host: str, port: int, metrics: Metrics = METRICS) -> None:
+        """HTTP server for scraping the metrics on '/metrics', used in the watch mode.
+
+        Args:
+            log (BoundLoggerLazyProxy): Log class to inject into the vars. Class: structlog
+            host (str): Address to listen on.
+            port (int): Port to listen on, 0 for a random one.
+            metrics (Metrics): Metrics to serve.
+
+        Returns:
+            None
+        """
+        super().__init__((host, port), MetricsHandler)
+        self.log = log
+        self.host = host
+        self.metrics = metrics
+
+    def start(self) -> Thread:
+        """Serve the requests in a background thread, until shutdown is called.
+
+        Args:
+            None
+
+        Returns:
+            The thread of the server.
+        """
+        thread = Thread(target=self.serve_forever, name="uptainer-metrics", daemon=True)
+        thread.start()
+        self.log.info(f"Serving the metrics on {self.host}:{self.server_port}/metrics")
+        return thread
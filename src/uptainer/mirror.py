@@ -0,0 +1,144 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+from hashlib import sha256
+from pathlib import Path
+from shutil import rmtree
+from structlog._config import BoundLoggerLazyProxy
+from uptainer.typer import TyperMirror
+import fcntl
+import os
+import git
+
+
+def get_dir_size(path: Path) -> int:
+    """Return the size on disk of the files inside a directory.
+
+    Args:
+        path (Path): Directory path.
+
+    Returns:
+        Size in bytes.
+    """
+    size = 0
+    for root, _, files in os.walk(path):
+        for fname in files:
+            try:
+                size += os.lstat(os.path.join(root, fname)).st_size
+            except FileNotFoundError:
+                continue
+    return size
+
+
+class MirrorCache:
+    def __init__(self, log: BoundLoggerLazyProxy, cache_dir: Path, max_size: int = 0) -> None:
+        """Persistent cache of bare git mirrors, one for each remote url, reused across runs.
+
+        The first use of a remote clones it with 'git clone --mirror', the next ones only fetch the changes.
+        Each mirror has a lock file: the fetch takes an exclusive lock, while the clones made from the mirror
+        hold a shared one, so concurrent runs never see a mirror while its updating. When the cache is bigger
+        than 'max_size' the least recently used mirrors, not locked by other runs, are removed.
+
+        Args:
+            log (BoundLoggerLazyProxy): Log class to inject into the vars. Class: structlog
+            cache_dir (Path): Directory where store the mirrors.
+            max_size (int): Max size of the cache in bytes, 0 for unlimited.
+
+        Returns:
+            None
+        """
+        self.log = log
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def get_path(self, remote_url: str) -> Path:
+        """Return the path of the mirror of a remote url.
+
+        Args:
+            remote_url (str): Remote git url.
+
+        Returns:
+            Path of the bare mirror inside the cache directory.
+        """
+        return self.cache_dir / f"{sha256(remote_url.encode()).hexdigest()[:24]}.git"
+
+    @contextmanager
+    def checkout(self, remote_url: str, env: dict[str, str]) -> Iterator[TyperMirror]:
+        """Create or update the mirror of a remote and keep it locked, in shared mode, until the exit.
+
+        Args:
+            remote_url (str): Remote git url.
+            env (dict): Environment variables to use for contacting the remote, like GIT_SSH_COMMAND.
+
+        Returns:
+            A context manager that yields a TyperMirror object, 'data' is the mirror path.
+        """
+        out = TyperMirror(error=False, data=None)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self.get_path(remote_url)
+        with path.with_suffix(".lock").open("a") as lockfile:
+            fcntl.flock(lockfile, fcntl.LOCK_EX)
+            try:
+                if (path / "HEAD").exists():
+                    self.log.info(f"Updating the git mirror '{path}' of '{remote_url}'")
+                    mirror = git.Repo(path)
+                    mirror.git.update_environment(**env)
+                    mirror.git.fetch("origin", "--prune")
+                else:
+                    self.log.info(f"Creating the git mirror '{path}' of '{remote_url}'")
+                    rmtree(path, ignore_errors=True)
+                    git.Repo.clone_from(url=remote_url, to_path=path, env=env, mirror=True)
+                os.utime(lockfile.name)
+                out["data"] = str(path)
+            except git.exc.GitCommandError as error:
+                self.log.error(f"Error during updating the git mirror, error: '{error}'")
+                out["error"] = True
+            fcntl.flock(lockfile, fcntl.LOCK_SH)
+            try:
+                yield out
+            finally:
+                fcntl.flock(lockfile, fcntl.LOCK_UN)
+        self.evict()
+
+    def get_size(self, path: Path) -> int:
+        """Return the size on disk of a mirror.
+
+        Args:
+            path (Path): Mirror path.
+
+        Returns:
+            Size in bytes.
+        """
+        return get_dir_size(path=path)
+
+    def evict(self) -> None:
+        """Remove the least recently used mirrors until the cache size is under 'max_size'.
+
+        The mirrors locked by other runs are skipped. The lock files are never removed, so a run waiting
+        for a lock always gets the same file of the one that is evicting the mirror.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if not self.max_size:
+            return
+        lockfiles = sorted(
+            (lockfile for lockfile in self.cache_dir.glob("*.lock") if lockfile.with_suffix(".git").exists()),
+            key=lambda lockfile: lockfile.stat().st_mtime,
+        )
+        sizes = {lockfile: self.get_size(lockfile.with_suffix(".git")) for lockfile in lockfiles}
+        total = sum(sizes.values())
+        for lockpath in lockfiles:
+            if total <= self.max_size:
+                break
+            with lockpath.open("a") as lockfile:
+                try:
+                    fcntl.flock(lockfile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                self.log.info(f"Removing the git mirror '{lockpath.with_suffix('.git')}' from the cache")
+                rmtree(lockpath.with_suffix(".git"), ignore_errors=True)
+                fcntl.flock(lockfile, fcntl.LOCK_UN)
+            total -= sizes[lockpath]
@@ -0,0 +1,112 @@
+"""Stages of a run, each with its own concurrency limit."""
+
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import copy_context
+from threading import BoundedSemaphore
+from types import TracebackType
+from typing import Any, Self
+from structlog._config import BoundLoggerLazyProxy
+
+
+class Pipeline:
+    STAGES = ("registry", "git", "cpu")
+
+    def __init__(self, log: BoundLoggerLazyProxy, registry: int = 8, git: int = 4, cpu: int = 1) -> None:
+        """Scheduler of the stages of a run, so the registry lookups, the git operations and the YAML updates overlap.
+
+        Each stage has its own limit of operations running at the same time, shared by the work submitted to the
+        stage executor and the work running inside a stage in the caller thread. The executors are created when
+        entering the context manager and closed on exit.
+
+        Args:
+            log (BoundLoggerLazyProxy): Log class to inject into the vars. Class: structlog
+            registry (int): Max number of HTTP lookups to the image providers at the same time.
+            git (int): Max number of git network operations (ls-remote, clone, fetch and push) at the same time.
+            cpu (int): Max number of local operations, like parsing and updating the values files, at the same time.
+
+        Returns:
+            None
+        """
+        self.log = log
+        self.limits = {"registry": max(1, registry), "git": max(1, git), "cpu": max(1, cpu)}
+        self.slots = {name: BoundedSemaphore(limit) for name, limit in self.limits.items()}
+        self.executors: dict[str, ThreadPoolExecutor] = {}
+
+    def __enter__(self) -> Self:
+        """Create the executors of the stages.
+
+        Args:
+            None
+
+        Returns:
+            The Pipeline object.
+        """
+        self.executors = {
+            name: ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"uptainer-{name}")
+            for name, limit in self.limits.items()
+        }
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Wait for the work submitted and close the executors.
+
+        Args:
+            exc_type (type): Type of the exception raised inside the context, if any.
+            exc_value (BaseException): Exception raised inside the context, if any.
+            traceback (TracebackType): Traceback of the exception, if any.
+
+        Returns:
+            None
+        """
+        for executor in self.executors.values():
+            executor.shutdown(wait=True)
+        self.executors = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Run the block inside a stage, waiting for a free slot of it.
+
+        Args:
+            name (str): Name of the stage, one of 'registry', 'git' or 'cpu'.
+
+        Returns:
+            A context manager that holds the slot until the exit.
+        """
+        with self.slots[name]:
+            yield
+
+    def run_stage(self, name: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Call a function inside a stage.
+
+        Args:
+            name (str): Name of the stage, one of 'registry', 'git' or 'cpu'.
+            func (Callable): Function to call.
+            *args (Any): Positional arguments of the function.
+            **kwargs (Any): Keyword arguments of the function.
+
+        Returns:
+            The value returned by the function.
+        """
+        with self.stage(name):
+            return func(*args, **kwargs)
+
+    def submit(self, name: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Future[Any]:
+        """Run a function inside a stage in the background, with a copy of the caller context.
+
+        Args:
+            name (str): Name of the stage, one of 'registry', 'git' or 'cpu'.
+            func (Callable): Function to call.
+            *args (Any): Positional arguments of the function.
+            **kwargs (Any): Keyword arguments of the function.
+
+        Returns:
+            The Future of the value returned by the function.
+        """
+        return self.executors[name].submit(copy_context().run, self.run_stage, name, func, *args, **kwargs)
@@ -0,0 +1,250 @@
+"""Profiling of the repos, with cProfile or sampled stacks and tracemalloc snapshots."""
+
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from io import StringIO
+from pathlib import Path
+from threading import Event, Lock, Thread, get_ident
+from time import perf_counter
+from structlog._config import BoundLoggerLazyProxy
+from uptainer.typer import TyperProfileResult
+import cProfile
+import pstats
+import re
+import sys
+import tracemalloc
+
+SAFE_NAME_REGEX = re.compile(r"[^A-Za-z0-9_.-]+")
+MAX_NAME_LENGTH = 100
+TRACEMALLOC_FRAMES = 25
+
+
+class Profiler:
+    MODES = ("cprofile", "sample")
+
+    def __init__(self, log: BoundLoggerLazyProxy, output_dir: Path, mode: str = "cprofile") -> None:
+        """Profiler of the work done for each repo, writing a file for each repo and stage and a merged report.
+
+        With the 'cprofile' mode each block is profiled with cProfile, the blocks run one at a time so the stats
+        of a repo never include the work of the others. With the 'sample' mode the stacks of the threads running
+        a block are sampled every 'interval' seconds and written in the folded format used by the flame graph
+        tools, the blocks keep running concurrently. With 'memory' a tracemalloc snapshot is taken after each
+        block, and the blocks run one at a time in both modes.
+
+        Args:
+            log (BoundLoggerLazyProxy): Log class to inject into the vars. Class: structlog
+            output_dir (Path): Directory where write the profiles and the report.
+            mode (str): "cprofile" or "sample".
+
+        Returns:
+            None
+        """
+        self.log = log
+        self.output_dir = output_dir
+        self.mode = mode
+        self.memory = False
+        self.top = 20
+        self.interval = 0.005
+        self.results: dict[tuple[str, str], TyperProfileResult] = {}
+        self.samples: dict[tuple[str, str], Counter[str]] = {}
+        self.allocations: dict[tuple[str, str], Counter[str]] = {}
+        self.active: dict[int, tuple[str, str]] = {}
+        self.threads: set[int] = set()
+        self.lock = Lock()
+        self.exclusive = Lock()
+        self.sampler: Thread | None = None
+        self.stop_event = Event()
+
+    def get_path(self, name: str, stage: str, suffix: str) -> Path:
+        """Return the path of a profile file.
+
+        Args:
+            name (str): Name of the repo, or of the git group.
+            stage (str): Name of the stage, like "lookup".
+            suffix (str): Suffix of the file, like ".prof".
+
+        Returns:
+            The path inside the output directory.
+        """
+        return self.output_dir / f"{SAFE_NAME_REGEX.sub('_', name)[:MAX_NAME_LENGTH]}.{stage}{suffix}"
+
+    @contextmanager
+    def profile(self, name: str, stage: str) -> Iterator[None]:
+        """Profile a block, writing the profile of the repo and stage when it ends.
+
+        Args:
+            name (str): Name of the repo, or of the git group for the clone and the push.
+            stage (str): Name of the stage, like "lookup", "clone", "apply" or "push".
+
+        Returns:
+            A context manager that profiles the block.
+        """
+        if get_ident() in self.threads:
+            # A block inside another one, like the values files applied again by a rejected push.
+            yield
+            return
+        exclusive = self.mode == "cprofile" or self.memory
+        if exclusive:
+            self.exclusive.acquire()
+        self.threads.add(get_ident())
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        key = (name, stage)
+        profiler = None
+        before = None
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+        if self.mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            self.start_sampling(key=key)
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            seconds = perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(self.get_path(name=name, stage=stage, suffix=".prof"))
+            else:
+                self.stop_sampling(key=key)
+            memory_peak = self.save_memory(key=key, before=before) if before is not None else None
+            with self.lock:
+                self.results[key] = TyperProfileResult(seconds=seconds, memory_peak=memory_peak)
+            self.threads.discard(get_ident())
+            if exclusive:
+                self.exclusive.release()
+
+    def save_memory(self, key: tuple[str, str], before: tracemalloc.Snapshot) -> int:
+        """Write the tracemalloc snapshot taken at the end of a block, keeping the lines that allocated the most.
+
+        Args:
+            key (tuple): (<name>, <stage>) of the block.
+            before (Snapshot): Snapshot taken at the start of the block.
+
+        Returns:
+            The peak of the memory traced during the block, in bytes.
+        """
+        memory_peak = tracemalloc.get_traced_memory()[1]
+        snapshot = tracemalloc.take_snapshot()
+        snapshot.dump(str(self.get_path(name=key[0], stage=key[1], suffix=".tracemalloc")))
+        allocations: Counter[str] = Counter()
+        for stat in snapshot.compare_to(before, "lineno")[: self.top]:
+            if stat.size_diff > 0:
+                allocations[str(stat.traceback[0])] += stat.size_diff
+        with self.lock:
+            self.allocations[key] = allocations
+        return memory_peak
+
+    def start_sampling(self, key: tuple[str, str]) -> None:
+        """Start sampling the stacks of the current thread, starting the sampler thread on the first call.
+
+        Args:
+            key (tuple): (<name>, <stage>) of the block.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.active[get_ident()] = key
+            self.samples[key] = Counter()
+            if self.sampler is None:
+                self.sampler = Thread(target=self.sample, name="uptainer-profiler", daemon=True)
+                self.sampler.start()
+
+    def stop_sampling(self, key: tuple[str, str]) -> None:
+        """Stop sampling the current thread and write the stacks sampled in the folded format.
+
+        Args:
+            key (tuple): (<name>, <stage>) of the block.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.active.pop(get_ident(), None)
+            stacks = dict(self.samples[key])
+        content = "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+        self.get_path(name=key[0], stage=key[1], suffix=".folded").write_text(content)
+
+    def sample(self) -> None:
+        """Sampler thread, it records the stack of each thread running a block every 'interval' seconds.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        while not self.stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            with self.lock:
+                for thread_id, key in self.active.items():
+                    frame = frames.get(thread_id)
+                    stack = []
+                    while frame is not None:
+                        stack.append(f"{Path(frame.f_code.co_filename).name}:{frame.f_code.co_name}")
+                        frame = frame.f_back
+                    if stack:
+                        self.samples[key][";".join(reversed(stack))] += 1
+
+    def close(self) -> None:
+        """Stop the sampler thread.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.stop_event.set()
+
+    def write_report(self) -> Path:
+        """Write the report merging all the profiles: the slowest repos and the top functions and allocations.
+
+        Args:
+            None
+
+        Returns:
+            The path of the report.
+        """
+        with self.lock:
+            results = dict(self.results)
+            samples = {key: Counter(value) for key, value in self.samples.items()}
+            allocations = dict(self.allocations)
+        lines = [f"Profile mode: {self.mode}", "", "Time by repo and stage:"]
+        for (name, stage), result in sorted(results.items(), key=lambda item: -item[1]["seconds"])[: self.top]:
+            memory = ""
+            if result["memory_peak"] is not None:
+                memory = f"  peak {result['memory_peak'] / 1024 / 1024:.1f} MB"
+            lines.append(f"  {result['seconds']:10.3f}s  {name} [{stage}]{memory}")
+        lines.append("")
+        if self.mode == "cprofile":
+            files = [str(self.get_path(name=name, stage=stage, suffix=".prof")) for name, stage in results]
+            buffer = StringIO()
+            if files:
+                pstats.Stats(*files, stream=buffer).sort_stats("cumulative").print_stats(self.top)
+            lines.extend(["Top functions, all the repos:", buffer.getvalue()])
+        else:
+            leaves: Counter[str] = Counter()
+            for stacks in samples.values():
+                for stack, count in stacks.items():
+                    leaves[stack.rsplit(";", maxsplit=1)[-1]] += count
+            lines.append("Top functions by samples, all the repos:")
+            lines.extend(f"  {count:8d}  {function}" for function, count in leaves.most_common(self.top))
+            lines.append("")
+        if allocations:
+            merged: Counter[str] = Counter()
+            for allocation in allocations.values():
+                merged.update(allocation)
+            lines.append("Top allocations, all the repos:")
+            lines.extend(f"  {size / 1024:10.1f} KiB  {line}" for line, size in merged.most_common(self.top))
+        report = self.output_dir / "report.txt"
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        report.write_text("\n".join(lines) + "\n")
+        self.log.info(f"Profile report written to '{report}'")
+        return report
@@ -1 +1,40 @@
 """Providers for getting the info from the external resources."""
+
+from functools import cache
+from importlib import import_module
+from uptainer.providers.baseprovider import BaseProvider
+
+# The provider of each registry hostname, as '<module>.<class>', the module is imported on the first use.
+PROVIDERS = {
+    "docker.io": "uptainer.providers.dockerhub.DockerHub",
+    "ghcr.io": "uptainer.providers.github.GitHub",
+}
+OCI_PROVIDER = "uptainer.providers.oci.OCI"
+
+
+@cache
+def load_provider(path: str) -> type[BaseProvider]:
+    """Import the module of a provider and return its class.
+
+    Args:
+        path (str): Provider like 'uptainer.providers.github.GitHub', a value of PROVIDERS.
+
+    Returns:
+        The class of the provider.
+    """
+    module, _, name = path.rpartition(".")
+    provider_class: type[BaseProvider] = getattr(import_module(module), name)
+    return provider_class
+
+
+def get_provider_class(hostname: str) -> type[BaseProvider] | None:
+    """Return the class of the provider registered for a registry hostname.
+
+    Args:
+        hostname (str): Hostname of the registry, like 'ghcr.io'.
+
+    Returns:
+        The class of the provider, None when no provider is registered for the hostname.
+    """
+    path = PROVIDERS.get(hostname.lower())
+    return load_provider(path) if path else None
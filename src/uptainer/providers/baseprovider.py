@@ -1,5 +1,9 @@
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
 from structlog._config import BoundLoggerLazyProxy
-from uptainer.typer import TyperImageVersion, TyperMetadata, TyperMetadataDict
+from uptainer.metrics import METRICS
+from uptainer.typer import TyperImageVersion, TyperMetadata, TyperMetadataDict, TyperTagPage
 
 
 class BaseProvider:
@@ -13,6 +17,27 @@ class BaseProvider:
             None
         """
         self.name = "Base"
+        self.log = log
+        self.headers: dict[str, str] = {}
+        self.max_pages = 20
+        self.page_size = 100
+        self.page_concurrency = 1
+        self.supports_name_filter = False
+        self.newest_first = True
+
+    def get_request_headers(self, etag: str | None = None) -> dict[str, str]:
+        """Return the headers to use for the first request of a tag list.
+
+        Args:
+            etag (str): ETag of a previous response, sent as 'If-None-Match'.
+
+        Returns:
+            A copy of the provider headers.
+        """
+        headers = dict(self.headers)
+        if etag:
+            headers["If-None-Match"] = etag
+        return headers
 
     def __str__(self) -> str:
         """Return a class string name.
@@ -25,21 +50,162 @@ class BaseProvider:
         """
         return self.name
 
-    def get_image_versions(self, parent: str, project: str) -> TyperImageVersion:
+    def get_cache_name(self) -> str:
+        """Return the name of the provider in the keys of the tag cache.
+
+        Args:
+            None
+
+        Returns:
+            The name of the provider.
+        """
+        return self.name
+
+    def get_tags_url(self, parent: str, project: str, name_filter: str = "") -> str:
+        """Return the url of the first page of tags.
+
+        Args:
+            parent (str): Namespace, User or Orgs of the image.
+            project (str): Project Name
+            name_filter (str): Text that the tag names contain, used only when 'supports_name_filter' is True.
+
+        Returns:
+            The url, with the page size and the newest-first ordering when supported by the API.
+        """
+        return ""
+
+    def get_page(self, url: str, headers: dict[str, str]) -> TyperTagPage:
+        """Request a single page of tags to the Provider API.
+
+        Args:
+            url (str): Url of the page.
+            headers (dict): Headers of the request.
+
+        Returns:
+            TyperTagPage object, with the url of the next page in 'next' (None on the last page) and
+            the total number of pages in 'pages', when the API returns it.
+        """
+        return TyperTagPage(error=False, data=[], next=None, etag=None, not_modified=False, pages=None)
+
+    def get_page_url(self, url: str, number: int) -> str:
+        """Return the url of a specific page, for the APIs where the page urls are predictable.
+
+        Args:
+            url (str): Url of the first page, returned by get_tags_url.
+            number (int): Number of the page, starting from 1.
+
+        Returns:
+            The url of the page.
+        """
+        return f"{url}&page={number}"
+
+    def iter_tag_pages(
+        self, parent: str, project: str, etag: str | None = None, name_filter: str = ""
+    ) -> Iterator[TyperTagPage]:
+        """Lazily iterate over the pages of tags, a page is requested only when the previous one is consumed.
+
+        The iteration stops after an error, a not modified response, the last page or 'max_pages' pages.
+        When the first page returns the total number of pages and 'page_concurrency' is greater than 1,
+        the following pages are requested in parallel batches.
+
+        Args:
+            parent (str): Namespace, User or Orgs of the image.
+            project (str): Project Name
+            etag (str): ETag of a previous response, sent with the first page request.
+            name_filter (str): Text that the tag names contain, the filter is applied by the provider API
+                when 'supports_name_filter' is True.
+
+        Returns:
+            A generator of TyperTagPage objects.
+        """
+        self.log.info(f"Getting image versions from {self.name} for the User/Orgs: '{parent}' and project: '{project}'")
+        url = self.get_tags_url(parent=parent, project=project, name_filter=name_filter)
+        page = self.fetch_page(url=url, headers=self.get_request_headers(etag=etag))
+        yield page
+        if page["error"] or page["not_modified"]:
+            return
+        if page["pages"] and self.page_concurrency > 1:
+            yield from self.iter_pages_concurrently(url=url, pages=min(page["pages"], self.max_pages))
+            return
+        for _ in range(self.max_pages - 1):
+            if page["next"] is None:
+                return
+            page = self.fetch_page(url=page["next"], headers=self.headers)
+            yield page
+            if page["error"]:
+                return
+
+    def fetch_page(self, url: str, headers: dict[str, str]) -> TyperTagPage:
+        """Request a single page of tags with get_page, measuring it.
+
+        Args:
+            url (str): Url of the page.
+            headers (dict): Headers of the request.
+
+        Returns:
+            TyperTagPage object returned by get_page.
+        """
+        with METRICS.span(log=self.log, stage="provider_page", provider=self.name):
+            page = self.get_page(url=url, headers=headers)
+        METRICS.inc("provider_pages_total", provider=self.name)
+        return page
+
+    def iter_pages_concurrently(self, url: str, pages: int) -> Iterator[TyperTagPage]:
+        """Request the pages after the first one in parallel, 'page_concurrency' pages at a time.
+
+        The pages are yielded in order and the next batch is requested only when the previous one has been
+        consumed, so a consumer that stops early doesn't pay all the remaining pages. The threads of a batch
+        are released before its pages are yielded, so a consumer that waits doesn't keep them idle.
+
+        Args:
+            url (str): Url of the first page, returned by get_tags_url.
+            pages (int): Total number of pages to get.
+
+        Returns:
+            A generator of TyperTagPage objects, from the page 2.
+        """
+        numbers = list(range(2, pages + 1))
+        for start in range(0, len(numbers), self.page_concurrency):
+            batch = numbers[start : start + self.page_concurrency]
+            with ThreadPoolExecutor(max_workers=len(batch)) as executor:
+                futures = [
+                    executor.submit(
+                        copy_context().run, self.fetch_page, self.get_page_url(url=url, number=number), self.headers
+                    )
+                    for number in batch
+                ]
+                results = [future.result() for future in futures]
+            for page in results:
+                yield page
+                if page["error"]:
+                    return
+
+    def get_image_versions(self, parent: str, project: str, etag: str | None = None) -> TyperImageVersion:
         """Query the Provider API in order to get the images version availables and return a list of it.
 
         Args:
             parent (str): Namespace or User in DockerHub
             project (str): Project Name
+            etag (str): ETag of a previous response, when the tags are not changed 'not_modified' is True.
 
         Returns:
             Return a dict that have image metadata like:
             {"error": <bool>, "data": [
                 {"last_update": "<datetime object>",
-                 "name": ['<version1>', ...]},]
+                 "name": ['<version1>', ...]},],
+             "etag": "<etag of the first page>", "not_modified": <bool>
             }
         """
-        return TyperImageVersion(error=False, data=[])
+        out = TyperImageVersion(error=False, data=[])
+        for idx, page in enumerate(self.iter_tag_pages(parent=parent, project=project, etag=etag)):
+            if idx == 0:
+                out["etag"] = page["etag"]
+                out["not_modified"] = page["not_modified"]
+            if page["error"]:
+                out["error"] = True
+                break
+            out["data"].extend(page["data"])
+        return out
 
     def get_metadata(self, image_repository: str) -> TyperMetadata:
         """Getting the Provider metadata like user and orgs.
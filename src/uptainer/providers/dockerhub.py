@@ -1,10 +1,11 @@
 from os import getenv
 from structlog._config import BoundLoggerLazyProxy
 from datetime import datetime
-from uptainer.typer import TyperImageVersion, TyperMetadata
-from urllib.parse import urlparse
+from math import ceil
+from uptainer.typer import TyperMetadata, TyperTagPage
+from urllib.parse import quote, urlparse
 from .baseprovider import BaseProvider
-import requests
+from .session import get_session
 
 
 class DockerHub(BaseProvider):
@@ -17,54 +18,76 @@ class DockerHub(BaseProvider):
         Returns:
             None
         """
-        self.endpoint = "https://hub.docker.com"
+        self.endpoint = getenv("DOCKERHUB_API_ENDPOINT", default="https://hub.docker.com").rstrip("/")
         self.headers = {}
         self.name = "DockerHub"
         auth_token = getenv("DOCKERHUB_API_TOKEN", default=None)
         self.log = log
+        self.session = get_session(name=self.name, log=log)
         self.max_pages = 20
+        self.page_size = int(getenv("DOCKERHUB_PAGE_SIZE", default="100"))
+        self.page_concurrency = int(getenv("DOCKERHUB_PAGE_CONCURRENCY", default="4"))
+        self.supports_name_filter = True
+        self.newest_first = True
         if auth_token:
             self.headers["Authorization"] = f"Bearer {auth_token}"
         else:
             self.log.warning("DockerHub Token not found. Using anonymous access.")
 
-    def get_image_versions(self, parent: str, project: str) -> TyperImageVersion:
-        """Query the DockerHub API in order to get the images version availables and return a list of it.
+    def get_tags_url(self, parent: str, project: str, name_filter: str = "") -> str:
+        """Return the url of the first page of tags, ordered by the last update.
 
         Args:
             parent (str): Namespace or User in DockerHub
             project (str): Project Name
+            name_filter (str): Text that the tag names contain, sent as the 'name' filter of the API.
 
         Returns:
-            Return a dict that have image metadata like:
-            {'error': <bool>, 'data': [{'last_update': '<datetime object>", 'name': ['<version1>', ...]},]}
+            The url of the DockerHub tags API.
+        """
+        url = (
+            f"{self.endpoint}/v2/namespaces/{parent}/repositories/{project}/tags"
+            f"?page_size={self.page_size}&ordering=last_updated"
+        )
+        if name_filter:
+            url += f"&name={quote(name_filter)}"
+        return url
+
+    def get_page(self, url: str, headers: dict[str, str]) -> TyperTagPage:
+        """Request a single page of tags to the DockerHub API.
+
+        Args:
+            url (str): Url of the page.
+            headers (dict): Headers of the request.
+
+        Returns:
+            TyperTagPage object like:
+            {'error': <bool>, 'data': [{'last_update': '<datetime object>", 'name': '<version>'},],
+             'next': '<next page url>', 'etag': '<etag>', 'not_modified': <bool>, 'pages': <total pages>}
         """
         STATUS_CODE_OK = 200
-        out = TyperImageVersion({"error": False, "data": []})
-        endpoint = f"{self.endpoint}/v2/namespaces/{parent}/repositories/{project}/tags"
-        self.log.info(f"Getting image versions from DockerHub for the User/Orgs: {parent} and project: {project}")
-        # Get Page 1
-        req = requests.get(endpoint, headers=self.headers)
-        tmpdb = []
-        if req.status_code == STATUS_CODE_OK:
+        STATUS_CODE_NOT_MODIFIED = 304
+        out = TyperTagPage(error=False, data=[], next=None, etag=None, not_modified=False, pages=None)
+        self.log.debug(f"Getting {url}")
+        req = self.session.get(url, headers=headers)
+        if req is None:
+            self.log.error("Error during getting image, the provider is not reachable.")
+            out["error"] = True
+        elif req.status_code == STATUS_CODE_NOT_MODIFIED:
+            self.log.debug(f"Returned Status code {STATUS_CODE_NOT_MODIFIED}")
+            out["not_modified"] = True
+            out["etag"] = headers.get("If-None-Match")
+        elif req.status_code == STATUS_CODE_OK:
             self.log.debug(f"Returned Status code {STATUS_CODE_OK}")
-            for item in req.json()["results"]:
-                tmpdb.append(item)
-            if req.json()["next"] is not None:
-                self.log.info("The response contains a pagination, starting iteration over it.")
-                for page in range(0, self.max_pages - 1):
-                    iter_endpoint = req.json()["next"]
-                    self.log.debug(f"Getting {iter_endpoint}")
-                    req = requests.get(iter_endpoint, headers=self.headers)
-                    for item in req.json()["results"]:
-                        tmpdb.append(item)
-                    if req.json()["next"] is None:
-                        break
-            for item in tmpdb:
+            content = req.json()
+            out["etag"] = req.headers.get("ETag")
+            out["next"] = content["next"]
+            out["pages"] = ceil(content["count"] / self.page_size) if content.get("count") else None
+            for item in content["results"]:
                 itemdate = datetime.strptime(item["last_updated"].split(".")[0], "%Y-%m-%dT%H:%M:%S")
                 out["data"].append({"last_update": itemdate, "name": item["name"]})
         else:
-            self.log.error(f"Error during getting image, returns: {req.json()}")
+            self.log.error(f"Error during getting image, returns: {req.status_code} {req.text[:500]}")
             out["error"] = True
         return out
 
@@ -1,9 +1,10 @@
 from os import getenv
 from structlog._config import BoundLoggerLazyProxy
-from datetime import datetime
-from uptainer.typer import TyperImageVersion, TyperMetadata
+from datetime import UTC, datetime
+from urllib.parse import parse_qs, urlparse
+from uptainer.typer import TyperMetadata, TyperPackagesUpdated, TyperTagPage
 from .baseprovider import BaseProvider
-import requests
+from .session import get_session
 
 
 class GitHub(BaseProvider):
@@ -16,62 +17,109 @@ class GitHub(BaseProvider):
         Returns:
             None
         """
-        self.endpoint = "https://api.github.com"
+        self.endpoint = getenv("GITHUB_API_ENDPOINT", default="https://api.github.com").rstrip("/")
         self.name = "GitHub"
         self.max_pages = 20
+        self.page_size = int(getenv("GITHUB_PAGE_SIZE", default="100"))
+        self.page_concurrency = int(getenv("GITHUB_PAGE_CONCURRENCY", default="4"))
+        self.supports_name_filter = False
+        self.newest_first = True
         self.headers = {
             "Accept": "application/vnd.github+json",
             "X-GitHub-Api-Version": "2022-11-28",
         }
         auth_token = getenv("GITHUB_API_TOKEN", default=None)
         self.log = log
+        self.session = get_session(name=self.name, log=log)
         if auth_token:
             self.headers["Authorization"] = f"Bearer {auth_token}"
         else:
             self.log.error("Github Token needed for getting the information from Github.")
             return
 
-    def get_image_versions(self, parent: str, project: str) -> TyperImageVersion:
-        """Query the Github API in order to get the images version availables and return a list of it.
+    def get_tags_url(self, parent: str, project: str, name_filter: str = "") -> str:
+        """Return the url of the first page of package versions, the API returns the newest first.
 
         Args:
             parent (str): User or Orgs on Github
             project (str): Project Name on GitHub
+            name_filter (str): Not supported by the GitHub packages API, ignored.
 
         Returns:
-            Return a dict that have image metadata like:
-            {"error": <bool>, "data": [{"last_update": "<datetime object>", "name": ['<version1>', ...]},]}
+            The url of the GitHub packages API.
+        """
+        return f"{self.endpoint}/users/{parent}/packages/container/{project}/versions?per_page={self.page_size}"
+
+    def get_page(self, url: str, headers: dict[str, str]) -> TyperTagPage:
+        """Request a single page of package versions to the GitHub API, the untagged versions are skipped.
+
+        Args:
+            url (str): Url of the page.
+            headers (dict): Headers of the request.
+
+        Returns:
+            TyperTagPage object like:
+            {"error": <bool>, "data": [{"last_update": "<datetime object>", "name": ['<version1>', ...]},],
+             "next": "<next page url from the Link header>", "etag": "<etag>", "not_modified": <bool>,
+             "pages": <total pages from the Link header>}
         """
         STATUS_CODE_OK = 200
-        out = TyperImageVersion({"error": False, "data": []})
-        endpoint = f"{self.endpoint}/users/{parent}/packages/container/{project}/versions"
-        self.log.info(f"Getting image versions from GitHub for the User/Orgs: '{parent}' and project: '{project}'")
-        req = requests.get(endpoint, headers=self.headers)
-        tmpdb = []
-        if req.status_code == STATUS_CODE_OK:
+        STATUS_CODE_NOT_MODIFIED = 304
+        out = TyperTagPage(error=False, data=[], next=None, etag=None, not_modified=False, pages=None)
+        self.log.debug(f"Getting {url}")
+        req = self.session.get(url, headers=headers)
+        if req is None:
+            self.log.error("Error during getting image, the provider is not reachable.")
+            out["error"] = True
+        elif req.status_code == STATUS_CODE_NOT_MODIFIED:
+            self.log.debug(f"Returned Status code {STATUS_CODE_NOT_MODIFIED}")
+            out["not_modified"] = True
+            out["etag"] = headers.get("If-None-Match")
+        elif req.status_code == STATUS_CODE_OK:
             self.log.debug(f"Returned Status code {STATUS_CODE_OK}")
+            out["etag"] = req.headers.get("ETag")
+            out["next"] = req.links.get("next", {}).get("url")
+            last_page = parse_qs(urlparse(req.links.get("last", {}).get("url", "")).query).get("page")
+            out["pages"] = int(last_page[0]) if last_page else None
             for item in req.json():
                 if item["metadata"]["container"]["tags"]:
-                    tmpdb.append(item)
-            if "Link" in req.headers:
-                self.log.info("The response contains a pagination, starting iteration over it.")
-                for page in range(0, self.max_pages - 1):
-                    iter_endpoint = req.headers["Link"].split("<")[1].split(">")[0]
-                    self.log.debug(f"Getting {iter_endpoint}")
-                    req = requests.get(iter_endpoint, headers=self.headers)
-                    for item in req.json():
-                        if item["metadata"]["container"]["tags"]:
-                            tmpdb.append(item)
-                    if "Link" not in req.headers:
-                        break
-            for item in tmpdb:
-                itemdate = datetime.strptime(item["updated_at"].replace("Z", ""), "%Y-%m-%dT%H:%M:%S")
-                out["data"].append({"last_update": itemdate, "name": item["metadata"]["container"]["tags"]})
+                    itemdate = datetime.strptime(item["updated_at"].replace("Z", ""), "%Y-%m-%dT%H:%M:%S")
+                    out["data"].append({"last_update": itemdate, "name": item["metadata"]["container"]["tags"]})
         else:
-            self.log.error(f"Error during getting image, returns: {req.json()}")
+            self.log.error(f"Error during getting image, returns: {req.status_code} {req.text[:500]}")
             out["error"] = True
         return out
 
+    def get_packages_updated(self, parent: str) -> TyperPackagesUpdated:
+        """Return when each container package of a user or org has been updated, with one request for 100 packages.
+
+        A package is updated when a version is pushed or removed, so its versions are unchanged since then.
+
+        Args:
+            parent (str): User or Orgs on Github
+
+        Returns:
+            TyperPackagesUpdated object like: {"error": <bool>, "data": {"<project name>": <epoch of the update>}}
+        """
+        STATUS_CODE_OK = 200
+        out = TyperPackagesUpdated(error=False, data={})
+        url = f"{self.endpoint}/users/{parent}/packages?package_type=container&per_page=100"
+        for _ in range(self.max_pages):
+            self.log.debug(f"Getting {url}")
+            req = self.session.get(url, headers=self.headers)
+            if req is None or req.status_code != STATUS_CODE_OK:
+                self.log.warning(f"Error during listing the packages of '{parent}', they are checked one by one.")
+                out["error"] = True
+                return out
+            for item in req.json():
+                updated = datetime.strptime(item["updated_at"].replace("Z", ""), "%Y-%m-%dT%H:%M:%S")
+                out["data"][item["name"]] = updated.replace(tzinfo=UTC).timestamp()
+            next_url = req.links.get("next", {}).get("url")
+            if not next_url:
+                break
+            url = next_url
+        return out
+
     def get_metadata(self, image_repository: str) -> TyperMetadata:
         """Getting the GitHub metadata like user and orgs.
 
@@ -0,0 +1,208 @@
+from os import getenv
+from datetime import datetime
+from threading import Lock
+from time import time
+from structlog._config import BoundLoggerLazyProxy
+from urllib.parse import quote, urljoin
+from uptainer.typer import TyperMetadata, TyperOCIToken, TyperTagPage
+from .baseprovider import BaseProvider
+from .session import get_session
+import re
+import requests
+
+TOKENS: dict[tuple[str, str], TyperOCIToken] = {}
+TOKENS_LOCK = Lock()
+CHALLENGE_REGEX = re.compile(r'(\w+)="([^"]*)"')
+IMAGE_REGEX = re.compile(r"/v2/(.+)/tags/list")
+
+
+class OCI(BaseProvider):
+    STATUS_CODE_OK = 200
+    STATUS_CODE_NOT_MODIFIED = 304
+    STATUS_CODE_UNAUTHORIZED = 401
+
+    def __init__(self, log: BoundLoggerLazyProxy, registry: str) -> None:
+        """Provider for any registry that implements the OCI distribution API, like Harbor, Quay or ghcr.io.
+
+        The tags are listed with the '/v2/<name>/tags/list' endpoint, paginated with 'n' and 'last'. When the
+        registry asks for a bearer token, it's requested to the realm of the 'WWW-Authenticate' challenge and
+        cached, per registry and scope, until it expires.
+
+        Args:
+            log (BoundLoggerLazyProxy): Log class to inject into the vars. Class: structlog
+            registry (str): Hostname of the registry, with the port if any.
+
+        Returns:
+            None
+        """
+        insecure = [item.strip() for item in getenv("OCI_INSECURE_REGISTRIES", default="").split(",") if item]
+        self.registry = registry
+        self.endpoint = f"{'http' if registry in insecure else 'https'}://{registry}"
+        self.name = "OCI"
+        self.headers = {}
+        self.log = log
+        self.session = get_session(name=f"{self.name}/{registry}", log=log)
+        self.max_pages = 20
+        self.page_size = int(getenv("OCI_PAGE_SIZE", default="1000"))
+        self.page_concurrency = 1
+        self.supports_name_filter = False
+        self.newest_first = False
+        self.username = getenv("OCI_USERNAME", default=None)
+        self.password = getenv("OCI_PASSWORD", default=None)
+
+    def get_cache_name(self) -> str:
+        """Return the name of the provider in the keys of the tag cache, the same image can be on many registries.
+
+        Args:
+            None
+
+        Returns:
+            The name of the provider with the registry, like 'OCI/quay.io'.
+        """
+        return f"{self.name}/{self.registry}"
+
+    def get_tags_url(self, parent: str, project: str, name_filter: str = "") -> str:
+        """Return the url of the first page of tags.
+
+        Args:
+            parent (str): Namespace of the image, can contain slashes, empty when the image has none.
+            project (str): Project Name
+            name_filter (str): Not supported by the OCI distribution API, ignored.
+
+        Returns:
+            The url of the tags list endpoint.
+        """
+        name = f"{parent}/{project}" if parent else project
+        return f"{self.endpoint}/v2/{name}/tags/list?n={self.page_size}"
+
+    def get_token(self, challenge: str) -> str | None:
+        """Return a bearer token for the challenge of the registry, from the cache when not expired.
+
+        Args:
+            challenge (str): Value of the 'WWW-Authenticate' header, like
+                'Bearer realm="https://<host>/token",service="<host>",scope="repository:<name>:pull"'.
+
+        Returns:
+            The token, None when the registry doesn't return it.
+        """
+        params = dict(CHALLENGE_REGEX.findall(challenge))
+        if not challenge.lower().startswith("bearer") or "realm" not in params:
+            self.log.error(f"Authentication not supported by the registry '{self.registry}': {challenge}")
+            return None
+        scope = params.get("scope", "")
+        cached = self.get_cached_token(scope=scope)
+        if cached:
+            return cached
+        self.log.debug(f"Requesting a token to '{params['realm']}' for the scope '{scope}'")
+        auth = (self.username, self.password) if self.username and self.password else None
+        query = {name: params[name] for name in ("service", "scope") if name in params}
+        req = self.session.get(params["realm"], params=query, auth=auth)
+        if req is None or req.status_code != self.STATUS_CODE_OK:
+            self.log.error(f"Error during getting the token from '{params['realm']}'")
+            return None
+        content = req.json()
+        token = str(content.get("token") or content.get("access_token") or "")
+        if not token:
+            return None
+        # Expire the token a bit before the registry does, the minimum lifetime in the spec is 60 seconds.
+        expires_at = time() + max(int(content.get("expires_in", 60)) - 10, 0)
+        with TOKENS_LOCK:
+            TOKENS[(self.registry, scope)] = TyperOCIToken(token=token, expires_at=expires_at)
+        return token
+
+    def get_cached_token(self, scope: str) -> str | None:
+        """Return the token already cached for a scope of the registry, if not expired.
+
+        Args:
+            scope (str): Scope of the token, like 'repository:<name>:pull'.
+
+        Returns:
+            The token, None when not cached or expired.
+        """
+        with TOKENS_LOCK:
+            cached = TOKENS.get((self.registry, scope))
+        return cached["token"] if cached and cached["expires_at"] > time() else None
+
+    def request(self, url: str, headers: dict[str, str]) -> requests.Response | None:
+        """Send a request to the registry, authenticating it with a bearer token when asked.
+
+        A token already cached for the pull scope of the image is sent from the first request.
+
+        Args:
+            url (str): Url to request.
+            headers (dict): Headers of the request.
+
+        Returns:
+            The response, None when the registry is not reachable.
+        """
+        image = IMAGE_REGEX.search(url)
+        token = self.get_cached_token(scope=f"repository:{image.group(1)}:pull") if image else None
+        if token:
+            headers = {**headers, "Authorization": f"Bearer {token}"}
+        req = self.session.get(url, headers=headers)
+        if req is not None and req.status_code == self.STATUS_CODE_UNAUTHORIZED:
+            token = self.get_token(challenge=req.headers.get("WWW-Authenticate", ""))
+            if token:
+                req = self.session.get(url, headers={**headers, "Authorization": f"Bearer {token}"})
+        return req
+
+    def get_page(self, url: str, headers: dict[str, str]) -> TyperTagPage:
+        """Request a single page of tags to the registry.
+
+        The tags list has no dates, so 'last_update' is always the epoch and the tags are in lexical order.
+
+        Args:
+            url (str): Url of the page.
+            headers (dict): Headers of the request.
+
+        Returns:
+            TyperTagPage object like:
+            {"error": <bool>, "data": [{"last_update": "<epoch>", "name": '<version>'},],
+             "next": "<next page url>", "etag": "<etag>", "not_modified": <bool>, "pages": None}
+        """
+        out = TyperTagPage(error=False, data=[], next=None, etag=None, not_modified=False, pages=None)
+        self.log.debug(f"Getting {url}")
+        req = self.request(url=url, headers=headers)
+        if req is None:
+            self.log.error("Error during getting image, the provider is not reachable.")
+            out["error"] = True
+        elif req.status_code == self.STATUS_CODE_NOT_MODIFIED:
+            self.log.debug(f"Returned Status code {self.STATUS_CODE_NOT_MODIFIED}")
+            out["not_modified"] = True
+            out["etag"] = headers.get("If-None-Match")
+        elif req.status_code == self.STATUS_CODE_OK:
+            self.log.debug(f"Returned Status code {self.STATUS_CODE_OK}")
+            out["etag"] = req.headers.get("ETag")
+            tags = req.json().get("tags") or []
+            out["data"] = [{"last_update": datetime.fromtimestamp(0), "name": tag} for tag in tags]
+            if "next" in req.links:
+                out["next"] = urljoin(url, req.links["next"]["url"])
+            elif len(tags) >= self.page_size:
+                out["next"] = f"{url.split('&last=', maxsplit=1)[0]}&last={quote(tags[-1])}"
+        else:
+            self.log.error(f"Error during getting image, returns: {req.status_code} {req.text[:500]}")
+            out["error"] = True
+        return out
+
+    def get_metadata(self, image_repository: str) -> TyperMetadata:
+        """Getting the image name on the registry.
+
+        Args:
+            image_repository (str): Image like '<registry>/<namespace>/<project>' or '<registry>/<project>', the
+                namespace can contain slashes.
+
+        Returns:
+            Return a dict that have image metadata like:
+            {"error": <bool>, "data": {"parent": "<namespace>", "project": "<project name>"}}
+        """
+        out = TyperMetadata({"error": False, "data": {"parent": "", "project": ""}})
+        self.log.info(f"Getting Metadata from '{self.registry}'")
+        MIN_SPLITSLASHES = 2
+        ir_split = image_repository.replace("https://", "").replace("http://", "").split("/")
+        if len(ir_split) < MIN_SPLITSLASHES or ir_split[0] != self.registry or not ir_split[-1]:
+            self.log.error(f"The image repository is not in the format '{self.registry}/[<namespace>/]<project>'.")
+            out["error"] = True
+            return out
+        out["data"]["parent"] = "/".join(ir_split[1:-1])
+        out["data"]["project"] = ir_split[-1]
+        return out
@@ -0,0 +1,176 @@
+"""HTTP session shared by all the objects of the same provider."""
+
+from datetime import datetime, UTC
+from email.utils import parsedate_to_datetime
+from random import uniform
+from threading import Lock
+from time import sleep, time
+from typing import Any
+from structlog._config import BoundLoggerLazyProxy
+from uptainer.metrics import METRICS
+from requests.adapters import HTTPAdapter
+import requests
+
+SESSIONS: dict[str, "ProviderSession"] = {}
+SESSIONS_LOCK = Lock()
+
+
+def get_session(name: str, log: BoundLoggerLazyProxy) -> "ProviderSession":
+    """Return the session of the provider, creating it on the first call.
+
+    Args:
+        name (str): Name of the provider, like "GitHub".
+        log (BoundLoggerLazyProxy): Log class to inject into the vars. Class: structlog
+
+    Returns:
+        ProviderSession object shared by all the callers with the same name.
+    """
+    with SESSIONS_LOCK:
+        if name not in SESSIONS:
+            SESSIONS[name] = ProviderSession(log=log, name=name)
+        return SESSIONS[name]
+
+
+class ProviderSession:
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+    STATUS_CODE_FORBIDDEN = 403
+
+    def __init__(self, log: BoundLoggerLazyProxy, name: str, pool_size: int = 10) -> None:
+        """Pooled HTTP session, with retries and rate limit handling, used by the providers.
+
+        The failed requests (connection errors, 429 and 5xx) are retried with a jittered exponential backoff,
+        waiting the 'Retry-After' header when present. The rate limit headers ('X-RateLimit-*' or 'RateLimit-*')
+        are tracked, when the remaining quota goes under 'quota_threshold' the requests are spread until the
+        reset of the quota instead of hitting the limit.
+
+        Args:
+            log (BoundLoggerLazyProxy): Log class to inject into the vars. Class: structlog
+            name (str): Name of the provider, used in the logs.
+            pool_size (int): Max number of connections kept open.
+
+        Returns:
+            None
+        """
+        self.log = log
+        self.name = name
+        self.max_retries = 5
+        self.timeout = 30.0
+        self.backoff = 1.0
+        self.max_backoff = 60.0
+        self.quota_threshold = 10
+        self.quota_remaining: int | None = None
+        self.quota_reset: float | None = None
+        self.lock = Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get_backoff(self, attempt: int, response: requests.Response | None = None) -> float:
+        """Return the seconds to wait before the next attempt.
+
+        Args:
+            attempt (int): Number of the failed attempt, starting from 0.
+            response (requests.Response): Response of the failed attempt, if any.
+
+        Returns:
+            Seconds to wait, from the 'Retry-After' header if present, otherwise a jittered exponential backoff.
+        """
+        if response is not None and "Retry-After" in response.headers:
+            retry_after = response.headers["Retry-After"]
+            try:
+                seconds = float(retry_after)
+            except ValueError:
+                try:
+                    seconds = parsedate_to_datetime(retry_after).timestamp() - time()
+                except (TypeError, ValueError):
+                    seconds = self.backoff
+            return min(max(seconds, 0), self.max_backoff)
+        return uniform(0, min(self.backoff * 2**attempt, self.max_backoff))
+
+    def update_quota(self, response: requests.Response) -> None:
+        """Read the rate limit headers of the response and save the quota state.
+
+        Both the GitHub format ('X-RateLimit-Remaining' and 'X-RateLimit-Reset' as epoch) and the
+        IETF draft used by DockerHub ('RateLimit-Remaining: 100;w=21600' and 'RateLimit-Reset' as
+        seconds) are supported.
+
+        Args:
+            response (requests.Response): Response to read.
+
+        Returns:
+            None
+        """
+        headers = response.headers
+        remaining = headers.get("X-RateLimit-Remaining", headers.get("RateLimit-Remaining"))
+        if remaining is None:
+            return
+        try:
+            quota_remaining = int(remaining.split(";")[0])
+            if "X-RateLimit-Reset" in headers:
+                quota_reset: float | None = float(headers["X-RateLimit-Reset"])
+            elif "RateLimit-Reset" in headers:
+                quota_reset = time() + float(headers["RateLimit-Reset"].split(";")[0])
+            else:
+                quota_reset = None
+        except ValueError:
+            return
+        with self.lock:
+            self.quota_remaining = quota_remaining
+            self.quota_reset = quota_reset
+        METRICS.set("provider_quota_remaining", quota_remaining, provider=self.name)
+
+    def throttle(self) -> None:
+        """Wait before sending a request when the remaining quota is under the threshold.
+
+        The time left until the quota reset is spread across the remaining requests.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        with self.lock:
+            remaining = self.quota_remaining
+            reset = self.quota_reset
+        if remaining is None or reset is None or remaining > self.quota_threshold:
+            return
+        wait = min((reset - time()) / max(remaining, 1), self.max_backoff)
+        if wait > 0:
+            reset_date = datetime.fromtimestamp(reset, tz=UTC).isoformat()
+            self.log.warning(
+                f"{self.name} quota almost exhausted ({remaining} left until {reset_date}), waiting {wait:.1f}s"
+            )
+            sleep(wait)
+
+    def get(self, url: str, headers: dict[str, str] | None = None, **kwargs: Any) -> requests.Response | None:
+        """Send a GET request, retrying it when fails.
+
+        Args:
+            url (str): Url to request.
+            headers (dict): Headers of the request.
+            kwargs (Any): Other arguments given to requests.Session.get
+
+        Returns:
+            The last response received, None when the request never reached the server.
+        """
+        response = None
+        for attempt in range(self.max_retries + 1):
+            self.throttle()
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                response = None
+                self.log.warning(f"Request to '{url}' failed, error: '{error}'")
+            else:
+                self.update_quota(response)
+                rate_limited = response.status_code == self.STATUS_CODE_FORBIDDEN and self.quota_remaining == 0
+                if response.status_code not in self.RETRY_STATUS_CODES and not rate_limited:
+                    return response
+                self.log.warning(f"Request to '{url}' returned status code {response.status_code}")
+            if attempt < self.max_retries:
+                wait = self.get_backoff(attempt=attempt, response=response)
+                self.log.info(f"Retrying in {wait:.1f}s ({attempt + 1}/{self.max_retries})")
+                sleep(wait)
+        return response
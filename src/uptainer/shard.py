@@ -0,0 +1,52 @@
+"""Split of the repos across many runners, each one running the repos of its own shard."""
+
+from hashlib import sha256
+from re import fullmatch
+
+
+def parse_shard(value: str) -> tuple[int, int] | None:
+    """Parse a shard given like '2/5'.
+
+    Args:
+        value (str): Shard as '<index>/<count>', the index starts from 1.
+
+    Returns:
+        A tuple like (<index>, <count>), None when the value is not valid.
+    """
+    match = fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", value)
+    if match is None:
+        return None
+    index, count = int(match.group(1)), int(match.group(2))
+    if count < 1 or not 1 <= index <= count:
+        return None
+    return index, count
+
+
+def get_shard(key: str, count: int) -> int:
+    """Return the shard of a key, with rendezvous hashing.
+
+    Each shard gives the key a score hashing them together, and the key goes to the shard with the highest one.
+    The assignment depends only on the key and the number of shards, so it's the same on every runner, and
+    when a shard is added only the keys that now score highest on it move there, about 1/count of them; when
+    a shard is removed only its keys move.
+
+    Args:
+        key (str): Key to assign, like the git remote url.
+        count (int): Number of shards.
+
+    Returns:
+        The shard of the key, starting from 1.
+    """
+    return max(range(1, count + 1), key=lambda shard: sha256(f"{shard}:{key}".encode()).digest())
+
+
+def get_shard_key(git_ssh_url: str) -> str:
+    """Return the key of a git remote, so the repos of the same remote always go to the same shard.
+
+    Args:
+        git_ssh_url (str): Git remote url of the repo.
+
+    Returns:
+        The url without the trailing slashes and '.git' suffix.
+    """
+    return git_ssh_url.strip().rstrip("/").removesuffix(".git")
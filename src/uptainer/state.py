@@ -0,0 +1,108 @@
+from pathlib import Path
+from threading import Lock
+from time import time
+from structlog._config import BoundLoggerLazyProxy
+from uptainer.config import Config
+from uptainer.typer import TyperRepoState
+import sqlite3
+
+
+class StateStore:
+    def __init__(self, log: BoundLoggerLazyProxy, db_file: Path) -> None:
+        """Persistent state of the repos between runs, saved on a SQLite database.
+
+        For each repo of the config it records the last upstream version detected, the SHA of the remote
+        branch after the run and the version written into the values file. When both the upstream version
+        and the remote branch are not changed, the repo doesn't need to be cloned again.
+
+        Args:
+            log (BoundLoggerLazyProxy): Log class to inject into the vars. Class: structlog
+            db_file (Path): SQLite database file, created if not exists.
+
+        Returns:
+            None
+        """
+        self.log = log
+        self.db_file = db_file
+        self.lock = Lock()
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS repos ("
+                "key TEXT PRIMARY KEY, upstream_version TEXT, remote_sha TEXT, current_version TEXT, updated_at REAL)"
+            )
+
+    def get_key(self, config: Config) -> str:
+        """Return the key that identify a repo of the config.
+
+        Args:
+            config (Config): Config of the repo.
+
+        Returns:
+            The key, made by all the settings that affect the values file to update.
+        """
+        return "|".join(
+            str(item)
+            for item in (
+                config.name,
+                config.git_ssh_url,
+                config.git_branch,
+                config.git_values_filename,
+                config.values_key,
+            )
+        )
+
+    def get(self, config: Config) -> TyperRepoState | None:
+        """Return the state saved of a repo.
+
+        Args:
+            config (Config): Config of the repo.
+
+        Returns:
+            TyperRepoState object, None when the repo has never been run.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT upstream_version, remote_sha, current_version FROM repos WHERE key = ?", (self.get_key(config),)
+            ).fetchone()
+        if row is None:
+            return None
+        return TyperRepoState(upstream_version=row[0], remote_sha=row[1], current_version=row[2])
+
+    def set(self, config: Config, state: TyperRepoState) -> None:
+        """Save the state of a repo.
+
+        Args:
+            config (Config): Config of the repo.
+            state (TyperRepoState): State to save.
+
+        Returns:
+            None
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO repos (key, upstream_version, remote_sha, current_version, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    self.get_key(config),
+                    state["upstream_version"],
+                    state["remote_sha"],
+                    state["current_version"],
+                    time(),
+                ),
+            )
+
+    def is_unchanged(self, config: Config, upstream_version: str, remote_sha: str) -> bool:
+        """Check if the upstream version and the remote branch are the same of the last run.
+
+        Args:
+            config (Config): Config of the repo.
+            upstream_version (str): Version detected on the image provider.
+            remote_sha (str): Current SHA of the remote branch.
+
+        Returns:
+            True when the repo can be skipped.
+        """
+        state = self.get(config)
+        return state is not None and state["upstream_version"] == upstream_version and state["remote_sha"] == remote_sha
@@ -1,7 +1,9 @@
-from typing import TypedDict, Any
-from re import Match
+from typing import TYPE_CHECKING, TypedDict, Any, NotRequired
 from datetime import datetime
 
+if TYPE_CHECKING:
+    from uptainer.providers.baseprovider import BaseProvider
+
 
 class TyperConfig(TypedDict):
     repos: list[dict[Any, Any]]
@@ -13,7 +15,7 @@ class TyperConfigs(TypedDict):
 
 
 class TyperImageList(TypedDict):
-    name: str
+    name: str | list[str]
     last_update: datetime
 
 
@@ -25,6 +27,27 @@ class TyperMetadataDict(TypedDict):
 class TyperImageVersion(TypedDict):
     error: bool
     data: list[TyperImageList]
+    etag: NotRequired[str | None]
+    not_modified: NotRequired[bool]
+
+
+class TyperTagPage(TypedDict):
+    error: bool
+    data: list[TyperImageList]
+    next: str | None
+    etag: str | None
+    not_modified: bool
+    pages: int | None
+
+
+class TyperPackagesUpdated(TypedDict):
+    error: bool
+    data: dict[str, float]
+
+
+class TyperOCIToken(TypedDict):
+    token: str
+    expires_at: float
 
 
 class TyperMetadata(TypedDict):
@@ -34,13 +57,56 @@ class TyperMetadata(TypedDict):
 
 class TyperImageProvider(TypedDict):
     error: bool
-    data: object
+    data: "BaseProvider"
 
 
 class TyperDetectedVersion(TypedDict):
     error: bool
-    data: Match[str] | None
+    data: str | None
 
 
 class TyperGenericReturn(TypedDict):
     error: bool
+
+
+class TyperAppliedVersion(TypedDict):
+    error: bool
+    changed: bool
+
+
+class TyperPush(TypedDict):
+    error: bool
+    rejected: bool
+
+
+class TyperRunSummary(TypedDict):
+    error: bool
+    data: dict[str, bool]
+
+
+class TyperTagCacheEntry(TypedDict):
+    etag: str | None
+    timestamp: float
+    data: list[TyperImageList]
+    complete: bool
+
+
+class TyperRemoteBranch(TypedDict):
+    error: bool
+    data: str | None
+
+
+class TyperMirror(TypedDict):
+    error: bool
+    data: str | None
+
+
+class TyperRepoState(TypedDict):
+    upstream_version: str
+    remote_sha: str
+    current_version: str
+
+
+class TyperProfileResult(TypedDict):
+    seconds: float
+    memory_peak: int | None
@@ -1,41 +1,70 @@
 """Main module."""
 
+from collections.abc import Iterable
+from typing import TYPE_CHECKING
 from structlog._config import BoundLoggerLazyProxy
 from structlog.contextvars import bind_contextvars
-from box import Box
 from os.path import exists
 from urllib.parse import urlparse
+from uptainer.cache import LazyTags, TagCache
+from uptainer.cadence import get_release_times
 from uptainer.config import Config
-from uptainer.providers.github import GitHub
-from uptainer.providers.dockerhub import DockerHub
+from uptainer.providers import get_provider_class
 from uptainer.providers.baseprovider import BaseProvider
-from uptainer.git import Git
-from uptainer.typer import TyperImageProvider, TyperDetectedVersion, TyperImageList, TyperGenericReturn
-import re
-import yaml
+from uptainer.metrics import METRICS
+from uptainer.versions import (
+    Constraint,
+    VersionIndex,
+    get_literal_prefix,
+    get_pattern,
+    parse_constraint,
+    parse_version,
+    satisfies,
+)
+from uptainer.typer import (
+    TyperImageProvider,
+    TyperDetectedVersion,
+    TyperImageList,
+    TyperAppliedVersion,
+)
+
+if TYPE_CHECKING:
+    # Imported when needed, the values files need PyYAML and python-box.
+    from uptainer.values import ValuesFile
 
 
 class UpTainer:
-    def __init__(self, config: Config, log: BoundLoggerLazyProxy) -> None:
+    def __init__(
+        self,
+        config: Config,
+        log: BoundLoggerLazyProxy,
+        tag_cache: TagCache | None = None,
+    ) -> None:
         """Main class of the package.
 
         Args:
             config (Config): Uptainer Config class, it will contain all the infos.
             log (BoundLoggerLazyProxy): Log class to inject into the vars. Class: structlog
+            tag_cache (TagCache): Tag cache shared with the other repos, None to always ask to the provider.
 
         Returns:
             None
         """
         self.config = config
         self.log = log
+        self.tag_cache = tag_cache
         bind_contextvars(reponame=self.config.name)
         self.provider = BaseProvider(log=self.log)
         self.image_provider = None
-        self.yamlcontent = None
+        self.values_files: dict[str, ValuesFile] = {}
+        self.release_times: list[float] = []
 
     def get_image_provider(self, image_repository: str) -> TyperImageProvider:
         """Return container image provider.
 
+        The provider is picked by the registry hostname from PROVIDERS, its module is imported only when first used.
+        With 'image_provider: oci' in the config, any registry is queried with the OCI distribution API.
+
         Args:
             image_repository (str): Container Image repository url
 
@@ -48,44 +77,112 @@ class UpTainer:
         image_repository = image_repository.replace("https://", "").replace("http://", "")
 
         if image_repository:
-            urlparsed = urlparse(f"//{image_repository}")
-            if urlparsed.netloc == "ghcr.io":
-                out["data"] = GitHub(log=self.log)
-            if urlparsed.netloc == "docker.io":
-                out["data"] = DockerHub(log=self.log)
+            hostname = urlparse(f"//{image_repository}").netloc
+            if self.config.image_provider == "oci":
+                from uptainer.providers.oci import OCI
+
+                out["data"] = OCI(log=self.log, registry=hostname)
+                return out
+            if self.config.image_provider:
+                self.log.error(f"The image provider '{self.config.image_provider}' is not supported.")
+                out["error"] = True
+                return out
             if len(image_repository.split("/")) <= DOCKERHUB_SPLITSLASHES:
                 # Match Dockerhub default format when the hostname its not specified.
-                out["data"] = DockerHub(log=self.log)
+                provider_class = get_provider_class(hostname="docker.io")
+            else:
+                provider_class = get_provider_class(hostname=hostname)
+            if provider_class is not None:
+                out["data"] = provider_class(log=self.log)
         else:
             out["error"] = True
         return out
 
-    def detect_version(self, tags: list[TyperImageList]) -> TyperDetectedVersion:
-        """Find the latest version to apply.
+    def detect_version(self, tags: Iterable[TyperImageList]) -> TyperDetectedVersion:
+        """Find the version to apply, following the 'version_selection' of the config.
+
+        With 'latest' (default) the tags are consumed in the provider order (newest first) and the iteration stops
+        at the first match, so with a LazyTags object the following pages are never requested. With 'highest' all
+        the tags are read once into a sorted index, shared by the repos that use the same image and 'version_match',
+        and the highest version is found bisecting it. Both only accept the versions allowed by 'version_constraint'.
+        With the providers that don't return the tags newest first, like OCI, 'highest' is always used.
 
         Args:
-            tags (list): The list of the tags found from the remote repo.
+            tags (Iterable): The tags found from the remote repo, a list or a LazyTags object.
 
         Returns:
             Return a dict that have version matched.
             Its like: {"error": <bool>, "data": "<matched version>"}
         """
-        matched = False
         out = TyperDetectedVersion(error=False, data=None)
-        for tagiter in tags:
-            if matched:
-                break
-            for tag in tagiter["name"]:
-                version = re.match(self.config.version_match, tag)
-                if version:
-                    matched = True
-                    out["data"] = version.string
-                    break
-        if not matched:
+        constraint = None
+        if self.config.version_constraint:
+            constraint = parse_constraint(str(self.config.version_constraint))
+            if constraint is None:
+                self.log.error(f"The version constraint '{self.config.version_constraint}' is not valid.")
+                out["error"] = True
+                return out
+        selection = self.config.version_selection
+        if selection == "latest" and not self.provider.newest_first:
+            # The provider has no dates, so the newest tag can't be known: the highest version is used.
+            selection = "highest"
+        if selection == "highest":
+            if isinstance(tags, LazyTags):
+                index = tags.get_index(pattern=self.config.version_match)
+            else:
+                index = VersionIndex(tags=tags, pattern=self.config.version_match)
+            out["data"] = index.highest(constraint=constraint)
+        elif selection == "latest":
+            out["data"] = self.detect_latest_version(tags=tags, constraint=constraint)
+        else:
+            self.log.error(f"The version selection '{self.config.version_selection}' is not valid.")
+            out["error"] = True
+            return out
+        if out["data"] is None:
             out["error"] = True
             self.log.error("Error during detecting version.")
         return out
 
+    def detect_latest_version(self, tags: Iterable[TyperImageList], constraint: Constraint | None) -> str | None:
+        """Return the first tag, in the provider order, that matches 'version_match' and the constraint.
+
+        Args:
+            tags (Iterable): The tags found from the remote repo, a list or a LazyTags object.
+            constraint (Constraint): Constraint returned by parse_constraint, None to allow every version.
+
+        Returns:
+            The tag name, None when no tag is allowed.
+        """
+        regex = get_pattern(self.config.version_match)
+        for tagiter in tags:
+            names = [tagiter["name"]] if isinstance(tagiter["name"], str) else tagiter["name"]
+            for tag in names:
+                if not regex.match(tag):
+                    continue
+                version = parse_version(tag) if constraint else None
+                if constraint is None or (version is not None and satisfies(version=version, constraint=constraint)):
+                    return tag
+        return None
+
+    def get_values_file(self, fpath: str) -> "ValuesFile | None":
+        """Return the parsed values file, each file is parsed only once and shared by the repos of the same group.
+
+        Args:
+            fpath (str): Absolute path of the yaml file to read.
+
+        Returns:
+            ValuesFile object, None when the file not exists or it's not valid.
+        """
+        if fpath not in self.values_files:
+            if not exists(fpath):
+                self.log.error(f"File '{fpath}' not exists")
+                return None
+            from uptainer.values import ValuesFile
+
+            self.values_files[fpath] = ValuesFile(log=self.log, fpath=fpath)
+        values_file = self.values_files[fpath]
+        return None if values_file.error else values_file
+
     def detect_current_version(self, fpath: str, key: str) -> TyperDetectedVersion:
         """Reading and return the tag image used on the git project.
 
@@ -96,93 +193,101 @@ class UpTainer:
         Returns:
             TyperDetectedVersion object
         """
-        out = TyperDetectedVersion(error=False, data=None)
-        if exists(fpath):
-            box = Box.from_yaml(filename=fpath, Loader=yaml.FullLoader, default_box=True, box_dots=True)
-            out["data"] = box[key]
-        else:
-            self.log.error(f"File '{fpath}' not exists")
-            out["error"] = True
-        return out
+        values_file = self.get_values_file(fpath=fpath)
+        if values_file is None:
+            return TyperDetectedVersion(error=True, data=None)
+        return values_file.get(key=key)
 
-    def update_version(self, fpath: str, key: str, newversion: str) -> TyperGenericReturn:
+    def update_version(self, fpath: str, key: str, newversion: str) -> TyperAppliedVersion:
         """Update the tag image used on the git project in the values file specified.
 
+        Only the old value is replaced, the rest of the file is kept as it is, and the file is not written
+        when the value is already the same.
+
         Args:
             fpath (str): Absolute path of the yaml file to read.
             key (str): Key path to read on the yaml, like "image.tag".
             newversion (str): New version to apply.
 
         Returns:
-            TyperDetectedVersion object
+            TyperAppliedVersion object
         """
-        out = TyperGenericReturn(error=False, data=None)
-        if exists(fpath):
-            box = Box.from_yaml(filename=fpath, Loader=yaml.FullLoader, default_box=True, box_dots=True)
-            box[key] = newversion
-            fopen = open(fpath, "w")
-            fopen.write(box.to_yaml())
-            fopen.close()
+        values_file = self.get_values_file(fpath=fpath)
+        if values_file is None:
+            return TyperAppliedVersion(error=True, changed=False)
+        out = values_file.set(key=key, value=newversion)
+        if out["changed"]:
+            values_file.save()
             self.log.info(f"Pushing the key '{key}' into '{fpath}'")
-        else:
-            self.log.error(f"File '{fpath}' not exists")
-            out["error"] = True
         return out
 
-    def run(self) -> None:
-        """Main function to check repos.
+    def get_new_version(self) -> TyperDetectedVersion:
+        """Ask to the image provider the tags availables and detect the version to apply.
 
         Args:
             None
 
         Returns:
-            None
+            TyperDetectedVersion object
         """
-        self.log.info(f"Running check named: '{self.config.name}'")
+        out = TyperDetectedVersion(error=True, data=None)
         image_provider = self.get_image_provider(image_repository=self.config.image_repository)
         if not image_provider["error"]:
             self.provider = image_provider["data"]
         else:
             self.log.error("Image provider detecting fail, please check it.")
-            return
+            return out
         self.log.info(f"Image provider detected: '{self.provider}'")
         self.log.info("Getting the image tags from the provider")
-        metadata = self.provider.get_metadata(image_repository=self.config.image_repository)
+        with METRICS.span(log=self.log, stage="get_metadata", provider=str(self.provider)):
+            metadata = self.provider.get_metadata(image_repository=self.config.image_repository)
         if metadata["error"]:
             self.log.error("Error during getting the tags.")
-            return
+            return out
 
-        tags = self.provider.get_image_versions(metadata["data"]["parent"], metadata["data"]["project"])
-        if tags["error"]:
-            self.log.error("Error getting the tags")
-            return
+        parent = metadata["data"]["parent"]
+        project = metadata["data"]["project"]
+        name_filter = get_literal_prefix(self.config.version_match) if self.provider.supports_name_filter else ""
+        if name_filter:
+            self.log.debug(f"Asking to the provider only the tags that contain '{name_filter}'")
+        if self.tag_cache:
+            tags = self.tag_cache.get_tags(
+                provider=self.provider, parent=parent, project=project, name_filter=name_filter
+            )
+        else:
+            tags = LazyTags(pages=self.provider.iter_tag_pages(parent=parent, project=project, name_filter=name_filter))
 
-        version = self.detect_version(tags=tags["data"])
-        if version["error"]:
-            self.log.error("Error during matching the version.")
-            return
+        with METRICS.span(log=self.log, stage="detect_version", provider=str(self.provider)):
+            version = self.detect_version(tags=tags)
+        if version["error"] or tags.error:
+            self.log.error("Error getting the tags" if tags.error else "Error during matching the version.")
+            return out
 
+        # Only the pages already fetched are used, the older releases don't change the cadence much.
+        self.release_times = get_release_times(tags=list(tags.items), pattern=self.config.version_match)
         self.log.info(f"The version to apply: {version['data']}")
-        git_obj = Git(
-            log=self.log,
-            remote_url=self.config.git_ssh_url,
-            branch=self.config.git_branch,
-            ssh_private_key=self.config.git_ssh_privatekey,
-        )
-        git_obj.create_workdir()
-        pull_check = git_obj.clone_repo()
-        if pull_check["error"]:
-            return
-        current_version = self.detect_current_version(
-            fpath=f"{git_obj.work_directory}/{self.config.git_values_filename}", key=self.config.values_key
-        )
+        return version
+
+    def apply_version(self, work_directory: str, newversion: str) -> TyperAppliedVersion:
+        """Update the values file, inside a cloned repo, with the new version if its differs from the current one.
+
+        Args:
+            work_directory (str): Absolute path of the cloned git repo.
+            newversion (str): New version to apply.
+
+        Returns:
+            TyperAppliedVersion object
+        """
+        out = TyperAppliedVersion(error=False, changed=False)
+        fpath = f"{work_directory}/{self.config.git_values_filename}"
+        with METRICS.span(log=self.log, stage="detect_current_version"):
+            current_version = self.detect_current_version(fpath=fpath, key=self.config.values_key)
         if current_version["error"]:
-            return
-        self.log.info(f"Version detected Current: {current_version['data']} / To apply: {version['data']}")
-        self.update_version(
-            fpath=f"{git_obj.work_directory}/{self.config.git_values_filename}",
-            key=self.config.values_key,
-            newversion=version["data"],
-        )
-        git_obj.push_repo(fpath=self.config.git_values_filename, newversion=version["data"])
-        self.log.info("---> Done.")
+            out["error"] = True
+            return out
+        self.log.info(f"Version detected Current: {current_version['data']} / To apply: {newversion}")
+        if str(current_version["data"]) == newversion:
+            self.log.info("The version is already up to date.")
+            return out
+        with METRICS.span(log=self.log, stage="update_version"):
+            return self.update_version(fpath=fpath, key=self.config.values_key, newversion=newversion)
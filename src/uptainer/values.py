@@ -0,0 +1,212 @@
+from box import Box
+from structlog._config import BoundLoggerLazyProxy
+from yaml.nodes import MappingNode, Node, ScalarNode, SequenceNode
+from uptainer.typer import TyperAppliedVersion, TyperDetectedVersion
+import re
+import yaml
+
+# Use the libyaml parser when PyYAML has been built with it.
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+LINE_BREAK_REGEX = re.compile("\r\n|[\n\r\x85\u2028\u2029]")
+KEY_REGEX = re.compile(r"\[(\d+)\]|([^.\[\]]+)")
+# The anchor and the tag written before a value, like "&tag !!str ".
+PROPERTIES_REGEX = re.compile(r"(?:[&!]\S*\s+)*")
+
+
+class ValuesFile:
+    def __init__(self, log: BoundLoggerLazyProxy, fpath: str) -> None:
+        """YAML values file, parsed only once and updated in place keeping comments and formatting.
+
+        The file is composed into a tree of nodes that keeps the source position of each value, so a new value
+        is spliced into the original text replacing only the characters of the old one.
+
+        Args:
+            log (BoundLoggerLazyProxy): Log class to inject into the vars. Class: structlog
+            fpath (str): Absolute path of the yaml file.
+
+        Returns:
+            None
+        """
+        self.log = log
+        self.fpath = fpath
+        self.error = False
+        self.text = ""
+        self.root: Node | None = None
+        self.line_starts: list[int] = []
+        self.edits: dict[tuple[int, int], str] = {}
+        with open(self.fpath, newline="") as fopen:
+            self.load(text=fopen.read())
+
+    def load(self, text: str) -> None:
+        """Parse the text of the file, dropping the edits not saved.
+
+        Args:
+            text (str): Content of the file.
+
+        Returns:
+            None
+        """
+        self.text = text
+        self.edits = {}
+        self.line_starts = [0] + [match.end() for match in LINE_BREAK_REGEX.finditer(text)]
+        try:
+            self.root = yaml.compose(text, Loader=YamlLoader)
+        except yaml.YAMLError as error:
+            self.log.error(f"Error during parsing the file '{self.fpath}', error: '{error}'")
+            self.error = True
+
+    def get_offset(self, mark: yaml.Mark) -> int:
+        """Return the position in the original text of a parser mark.
+
+        The line and column are used instead of the mark index, since the libyaml parser counts it in bytes.
+
+        Args:
+            mark (Mark): Start or end mark of a node.
+
+        Returns:
+            The offset in characters.
+        """
+        return int(self.line_starts[mark.line] + mark.column)
+
+    def get_node(self, key: str) -> Node | None:
+        """Return the node of a key path.
+
+        Args:
+            key (str): Key path in dot format, like "image.tag" or "containers[0].image.tag".
+
+        Returns:
+            The node, None when the key path doesn't exist.
+        """
+        return self.find_node(key=key)[0]
+
+    def find_node(self, key: str) -> tuple[Node | None, bool]:
+        """Return the node of a key path, and if the path goes through an alias.
+
+        An alias is composed into the same node of its anchor, so it's detected by the position of the node: the
+        anchor is always written before the alias, while any other node is written after its key, or after the
+        previous item of its sequence.
+
+        Args:
+            key (str): Key path in dot format, like "image.tag" or "containers[0].image.tag".
+
+        Returns:
+            (<node>, <aliased>), the node is None when the key path doesn't exist.
+        """
+        node = self.root
+        aliased = False
+        for index, name in KEY_REGEX.findall(key):
+            if isinstance(node, SequenceNode) and index and int(index) < len(node.value):
+                position = int(index)
+                after = node.value[position - 1].end_mark if position else node.start_mark
+                node = node.value[position]
+            elif isinstance(node, MappingNode) and name:
+                item = next(((item, value) for item, value in reversed(node.value) if item.value == name), None)
+                if item is None:
+                    return None, aliased
+                after = item[0].end_mark
+                node = item[1]
+            else:
+                return None, aliased
+            aliased = aliased or self.get_offset(node.start_mark) < self.get_offset(after)
+        return node, aliased
+
+    def get(self, key: str) -> TyperDetectedVersion:
+        """Return the value of a key path, as it's written in the file.
+
+        Args:
+            key (str): Key path in dot format, like "image.tag".
+
+        Returns:
+            TyperDetectedVersion object, 'data' is None when the key path doesn't exist.
+        """
+        out = TyperDetectedVersion(error=False, data=None)
+        node = self.get_node(key=key)
+        if node is None:
+            return out
+        if not isinstance(node, ScalarNode):
+            self.log.error(f"The key '{key}' of '{self.fpath}' is not a scalar value")
+            out["error"] = True
+            return out
+        out["data"] = node.value
+        return out
+
+    def set(self, key: str, value: str) -> TyperAppliedVersion:
+        """Replace the value of a key path, the file is written only by the save method.
+
+        The quoting style of the old value is kept, a plain value that would be read as a number or a bool
+        is quoted, and the anchor or the tag of the value are kept as they are. When the key path doesn't exist,
+        goes through an alias or the old value is a block or a multi-line scalar, the whole file is rewritten.
+
+        Args:
+            key (str): Key path in dot format, like "image.tag".
+            value (str): New value.
+
+        Returns:
+            TyperAppliedVersion object, 'changed' is False when the value is already the same.
+        """
+        out = TyperAppliedVersion(error=False, changed=False)
+        node, aliased = self.find_node(key=key)
+        if node is None:
+            self.log.warning(f"The key '{key}' not exists into '{self.fpath}', rewriting the whole file")
+            return self.rewrite(key=key, value=value)
+        if not isinstance(node, ScalarNode):
+            self.log.error(f"The key '{key}' of '{self.fpath}' is not a scalar value")
+            out["error"] = True
+            return out
+        if node.value == value:
+            return out
+        start = self.get_offset(node.start_mark)
+        properties = PROPERTIES_REGEX.match(self.text, start)
+        if properties:
+            start = properties.end()
+        end = self.get_offset(node.end_mark)
+        if aliased or node.style in ("|", ">") or LINE_BREAK_REGEX.search(self.text, start, end):
+            self.log.warning(f"The key '{key}' of '{self.fpath}' can't be replaced in place, rewriting the whole file")
+            return self.rewrite(key=key, value=value)
+        style = node.style if node.style in ("'", '"') else None
+        rendered = yaml.dump(value, Dumper=yaml.SafeDumper, default_style=style, width=float("inf"))
+        self.edits[(start, end)] = rendered.splitlines()[0]
+        node.value = value
+        out["changed"] = True
+        return out
+
+    def rewrite(self, key: str, value: str) -> TyperAppliedVersion:
+        """Set the value of a key path rewriting the whole file, the comments and the anchors are lost.
+
+        Args:
+            key (str): Key path in dot format, like "image.tag".
+            value (str): New value.
+
+        Returns:
+            TyperAppliedVersion object.
+        """
+        box = Box.from_yaml(yaml_string=self.render(), default_box=True, box_dots=True)
+        box[key] = value
+        self.load(text=box.to_yaml())
+        return TyperAppliedVersion(error=self.error, changed=not self.error)
+
+    def render(self) -> str:
+        """Return the text of the file with all the edits applied.
+
+        Args:
+            None
+
+        Returns:
+            The new content of the file.
+        """
+        text = self.text
+        for (start, end), rendered in sorted(self.edits.items(), reverse=True):
+            text = f"{text[:start]}{rendered}{text[end:]}"
+        return text
+
+    def save(self) -> None:
+        """Write the file with all the edits applied.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        with open(self.fpath, "w", newline="") as fopen:
+            fopen.write(self.render())
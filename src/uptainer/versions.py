@@ -0,0 +1,218 @@
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable
+from functools import lru_cache
+from re import Pattern
+from uptainer.typer import TyperImageList
+import re
+
+VERSION_REGEX = re.compile(r"(\d+(?:\.\d+)*)(?:[-.]?([0-9A-Za-z][0-9A-Za-z.-]*))?")
+# First identifier of a semver pre-release, like 'rc' in '-rc.1', 'beta2' or '1' in '-1'.
+PRERELEASE_REGEX = re.compile(r"(?:alpha|beta|rc|dev|pre|preview|a|b)\d*|\d+", re.IGNORECASE)
+CONSTRAINT_REGEX = re.compile(r"^\s*(>=|<=|==|!=|>|<|=)?\s*v?(\d+(?:\.\d+)*(?:-[0-9A-Za-z.-]+)?)\s*$")
+MIN_VERSION_PARTS = 3
+REGEX_SPECIAL_CHARS = ".^$*+?{}[]|()\\"
+REGEX_QUANTIFIERS = "*?{"
+
+VersionKey = tuple[tuple[int, ...], int, tuple[tuple[int, int | str], ...]]
+Constraint = list[tuple[str, VersionKey]]
+
+
+@lru_cache(maxsize=256)
+def get_pattern(pattern: str) -> Pattern[str]:
+    """Compile a regex only once, the compiled patterns are shared by all the repos.
+
+    Args:
+        pattern (str): Regex to compile, like the 'version_match' of the config.
+
+    Returns:
+        The compiled pattern.
+    """
+    return re.compile(pattern)
+
+
+@lru_cache(maxsize=256)
+def get_literal_prefix(pattern: str) -> str:
+    """Return the literal text that every string matched by the pattern, with 're.match', starts with.
+
+    The prefix is safe to use as a filter on the tag names, like the 'name' filter of the DockerHub API:
+    a character followed by a quantifier is not included, and a pattern with an alternation has no prefix.
+
+    Args:
+        pattern (str): Regex, like the 'version_match' of the config.
+
+    Returns:
+        The literal prefix, like 'v1' for 'v1.[0-9]+.[0-9]+', an empty string when there is none.
+    """
+    if "|" in pattern:
+        return ""
+    chars: list[str] = []
+    position = 1 if pattern.startswith("^") else 0
+    while position < len(pattern):
+        char = pattern[position]
+        if char == "\\" and position + 1 < len(pattern) and not pattern[position + 1].isalnum():
+            char = pattern[position + 1]
+            position += 1
+        elif char in REGEX_SPECIAL_CHARS:
+            break
+        position += 1
+        if position < len(pattern) and pattern[position] in REGEX_QUANTIFIERS:
+            break
+        chars.append(char)
+    return "".join(chars)
+
+
+@lru_cache(maxsize=4096)
+def parse_version(tag: str) -> VersionKey | None:
+    """Convert a tag into a comparable key, ordered following the semver rules.
+
+    The numeric parts are padded to 3 items, so '1.2' is equal to '1.2.0'. A semver suffix after the numbers,
+    like '-rc.1', '-beta2' or '-1', is handled as a pre-release and sorts before the release itself. Any other
+    suffix, like the '-alpine' or '-slim' variants, is not part of the version, so '1.2.3-alpine' is a release.
+
+    Args:
+        tag (str): Tag name, like 'v1.2.3', '1.2.3-rc.1' or '1.2.3-alpine'.
+
+    Returns:
+        A tuple like ((<major>, <minor>, <patch>, ...), <1 for releases, 0 for pre-releases>, (<pre-release parts>)),
+        None when the tag doesn't contain a version.
+    """
+    found = VERSION_REGEX.search(tag)
+    if found is None:
+        return None
+    numbers = tuple(int(item) for item in found.group(1).split("."))
+    numbers += (0,) * (MIN_VERSION_PARTS - len(numbers))
+    prerelease = found.group(2).split("+")[0] if found.group(2) else ""
+    items = [item for item in re.split(r"[.-]", prerelease) if item]
+    if not items or not PRERELEASE_REGEX.fullmatch(items[0]):
+        return (numbers, 1, ())
+    parts = tuple((0, int(item)) if item.isdigit() else (1, item) for item in items)
+    return (numbers, 0, parts)
+
+
+@lru_cache(maxsize=256)
+def parse_constraint(constraint: str) -> Constraint | None:
+    """Parse a range constraint like '>=1.2,<2'.
+
+    Args:
+        constraint (str): Comma separated list of '<operator><version>', the operators allowed are
+            '>=', '<=', '>', '<', '==', '!=' and '=' (same as '=='), without an operator '==' is used.
+
+    Returns:
+        A list of (<operator>, <version key>), None when the constraint is not valid.
+    """
+    out: Constraint = []
+    for item in constraint.split(","):
+        found = CONSTRAINT_REGEX.match(item)
+        version = parse_version(found.group(2)) if found else None
+        if found is None or version is None:
+            return None
+        operator = found.group(1) or "=="
+        out.append(("==" if operator == "=" else operator, version))
+    return out
+
+
+def allows_prerelease(version: VersionKey, constraint: Constraint) -> bool:
+    """Check if a constraint can select a version, following the semver range rules for the pre-releases.
+
+    A pre-release is allowed only when an item of the constraint is a pre-release of the same version, so
+    '<2' doesn't select '2.0.0-rc.1' while '>=2.0.0-rc.0' does.
+
+    Args:
+        version (VersionKey): Key returned by parse_version.
+        constraint (Constraint): Constraint returned by parse_constraint.
+
+    Returns:
+        True when the version is a release, or a pre-release allowed by the constraint.
+    """
+    if version[1]:
+        return True
+    return any(not bound[1] and bound[0] == version[0] for _, bound in constraint)
+
+
+def satisfies(version: VersionKey, constraint: Constraint) -> bool:
+    """Check if a version respects all the items of a constraint, pre-releases included only as allowed by semver.
+
+    Args:
+        version (VersionKey): Key returned by parse_version.
+        constraint (Constraint): Constraint returned by parse_constraint.
+
+    Returns:
+        True when the version is allowed.
+    """
+    checks = {
+        ">=": lambda bound: version >= bound,
+        "<=": lambda bound: version <= bound,
+        ">": lambda bound: version > bound,
+        "<": lambda bound: version < bound,
+        "==": lambda bound: version == bound,
+        "!=": lambda bound: version != bound,
+    }
+    return allows_prerelease(version, constraint) and all(checks[operator](bound) for operator, bound in constraint)
+
+
+class VersionIndex:
+    def __init__(self, tags: Iterable[TyperImageList], pattern: str) -> None:
+        """Sorted index of the tags that match a pattern, for finding the highest version allowed.
+
+        Each tag is matched and parsed only once when the index is built, after that each query
+        is answered bisecting the index.
+
+        Args:
+            tags (Iterable): The tags found from the remote repo, a list or a LazyTags object.
+            pattern (str): Regex that the tags needs to match, using 're.match'.
+
+        Returns:
+            None
+        """
+        regex = get_pattern(pattern)
+        entries: dict[str, VersionKey] = {}
+        for tagiter in tags:
+            names = [tagiter["name"]] if isinstance(tagiter["name"], str) else tagiter["name"]
+            for tag in names:
+                if tag in entries or not regex.match(tag):
+                    continue
+                version = parse_version(tag)
+                if version is not None:
+                    entries[tag] = version
+        items = sorted((version, tag) for tag, version in entries.items())
+        self.keys = [version for version, _ in items]
+        self.tags = [tag for _, tag in items]
+
+    def __len__(self) -> int:
+        """Return the number of tags in the index.
+
+        Args:
+            None
+
+        Returns:
+            The number of tags.
+        """
+        return len(self.tags)
+
+    def highest(self, constraint: Constraint | None = None) -> str | None:
+        """Return the highest tag allowed by the constraint, a pre-release only when the constraint allows it.
+
+        Args:
+            constraint (Constraint): Constraint returned by parse_constraint, None to allow every version.
+
+        Returns:
+            The tag name, None when no tag is allowed.
+        """
+        low, high = 0, len(self.keys)
+        excluded = []
+        for operator, bound in constraint or []:
+            if operator in (">=", "=="):
+                low = max(low, bisect_left(self.keys, bound))
+            if operator == ">":
+                low = max(low, bisect_right(self.keys, bound))
+            if operator in ("<=", "=="):
+                high = min(high, bisect_right(self.keys, bound))
+            if operator == "<":
+                high = min(high, bisect_left(self.keys, bound))
+            if operator == "!=":
+                excluded.append(bound)
+        for position in range(high - 1, low - 1, -1):
+            version = self.keys[position]
+            if version not in excluded and (constraint is None or allows_prerelease(version, constraint)):
+                return self.tags[position]
+        return None
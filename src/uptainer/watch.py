@@ -0,0 +1,284 @@
+"""Resident mode, running each repo of the config on its own interval."""
+
+from heapq import heappop, heappush
+from itertools import count
+from math import inf
+from threading import Event, RLock
+from time import monotonic, time
+from structlog._config import BoundLoggerLazyProxy
+from uptainer.cadence import get_adaptive_interval
+from uptainer.config import Config
+from uptainer.loader import Loader
+from uptainer.typer import TyperRunSummary
+import re
+import yaml
+
+DOCKERHUB_SPLITSLASHES = 2
+# The first part of the image is a registry when it has a dot or a port, like 'registry.example.com:5000/app'.
+REGISTRY_REGEX = re.compile(r"[.:]|^localhost$")
+
+
+def get_image_key(image_repository: str) -> str:
+    """Return the full name of an image, used to find the repos of an image given by a registry event.
+
+    Args:
+        image_repository (str): Image like 'nginx', 'mirio/verbacap', 'ghcr.io/mirio/verbacap' or
+            'registry.example.com:5000/app'.
+
+    Returns:
+        The lowercase name with the registry, like 'docker.io/library/nginx'.
+    """
+    parts = image_repository.replace("https://", "").replace("http://", "").lower().split("/")
+    if len(parts) == 1:
+        parts = ["docker.io", "library", *parts]
+    elif len(parts) == DOCKERHUB_SPLITSLASHES and not REGISTRY_REGEX.search(parts[0]):
+        parts = ["docker.io", *parts]
+    if parts[0] == "docker.io" and parts[1] == "_":
+        parts[1] = "library"
+    return "/".join(parts)
+
+
+class Watcher:
+    def __init__(self, log: BoundLoggerLazyProxy, loader: Loader) -> None:
+        """Scheduler that keeps running the repos of the config, each one on its own interval.
+
+        The next run of each repo is kept in a heap ordered by due time, so every wake up pops only the
+        repos that are due and runs them together with the loader, sharing its HTTP sessions, tag cache,
+        git mirrors and state store between the runs. The cached tags of the repos due are revalidated with
+        their ETag at every run, so a new release is found at the next check and not after the tag cache ttl.
+        The config file is read again when it changes: the new and changed repos run at the next wake up, the
+        removed ones are dropped from the schedule.
+        The repos of an image can be run earlier with trigger, like when the registry notifies a push.
+
+        Args:
+            log (BoundLoggerLazyProxy): Log class to inject into the vars. Class: structlog
+            loader (Loader): Loader object used to run the repos.
+
+        Returns:
+            None
+        """
+        self.log = log
+        self.loader = loader
+        self.interval = loader.run_config.watch_interval
+        self.reload_interval = 5.0
+        self.configs: dict[str, Config] = {}
+        self.queue: list[tuple[float, int, str]] = []
+        self.scheduled: dict[str, float] = {}
+        self.counter = count()
+        self.mtime: int | None = None
+        self.images: dict[str, set[str]] = {}
+        self.expired_images: set[str] = set()
+        self.lock = RLock()
+        self.stop_event = Event()
+        self.wake_event = Event()
+
+    def reload(self) -> bool:
+        """Read the config file when it's changed since the last read, updating the schedule.
+
+        An invalid or missing config file is logged and ignored, the repos keep running with the config before.
+
+        Args:
+            None
+
+        Returns:
+            True when the config has been read again.
+        """
+        try:
+            mtime = self.loader.config_file.stat().st_mtime_ns
+        except OSError as error:
+            self.log.error(f"The config file is not readable, error: {error}")
+            return False
+        if mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        try:
+            configdata = self.loader.read_config()
+            if configdata["error"]:
+                # Removed between the stat and the read, like an atomic rename save: read it again at the next check.
+                self.mtime = None
+                return False
+            configs = self.loader.load_configs(repos=configdata["data"]["repos"])
+        except (yaml.YAMLError, KeyError, TypeError, ValueError) as error:
+            self.log.error(f"The config file is not valid, keeping the previous one. Error: {error}")
+            return False
+        now = monotonic()
+        new_configs = {config.name: config for config in configs}
+        with self.lock:
+            for name, config in new_configs.items():
+                old_config = self.configs.get(name)
+                if old_config is None or vars(old_config) != vars(config):
+                    self.schedule(name=name, due=now)
+            for name in self.configs.keys() - new_configs.keys():
+                self.scheduled.pop(name, None)
+            self.configs = new_configs
+            self.images = {}
+            for name, config in new_configs.items():
+                self.images.setdefault(get_image_key(str(config.image_repository)), set()).add(name)
+        self.log.info(f"Watching {len(self.configs)} repos from '{self.loader.config_file}'")
+        return True
+
+    def schedule(self, name: str, due: float) -> None:
+        """Set the next run of a repo, replacing the one already scheduled.
+
+        The old item is left in the heap and skipped when popped, since its due time doesn't match anymore.
+
+        Args:
+            name (str): Name of the repo.
+            due (float): Monotonic time of the next run.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.scheduled[name] = due
+            heappush(self.queue, (due, next(self.counter), name))
+
+    def get_interval(self, config: Config) -> float:
+        """Return the seconds between two runs of a repo.
+
+        With a max interval, given by 'max_interval' or by the watch max interval, the interval adapts to the
+        release cadence of the image, between 'min_interval' and the max interval.
+
+        Args:
+            config (Config): Config class of the repo.
+
+        Returns:
+            The adaptive interval, or the 'interval' of the repo, or the watch interval when not set.
+        """
+        interval = float(config.interval or self.interval)
+        max_interval = config.max_interval or self.loader.run_config.watch_max_interval
+        if not max_interval:
+            return interval
+        return get_adaptive_interval(
+            release_times=self.loader.release_times.get(config.name, []),
+            now=time(),
+            min_interval=float(config.min_interval or interval),
+            max_interval=float(max_interval),
+        )
+
+    def pop_due(self, now: float) -> list[Config]:
+        """Remove from the schedule the repos that are due.
+
+        Args:
+            now (float): Current monotonic time.
+
+        Returns:
+            The Config classes of the repos due, in due time order.
+        """
+        due = []
+        with self.lock:
+            while self.queue and self.queue[0][0] <= now:
+                when, _, name = heappop(self.queue)
+                if self.scheduled.get(name) == when:
+                    del self.scheduled[name]
+                    due.append(self.configs[name])
+        return due
+
+    def get_wait(self, now: float) -> float:
+        """Return the seconds to wait before the next wake up.
+
+        Args:
+            now (float): Current monotonic time.
+
+        Returns:
+            The seconds until the next repo is due, at most 'reload_interval' to check the config file.
+        """
+        with self.lock:
+            while self.queue and self.scheduled.get(self.queue[0][2]) != self.queue[0][0]:
+                heappop(self.queue)
+            if not self.queue:
+                return self.reload_interval
+            return min(max(self.queue[0][0] - now, 0.0), self.reload_interval)
+
+    def trigger(self, image_key: str) -> list[str]:
+        """Run the repos of an image after the debounce delay, and revalidate its cached tags.
+
+        The repos already due before the delay are not moved, so a burst of events runs them only once.
+
+        Args:
+            image_key (str): Full name of the image, returned by get_image_key.
+
+        Returns:
+            The names of the repos triggered.
+        """
+        with self.lock:
+            names = sorted(self.images.get(image_key, set()))
+            due = monotonic() + self.loader.run_config.webhook_debounce
+            for name in names:
+                if self.scheduled.get(name, inf) > due:
+                    self.schedule(name=name, due=due)
+            if names:
+                self.expired_images.add(image_key)
+        if names:
+            self.log.info(f"Image '{image_key}' updated, running {', '.join(names)}")
+            self.wake_event.set()
+        return names
+
+    def expire_images(self) -> None:
+        """Make the tags of the images triggered or due expired in the tag cache, so the next run revalidates them.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        with self.lock:
+            image_keys, self.expired_images = self.expired_images, set()
+        for image_key in image_keys:
+            parts = image_key.split("/")
+            self.loader.tag_cache.expire(parent="/".join(parts[1:-1]), project=parts[-1])
+
+    def run_due(self) -> TyperRunSummary | None:
+        """Run the repos that are due, revalidating the cached tags of their images, and schedule their next run.
+
+        Args:
+            None
+
+        Returns:
+            TyperRunSummary Object of the run, None when no repo is due.
+        """
+        configs = self.pop_due(now=monotonic())
+        if not configs:
+            return None
+        with self.lock:
+            self.expired_images.update(get_image_key(str(config.image_repository)) for config in configs)
+        self.expire_images()
+        summary = self.loader.run_configs(configs=configs)
+        finished = monotonic()
+        for config in configs:
+            interval = self.get_interval(config)
+            self.log.debug(f"Next check of '{config.name}' in {interval:.0f} seconds")
+            self.schedule(name=config.name, due=finished + interval)
+        return summary
+
+    def run(self, max_runs: int | None = None) -> None:
+        """Main loop, it runs until stop is called.
+
+        Args:
+            max_runs (int): Return after this number of runs, None to run forever.
+
+        Returns:
+            None
+        """
+        runs = 0
+        while not self.stop_event.is_set():
+            self.reload()
+            if self.run_due() is not None:
+                runs += 1
+                if max_runs is not None and runs >= max_runs:
+                    return
+            self.wake_event.wait(self.get_wait(now=monotonic()))
+            self.wake_event.clear()
+
+    def stop(self) -> None:
+        """Stop the main loop, after the run in progress.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.stop_event.set()
+        self.wake_event.set()
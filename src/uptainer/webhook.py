@@ -0,0 +1,163 @@
+"""HTTP receiver of the registry push events, running the repos of the image pushed."""
+
+from hashlib import sha256
+from hmac import compare_digest, new
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import JSONDecodeError, dumps, loads
+from os import getenv
+from threading import Thread
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+from structlog._config import BoundLoggerLazyProxy
+from uptainer.watch import Watcher, get_image_key
+
+GITHUB_EVENTS = ("package", "registry_package")
+GITHUB_ACTIONS = ("published", "updated")
+MAX_BODY_SIZE = 1024 * 1024
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    server: "WebhookServer"
+
+    def do_POST(self) -> None:
+        """Handle a webhook, replying 202 with the repos triggered.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_SIZE:
+            self.reply(status=413, content={"error": "Payload too large"})
+            return
+        body = self.rfile.read(length)
+        query = parse_qs(urlparse(self.path).query)
+        if not self.server.is_authorized(headers=dict(self.headers), query=query, body=body):
+            self.reply(status=401, content={"error": "Unauthorized"})
+            return
+        try:
+            payload = loads(body)
+        except (JSONDecodeError, UnicodeDecodeError):
+            payload = None
+        if not isinstance(payload, dict):
+            self.reply(status=400, content={"error": "The payload is not a valid JSON object"})
+            return
+        image_key = self.server.get_event_image(event=self.headers.get("X-GitHub-Event"), payload=payload)
+        if image_key is None:
+            self.reply(status=202, content={"triggered": []})
+            return
+        self.reply(status=202, content={"image": image_key, "triggered": self.server.watcher.trigger(image_key)})
+
+    def reply(self, status: int, content: dict[str, Any]) -> None:
+        """Send a JSON response.
+
+        Args:
+            status (int): Status code of the response.
+            content (dict): Body of the response.
+
+        Returns:
+            None
+        """
+        body = dumps(content).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Log the requests with structlog, instead of stderr.
+
+        Args:
+            format (str): Format string of the message.
+            *args (Any): Values of the format string.
+
+        Returns:
+            None
+        """
+        self.server.log.debug(f"Webhook request: {format % args}")
+
+
+class WebhookServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, log: BoundLoggerLazyProxy, watcher: Watcher, host: str, port: int) -> None:
+        """HTTP server that receives the DockerHub webhooks and the GitHub 'package'/'registry_package' events.
+
+        The image of each event is mapped to the repos that use it, which run after the debounce delay of the
+        watcher instead of waiting their interval. When the env var 'WEBHOOK_SECRET' is set, the GitHub events
+        need a valid 'X-Hub-Signature-256' header and the other webhooks a 'token' query parameter with it.
+
+        Args:
+            log (BoundLoggerLazyProxy): Log class to inject into the vars. Class: structlog
+            watcher (Watcher): Watcher object that runs the repos.
+            host (str): Address to listen on.
+            port (int): Port to listen on, 0 for a random one.
+
+        Returns:
+            None
+        """
+        super().__init__((host, port), WebhookHandler)
+        self.log = log
+        self.host = host
+        self.watcher = watcher
+        self.secret = getenv("WEBHOOK_SECRET", default=None)
+        if not self.secret:
+            self.log.warning("WEBHOOK_SECRET not set, the webhooks are accepted without authentication.")
+
+    def start(self) -> Thread:
+        """Serve the requests in a background thread, until shutdown is called.
+
+        Args:
+            None
+
+        Returns:
+            The thread of the server.
+        """
+        thread = Thread(target=self.serve_forever, name="uptainer-webhook", daemon=True)
+        thread.start()
+        self.log.info(f"Listening for webhooks on {self.host}:{self.server_port}")
+        return thread
+
+    def is_authorized(self, headers: dict[str, str], query: dict[str, list[str]], body: bytes) -> bool:
+        """Check the authentication of a webhook.
+
+        Args:
+            headers (dict): Headers of the request.
+            query (dict): Query parameters of the request.
+            body (bytes): Body of the request.
+
+        Returns:
+            True when the secret is not set, or the request has been signed or given with it.
+        """
+        if not self.secret:
+            return True
+        signature = headers.get("X-Hub-Signature-256")
+        if signature:
+            expected = "sha256=" + new(self.secret.encode(), body, sha256).hexdigest()
+            return compare_digest(signature.encode(), expected.encode())
+        return compare_digest(query.get("token", [""])[0].encode(), self.secret.encode())
+
+    def get_event_image(self, event: str | None, payload: dict[str, Any]) -> str | None:
+        """Return the image updated by an event.
+
+        Args:
+            event (str): Value of the 'X-GitHub-Event' header, None for the other webhooks.
+            payload (dict): Body of the request.
+
+        Returns:
+            The full name of the image, returned by get_image_key, None when the event is not a push of an image.
+        """
+        if event in GITHUB_EVENTS:
+            package = payload.get(event) or {}
+            owner = (package.get("owner") or {}).get("login")
+            if payload.get("action") not in GITHUB_ACTIONS or str(package.get("package_type")).lower() != "container":
+                return None
+            return get_image_key(f"ghcr.io/{owner}/{package['name']}") if owner and package.get("name") else None
+        repository = payload.get("repository") or {}
+        if "push_data" in payload and repository.get("repo_name"):
+            return get_image_key(repository["repo_name"])
+        self.log.warning(f"Webhook not supported, event: '{event}'")
+        return None
@@ -0,0 +1,39 @@
+import git
+import pytest
+
+
+@pytest.fixture
+def git_remote(tmp_path):
+    """Local bare repo, with a values file on the main branch, usable as git_ssh_url."""
+    remote = git.Repo.init(tmp_path / "remote.git", bare=True, initial_branch="main")
+    seed = git.Repo.init(tmp_path / "seed", initial_branch="main")
+    (tmp_path / "seed" / "charts" / "verbacap").mkdir(parents=True)
+    (tmp_path / "seed" / "charts" / "verbacap" / "values.yaml").write_text("image:\n  tag: v1.0.0\n")
+    (tmp_path / "seed" / "README.md").write_text("readme\n")
+    seed.index.add(["charts/verbacap/values.yaml", "README.md"])
+    seed.index.commit("init", author=git.Actor("test", "test@example.com"))
+    seed.create_remote("origin", remote.working_dir).push("main")
+    return f"file://{tmp_path}/remote.git"
+
+
+@pytest.fixture
+def git_config(tmp_path, git_remote):
+    """Config file writer, with a repo for each (<name>, <values_key>) given using the values file of git_remote."""
+
+    def write(repos=(("Foo", "image.tag"),)):
+        config_file = tmp_path / "config.yaml"
+        config_file.write_text(
+            "repos:\n"
+            + "".join(
+                f"  - name: {name}\n"
+                "    image_repository: ghcr.io/mirio/verbacap\n"
+                f"    git_ssh_url: {git_remote}\n"
+                "    git_values_filename: charts/verbacap/values.yaml\n"
+                f"    values_key: {key}\n"
+                "    version_match: v1.[0-9]+.[0-9]+\n"
+                for name, key in repos
+            )
+        )
+        return config_file
+
+    return write
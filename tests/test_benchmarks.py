@@ -0,0 +1,62 @@
+import requests
+import structlog
+from benchmarks.__main__ import compare
+from benchmarks.registry import StubRegistry, get_tags
+from benchmarks.scenarios import Benchmark
+from benchmarks.startup import get_loaded_modules
+from uptainer.config import RunConfig
+
+log = structlog.get_logger()
+
+
+def test_get_tags():
+    tags = get_tags(count=5, release_every=2)
+    assert [name for name, _ in tags] == ["v1.0.2", "sha-000001", "v1.0.1", "sha-000003", "v1.0.0"]
+    assert tags[0][1] > tags[1][1]
+
+
+def test_stub_registry():
+    registry = StubRegistry()
+    registry.start()
+    registry.add_image("dockerhub", "bench", "app", tags=15)
+    registry.add_image("github", "bench", "app", tags=15)
+    try:
+        page = requests.get(f"{registry.url}/v2/namespaces/bench/repositories/app/tags?page_size=10").json()
+        assert page["count"] == 15
+        assert requests.get(page["next"]).json()["next"] is None
+        reply = requests.get(f"{registry.url}/users/bench/packages/container/app/versions?per_page=10")
+        assert reply.links["next"]["url"].endswith("page=2")
+        assert requests.get(reply.url, headers={"If-None-Match": reply.headers["ETag"]}).status_code == 304
+        assert requests.get(f"{registry.url}/users/bench/packages?package_type=container").json()[0]["name"] == "app"
+        assert requests.get(f"{registry.url}/v2/namespaces/bench/repositories/missing/tags").status_code == 404
+    finally:
+        registry.shutdown()
+
+
+def test_benchmark_run_point(tmp_path, monkeypatch):
+    for name in ("DOCKERHUB_API_ENDPOINT", "GITHUB_API_ENDPOINT", "DOCKERHUB_API_TOKEN", "GITHUB_API_TOKEN"):
+        # Restored after the test, since the benchmark points the providers to the stub registry.
+        monkeypatch.setenv(name, "benchmark")
+    registry = StubRegistry()
+    registry.start()
+    try:
+        benchmark = Benchmark(log=log, registry=registry, workdir=tmp_path / "work", run_config=RunConfig())
+        benchmark.repeats = 1
+        result = benchmark.run_point(params={"entries": 2, "tags": 30, "files": 2, "commits": 2})
+    finally:
+        registry.shutdown()
+    assert result["success"] == True
+    assert result["requests"] == 2
+    assert result["peak_memory_bytes"] > 0
+    assert {"clone", "push", "provider_page"} <= result["stage_seconds"].keys()
+    assert not (tmp_path / "work").exists()
+
+    baseline = [{"scenario": "entries", **result}]
+    slower = {**result, "update_seconds": {"median": result["update_seconds"]["median"] * 2}}
+    assert compare(results=[{"scenario": "entries", **slower}], baseline=baseline, threshold=0.2) != []
+    assert compare(results=baseline, baseline=baseline, threshold=0.2) == []
+
+
+def test_startup_lazy_imports():
+    assert get_loaded_modules("uptainer.cli") == []
+    assert get_loaded_modules("uptainer.loader") == []
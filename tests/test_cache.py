@@ -0,0 +1,224 @@
+import structlog
+from datetime import datetime
+from threading import Thread
+from time import sleep
+from uptainer.cache import LazyTags, TagCache
+from uptainer.config import Config
+from uptainer.providers.baseprovider import BaseProvider
+from uptainer.providers.oci import OCI
+from uptainer.typer import TyperTagPage
+from uptainer.uptainer import UpTainer
+
+log = structlog.get_logger()
+
+
+class FakeProvider(BaseProvider):
+    def __init__(self, log):
+        super().__init__(log=log)
+        self.name = "Fake"
+        self.calls = []
+
+    def get_tags_url(self, parent, project, name_filter=""):
+        return "page1"
+
+    def get_page(self, url, headers):
+        self.calls.append((url, headers.get("If-None-Match")))
+        sleep(0.1)
+        if headers.get("If-None-Match") == "abc":
+            return TyperTagPage(error=False, data=[], next=None, etag="abc", not_modified=True, pages=None)
+        tag = "v1.0.1" if url == "page1" else "v0.9.0"
+        return TyperTagPage(
+            error=False,
+            data=[{"last_update": datetime(2024, 11, 16, 19, 58, 7), "name": [tag]}],
+            next="page2" if url == "page1" else None,
+            etag="abc",
+            not_modified=False,
+            pages=None,
+        )
+
+
+def test_lazytags_early_exit():
+    provider = FakeProvider(log=log)
+    tags = LazyTags(pages=provider.iter_tag_pages("mirio", "verbacap"))
+    assert next(iter(tags))["name"] == ["v1.0.1"]
+    assert provider.calls == [("page1", None)]
+    assert [item["name"] for item in tags] == [["v1.0.1"], ["v0.9.0"]]
+    assert tags.complete == True
+
+
+def test_cache_shared():
+    provider = FakeProvider(log=log)
+    cache = TagCache(log=log)
+    results = []
+    threads = [
+        Thread(target=lambda: results.append(list(cache.get_tags(provider, "mirio", "verbacap"))))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert provider.calls == [("page1", None), ("page2", None)]
+    assert [len(item) for item in results] == [2] * 5
+
+
+def test_cache_file(tmp_path):
+    provider = FakeProvider(log=log)
+    cache = TagCache(log=log, cache_file=tmp_path / "tags.json", ttl=3600)
+    list(cache.get_tags(provider, "mirio", "verbacap"))
+    cache.save()
+
+    cache_reloaded = TagCache(log=log, cache_file=tmp_path / "tags.json", ttl=3600)
+    cached = list(cache_reloaded.get_tags(provider, "mirio", "verbacap"))
+    assert cached[0]["last_update"] == datetime(2024, 11, 16, 19, 58, 7)
+    assert len(provider.calls) == 2
+
+    cache_expired = TagCache(log=log, cache_file=tmp_path / "tags.json", ttl=0)
+    revalidated = list(cache_expired.get_tags(provider, "mirio", "verbacap"))
+    assert provider.calls[2:] == [("page1", "abc")]
+    assert [item["name"] for item in revalidated] == [["v1.0.1"], ["v0.9.0"]]
+
+
+def test_cache_file_partial(tmp_path):
+    provider = FakeProvider(log=log)
+    config = Config()
+    config.load(
+        config={
+            "name": "Foo",
+            "image_repository": "ghcr.io/mirio/verbacap",
+            "git_ssh_url": "git@example.com:foo/bar.git",
+            "git_values_filename": "values.yaml",
+            "values_key": "image.tag",
+            "version_match": "v1.[0-9]+.[0-9]+",
+        }
+    )
+    uptainer = UpTainer(config=config, log=log)
+    uptainer.provider = provider
+    cache = TagCache(log=log, cache_file=tmp_path / "tags.json", ttl=3600)
+    assert uptainer.detect_version(tags=cache.get_tags(provider, "mirio", "verbacap"))["data"] == "v1.0.1"
+    assert provider.calls == [("page1", None)]
+    cache.save()
+
+    cache_reloaded = TagCache(log=log, cache_file=tmp_path / "tags.json", ttl=3600)
+    cached = cache_reloaded.get_tags(provider, "mirio", "verbacap")
+    assert uptainer.detect_version(tags=cached)["data"] == "v1.0.1"
+    assert len(provider.calls) == 1
+    assert [item["name"] for item in cached] == [["v1.0.1"], ["v0.9.0"]]
+    assert provider.calls[1:] == [("page1", None), ("page2", None)]
+
+    cache_expired = TagCache(log=log, cache_file=tmp_path / "tags.json", ttl=0)
+    revalidated = cache_expired.get_tags(provider, "mirio", "verbacap")
+    assert uptainer.detect_version(tags=revalidated)["data"] == "v1.0.1"
+    assert provider.calls[3:] == [("page1", "abc")]
+    assert [item["name"] for item in revalidated] == [["v1.0.1"], ["v0.9.0"]]
+    assert provider.calls[4:] == [("page1", None), ("page2", None)]
+    structlog.contextvars.clear_contextvars()
+
+
+class FakePagedProvider(FakeProvider):
+    def __init__(self, log):
+        super().__init__(log=log)
+        self.page_concurrency = 3
+
+    def get_page_url(self, url, number):
+        return f"page{number}"
+
+    def get_page(self, url, headers):
+        self.calls.append((url, headers.get("If-None-Match")))
+        number = int(url.removeprefix("page"))
+        sleep(0.1)
+        return TyperTagPage(
+            error=False,
+            data=[{"last_update": datetime(2024, 11, 16, 19, 58, 7), "name": [f"v1.{10 - number}.0"]}],
+            next=None,
+            etag="abc",
+            not_modified=False,
+            pages=8,
+        )
+
+
+def test_lazytags_concurrent_pages():
+    provider = FakePagedProvider(log=log)
+    tags = LazyTags(pages=provider.iter_tag_pages("mirio", "verbacap"))
+    names = []
+    for item in tags:
+        names.append(item["name"][0])
+        if item["name"] == ["v1.7.0"]:
+            break
+    assert names == ["v1.9.0", "v1.8.0", "v1.7.0"]
+    assert sorted(url for url, _ in provider.calls) == ["page1", "page2", "page3", "page4"]
+    assert [item["name"][0] for item in tags] == [f"v1.{10 - number}.0" for number in range(1, 9)]
+    assert tags.complete == True
+
+
+def test_lazytags_index():
+    provider = FakeProvider(log=log)
+    tags = LazyTags(pages=provider.iter_tag_pages("mirio", "verbacap"))
+    index = tags.get_index(pattern="v[0-9]+")
+    assert index.highest() == "v1.0.1"
+    assert tags.get_index(pattern="v[0-9]+") is index
+    assert tags.complete == True
+    assert len(provider.calls) == 2
+
+
+def test_cache_name_filter():
+    provider = FakeProvider(log=log)
+    cache = TagCache(log=log)
+    assert cache.get_tags(provider, "mirio", "verbacap", name_filter="v1") is not cache.get_tags(
+        provider, "mirio", "verbacap"
+    )
+    assert cache.get_tags(provider, "mirio", "verbacap", name_filter="v1") is cache.get_tags(
+        provider, "mirio", "verbacap", name_filter="v1"
+    )
+
+
+def test_cache_registries():
+    harbor = OCI(log=log, registry="harbor.example.com")
+    quay = OCI(log=log, registry="quay.io")
+    cache = TagCache(log=log)
+    assert cache.get_key(provider=harbor, parent="lib", project="app") == "OCI/harbor.example.com/lib/app"
+    assert cache.get_key(provider=quay, parent="lib", project="app") == "OCI/quay.io/lib/app"
+    assert cache.get_tags(harbor, "lib", "app") is not cache.get_tags(quay, "lib", "app")
+    assert cache.get_tags(quay, "lib", "app") is cache.get_tags(OCI(log=log, registry="quay.io"), "lib", "app")
+
+
+def test_cache_revalidate(tmp_path):
+    provider = FakeProvider(log=log)
+    cache = TagCache(log=log, cache_file=tmp_path / "tags.json", ttl=3600)
+    list(cache.get_tags(provider, "mirio", "verbacap"))
+    cache.save()
+
+    cache_expired = TagCache(log=log, cache_file=tmp_path / "tags.json", ttl=1)
+    key = cache_expired.get_key(provider="Fake", parent="mirio", project="verbacap")
+    cache_expired.entries[key]["timestamp"] -= 10
+    fetched = cache_expired.entries[key]["timestamp"]
+    assert cache_expired.is_expired(key) == True
+    assert cache_expired.revalidate(key=key, updated=fetched + 1) == False
+    assert cache_expired.revalidate(key=key, updated=fetched - 1) == True
+    assert cache_expired.is_expired(key) == False
+    assert [item["name"] for item in cache_expired.get_tags(provider, "mirio", "verbacap")] == [["v1.0.1"], ["v0.9.0"]]
+    assert len(provider.calls) == 2
+
+
+def test_cache_flush():
+    provider = FakeProvider(log=log)
+    cache = TagCache(log=log, ttl=3600)
+    first = cache.get_tags(provider, "mirio", "verbacap")
+    list(first)
+    cache.flush()
+    second = cache.get_tags(provider, "mirio", "verbacap")
+    assert second is not first
+    assert [item["name"] for item in second] == [["v1.0.1"], ["v0.9.0"]]
+    assert len(provider.calls) == 2
+
+
+def test_cache_flush_close_pages():
+    provider = FakePagedProvider(log=log)
+    cache = TagCache(log=log, ttl=3600)
+    tags = cache.get_tags(provider, "mirio", "verbacap")
+    assert next(iter(tags))["name"] == ["v1.9.0"]
+    pages = tags.pages
+    cache.flush()
+    assert tags.pages is None
+    assert pages.gi_frame is None
+    assert sorted(url for url, _ in provider.calls) == ["page1"]
@@ -0,0 +1,40 @@
+import pytest
+from datetime import UTC, datetime
+from uptainer.cadence import get_adaptive_interval, get_release_times
+
+DAY = 86400
+
+
+def test_release_times():
+    tags = [
+        {"last_update": datetime(2024, 11, 16), "name": ["v1.2.0", "latest"]},
+        {"last_update": datetime(2024, 11, 15, tzinfo=UTC), "name": "v1.1.0-alpine"},
+        {"last_update": datetime(2024, 11, 14), "name": ["nightly"]},
+        {"last_update": datetime(2024, 11, 10), "name": ["v1.0.0"]},
+        {"last_update": datetime.fromtimestamp(0, tz=UTC), "name": ["v0.9.0"]},
+    ]
+    times = get_release_times(tags=tags, pattern="v1.[0-9]+.[0-9]+")
+    assert times == [
+        datetime(2024, 11, 16, tzinfo=UTC).timestamp(),
+        datetime(2024, 11, 15, tzinfo=UTC).timestamp(),
+        datetime(2024, 11, 10, tzinfo=UTC).timestamp(),
+    ]
+
+
+def test_adaptive_interval():
+    bounds = {"min_interval": 300, "max_interval": DAY}
+    assert get_adaptive_interval(release_times=[], now=0, **bounds) == 300
+
+    weekly = [100 * DAY - week * 7 * DAY for week in range(10)]
+    # Right after a release, and when the next one is expected, the min interval is used.
+    assert get_adaptive_interval(release_times=weekly, now=100 * DAY + 60, **bounds) == 300
+    assert get_adaptive_interval(release_times=weekly, now=107 * DAY - 60, **bounds) == 300
+    # In the middle of the cadence it backs off.
+    assert get_adaptive_interval(release_times=weekly, now=103.5 * DAY, **bounds) == pytest.approx(0.35 * DAY)
+    # Overdue images back off more the longer they stay quiet, up to the max interval.
+    assert get_adaptive_interval(release_times=weekly, now=108 * DAY, **bounds) == pytest.approx(0.1 * DAY)
+    assert get_adaptive_interval(release_times=weekly, now=200 * DAY, **bounds) == DAY
+
+    yearly = [1000 * DAY, 635 * DAY]
+    assert get_adaptive_interval(release_times=yearly, now=1100 * DAY, **bounds) == DAY
+    assert get_adaptive_interval(release_times=[1000 * DAY], now=1000 * DAY + 3600, **bounds) == 360
@@ -1,6 +1,9 @@
+import pytest
 import structlog
 from uptainer.git import Git
+from uptainer.metrics import METRICS
 from os import getenv
+import git
 
 log = structlog.get_logger()
 homedir = getenv("HOME", "/home/runner")
@@ -25,3 +28,89 @@ def test_git_clone_repo():
     git_obj.create_workdir()
     check = git_obj.clone_repo()
     assert check["error"] == True
+
+
+def test_git_ls_remote_branch(git_remote):
+    remote_url = git_remote
+    git_obj = Git(log=log, remote_url=remote_url, branch="main", ssh_private_key="")
+    assert len(git_obj.ls_remote_branch()["data"]) == 40
+    git_obj = Git(log=log, remote_url=remote_url, branch="nonexists", ssh_private_key="")
+    assert git_obj.ls_remote_branch()["data"] is None
+
+
+def test_git_shallow_clone_push(tmp_path, git_remote):
+    remote_url = git_remote
+    git_obj = Git(log=log, remote_url=remote_url, branch="main", ssh_private_key="", clone_mode="shallow")
+    git_obj.work_directory = str(tmp_path / "workdir")
+    check = git_obj.clone_repo(sparse_paths=["charts/verbacap/values.yaml"])
+    assert check["error"] == False
+    assert (tmp_path / "workdir" / "charts" / "verbacap" / "values.yaml").exists()
+    assert not (tmp_path / "workdir" / "README.md").exists()
+
+    (tmp_path / "workdir" / "charts" / "verbacap" / "values.yaml").write_text("image:\n  tag: v1.0.1\n")
+    git_obj.repo.config_writer().set_value("user", "name", "test").set_value("user", "email", "t@e.com").release()
+    check = git_obj.push_repo(fpaths=["charts/verbacap/values.yaml"], commit_msg="chore: Update version to v1.0.1")
+    assert check["error"] == False
+    remote = git.Repo(tmp_path / "remote.git")
+    assert remote.commit("main").message == "chore: Update version to v1.0.1"
+    assert len(remote.commit("main").parents) == 1
+
+
+def test_git_bare_clone_push(tmp_path, git_remote):
+    remote_url = git_remote
+    git_obj = Git(log=log, remote_url=remote_url, branch="main", ssh_private_key="", clone_mode="bare")
+    git_obj.work_directory = str(tmp_path / "workdir")
+    check = git_obj.clone_repo(sparse_paths=["charts/verbacap/values.yaml", "charts/missing/values.yaml"])
+    assert check["error"] == False
+    assert git_obj.repo.bare == True
+    assert (tmp_path / "workdir" / "charts" / "verbacap" / "values.yaml").read_text() == "image:\n  tag: v1.0.0\n"
+    assert not (tmp_path / "workdir" / "README.md").exists()
+
+    check = git_obj.push_repo(fpaths=["charts/verbacap/values.yaml"], commit_msg="chore: Nothing")
+    assert check["error"] == False
+    remote = git.Repo(tmp_path / "remote.git")
+    assert remote.commit("main").message == "init"
+
+    (tmp_path / "workdir" / "charts" / "verbacap" / "values.yaml").write_text("image:\n  tag: v1.0.1\n")
+    git_obj.repo.config_writer().set_value("user", "name", "test").set_value("user", "email", "t@e.com").release()
+    check = git_obj.push_repo(fpaths=["charts/verbacap/values.yaml"], commit_msg="chore: Update version to v1.0.1")
+    assert check["error"] == False
+    commit = remote.commit("main")
+    assert commit.message == "chore: Update version to v1.0.1\n"
+    assert commit.author.email == "t@e.com"
+    assert (commit.tree / "charts/verbacap/values.yaml").data_stream.read() == b"image:\n  tag: v1.0.1\n"
+    assert (commit.tree / "README.md").data_stream.read() == b"readme\n"
+    assert git_obj.get_head_sha() == commit.hexsha
+
+
+@pytest.mark.parametrize("clone_mode", ["full", "bare"])
+def test_git_push_race(tmp_path, git_remote, clone_mode):
+    remote_url = git_remote
+    values = "charts/verbacap/values.yaml"
+    git_objs = []
+    for name in ("first", "second", "third"):
+        git_obj = Git(log=log, remote_url=remote_url, branch="main", ssh_private_key="", clone_mode=clone_mode)
+        git_obj.work_directory = str(tmp_path / name)
+        git_obj.push_backoff = 0.01
+        assert git_obj.clone_repo(sparse_paths=[values, "README.md"])["error"] == False
+        git_objs.append(git_obj)
+    first, second, third = git_objs
+    (tmp_path / "first" / "README.md").write_text("updated readme\n")
+    assert first.push_repo(fpaths=["README.md"], commit_msg="docs: Update readme")["error"] == False
+
+    def reapply():
+        (tmp_path / "third" / values).write_text("image:\n  tag: v1.0.1\n")
+        return [values]
+
+    (tmp_path / "second" / values).write_text("image:\n  tag: v1.0.1\n")
+    assert second.push_repo(fpaths=[values], commit_msg="chore: Update version to v1.0.1")["error"] == True
+    retries = METRICS.get("git_push_retries_total")
+    reapply()
+    assert third.push_repo(fpaths=[values], commit_msg="chore: Update version to v1.0.1", reapply=reapply) == {
+        "error": False
+    }
+    assert METRICS.get("git_push_retries_total") == retries + 1
+    commit = git.Repo(tmp_path / "remote.git").commit("main")
+    assert commit.message.strip() == "chore: Update version to v1.0.1"
+    assert commit.parents[0].message.strip() == "docs: Update readme"
+    assert (commit.tree / values).data_stream.read() == b"image:\n  tag: v1.0.1\n"
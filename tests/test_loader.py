@@ -1,6 +1,16 @@
+import git
+import pytest
 import structlog
+from uptainer.config import Config, RunConfig
+from uptainer.git import Git
 from uptainer.loader import Loader
+from uptainer.metrics import METRICS
+from uptainer.providers.github import GitHub
+from uptainer.uptainer import UpTainer
+from os import environ
 from pathlib import Path
+from time import sleep
+from structlog.contextvars import get_contextvars
 
 log = structlog.get_logger()
 
@@ -16,3 +26,179 @@ def test_loader():
     loader_obj = Loader(log=log, config_file=Path("tests/assets/config.yaml"))
     config = loader_obj.read_config()
     assert config["data"]["repos"][0]["name"] == "Foo"
+
+
+def test_loader_workers(tmp_path):
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(
+        "repos:\n"
+        + "".join(
+            f"  - name: Repo{idx}\n"
+            "    image_repository: example.com/provider/missing\n"
+            "    git_ssh_url: git@example.com:foo/bar.git\n"
+            "    git_values_filename: values.yaml\n"
+            "    values_key: image.tag\n"
+            "    version_match: v1.[0-9]+.[0-9]+\n"
+            for idx in range(4)
+        )
+    )
+    run_config = RunConfig()
+    run_config.workers = 2
+    loader_obj = Loader(log=log, config_file=config_file, run_config=run_config)
+    summary = loader_obj.run()
+    assert summary["error"] == True
+    assert summary["data"] == {"Repo0": False, "Repo1": False, "Repo2": False, "Repo3": False}
+    assert "reponame" not in get_contextvars()
+
+
+def test_loader_group_repos():
+    repo = {
+        "image_repository": "ghcr.io/mirio/verbacap",
+        "git_ssh_url": "git@github.com:Mirio/verbacap-chart.git",
+        "git_values_filename": "values.yaml",
+        "values_key": "image.tag",
+        "version_match": "v1.[0-9]+.[0-9]+",
+    }
+    loader_obj = Loader(log=log, config_file=Path("tests/assets/config.yaml"))
+    groups = loader_obj.group_repos(repos=[
+        {**repo, "name": "Foo"},
+        {**repo, "name": "Bar", "values_key": "sidecar.tag"},
+        {**repo, "name": "Baz", "git_branch": "develop"},
+        {**repo, "name": "Qux", "git_ssh_privatekey": "/keys/deploy"},
+    ])
+    default_key = f"{environ.get('HOME', '/tmp')}/.ssh/id_rsa"
+    assert list(groups.keys()) == [
+        ("git@github.com:Mirio/verbacap-chart.git", "main", default_key),
+        ("git@github.com:Mirio/verbacap-chart.git", "develop", default_key),
+        ("git@github.com:Mirio/verbacap-chart.git", "main", "/keys/deploy"),
+    ]
+    assert [
+        config.name for config in groups[("git@github.com:Mirio/verbacap-chart.git", "main", default_key)]
+    ] == ["Foo", "Bar"]
+
+
+@pytest.mark.parametrize("clone_mode", ["full", "bare"])
+def test_loader_run_group(tmp_path, git_config, monkeypatch, clone_mode):
+    config_file = git_config(repos=(("Foo", "image.tag"), ("Bar", "sidecar.tag")))
+    monkeypatch.setattr(UpTainer, "get_new_version", lambda self: {"error": False, "data": "v1.0.1"})
+    run_config = RunConfig()
+    run_config.state_file = tmp_path / "state.db"
+    run_config.clone_mode = clone_mode
+    summary = Loader(log=log, config_file=config_file, run_config=run_config).run()
+    assert summary == {"error": False, "data": {"Foo": True, "Bar": True}}
+    remote = git.Repo(tmp_path / "remote.git")
+    assert remote.commit("main").message.startswith("chore: Update versions")
+    assert len(remote.commit("main").parents) == 1
+    assert (remote.commit("main").tree / "charts/verbacap/values.yaml").data_stream.read() == (
+        b"image:\n  tag: v1.0.1\nsidecar:\n  tag: v1.0.1\n"
+    )
+
+    monkeypatch.setattr(Git, "clone_repo", lambda *args, **kwargs: pytest.fail("Unchanged repos cloned"))
+    summary = Loader(log=log, config_file=config_file, run_config=run_config).run()
+    assert summary == {"error": False, "data": {"Foo": True, "Bar": True}}
+
+
+def test_loader_speculative_clone(tmp_path, git_config, monkeypatch):
+    config_file = git_config()
+    events = []
+    clone_repo = Git.clone_repo
+
+    def get_new_version(self):
+        sleep(0.2)
+        events.append("lookup")
+        return {"error": False, "data": "v1.0.1"}
+
+    def clone(self, *args, **kwargs):
+        events.append("clone")
+        return clone_repo(self, *args, **kwargs)
+
+    monkeypatch.setattr(UpTainer, "get_new_version", get_new_version)
+    monkeypatch.setattr(Git, "clone_repo", clone)
+    cloned_bytes = METRICS.get("git_clone_bytes_total")
+    run_config = RunConfig()
+    run_config.metrics_file = tmp_path / "metrics" / "uptainer.prom"
+    summary = Loader(log=log, config_file=config_file, run_config=run_config).run()
+    assert summary == {"error": False, "data": {"Foo": True}}
+    assert events == ["clone", "lookup"]
+    assert METRICS.get("git_clone_bytes_total") > cloned_bytes
+    assert 'uptainer_stage_seconds_count{stage="push"}' in run_config.metrics_file.read_text()
+    remote = git.Repo(tmp_path / "remote.git")
+    assert remote.commit("main").message.strip() == "chore: Update version to v1.0.1"
+
+
+def test_loader_revalidate_github(tmp_path, monkeypatch):
+    run_config = RunConfig()
+    run_config.tag_cache_file = tmp_path / "tags.json"
+    run_config.tag_cache_ttl = 60
+    loader = Loader(log=log, config_file=tmp_path / "config.yaml", run_config=run_config)
+    for project, fetched in (("verbacap", 1000.0), ("fresh", 1000.0), ("solo", 1000.0)):
+        parent = "other" if project == "solo" else "mirio"
+        key = loader.tag_cache.get_key(provider="GitHub", parent=parent, project=project)
+        loader.tag_cache.entries[key] = {"etag": "abc", "timestamp": fetched, "data": []}
+    configs = []
+    for image in ("ghcr.io/mirio/verbacap", "ghcr.io/mirio/Fresh", "ghcr.io/other/solo", "mirio/verbacap"):
+        config = Config()
+        config.load(
+            config={
+                "name": image,
+                "image_repository": image,
+                "git_ssh_url": "git@example.com:foo/bar.git",
+                "git_values_filename": "values.yaml",
+                "values_key": "image.tag",
+                "version_match": "v1.[0-9]+.[0-9]+",
+            }
+        )
+        configs.append(config)
+    loader.tag_cache.entries["GitHub/mirio/Fresh"] = loader.tag_cache.entries.pop("GitHub/mirio/fresh")
+    requests = []
+
+    def get_packages_updated(self, parent):
+        requests.append(parent)
+        return {"error": False, "data": {"verbacap": 2000.0, "fresh": 500.0}}
+
+    monkeypatch.setattr(GitHub, "get_packages_updated", get_packages_updated)
+    with loader.pipeline:
+        loader.revalidate_github(configs=configs)
+    assert requests == ["mirio"]
+    assert loader.tag_cache.is_expired("GitHub/mirio/verbacap") == True
+    assert loader.tag_cache.is_expired("GitHub/mirio/Fresh") == False
+    assert loader.tag_cache.is_expired("GitHub/other/solo") == True
+
+
+@pytest.mark.parametrize("mode", ["cprofile", "sample"])
+def test_loader_profile(tmp_path, git_config, monkeypatch, mode):
+    config_file = git_config()
+    monkeypatch.setattr(UpTainer, "get_new_version", lambda self: {"error": False, "data": "v1.0.1"})
+    run_config = RunConfig()
+    run_config.profile = mode
+    run_config.profile_dir = tmp_path / "profile"
+    summary = Loader(log=log, config_file=config_file, run_config=run_config).run()
+    assert summary == {"error": False, "data": {"Foo": True}}
+    suffix = ".prof" if mode == "cprofile" else ".folded"
+    for stage in ("lookup", "clone", "apply", "push"):
+        assert (tmp_path / "profile" / f"Foo.{stage}{suffix}").exists()
+    assert "Foo [push]" in (tmp_path / "profile" / "report.txt").read_text()
+
+
+def test_loader_shard():
+    repos = [
+        {
+            "name": f"Repo{idx}",
+            "image_repository": "ghcr.io/mirio/verbacap",
+            "git_ssh_url": f"git@github.com:Mirio/chart{idx % 6}.git",
+            "git_values_filename": f"values{idx}.yaml",
+            "values_key": "image.tag",
+            "version_match": "v1.[0-9]+.[0-9]+",
+        }
+        for idx in range(30)
+    ]
+    shards = []
+    for index in (1, 2, 3):
+        run_config = RunConfig()
+        run_config.shard_index, run_config.shard_count = index, 3
+        loader_obj = Loader(log=log, config_file=Path("tests/assets/config.yaml"), run_config=run_config)
+        shards.append([config.name for config in loader_obj.load_configs(repos=repos)])
+    assert sorted(name for shard in shards for name in shard) == sorted(repo["name"] for repo in repos)
+    for shard in shards:
+        remotes = {int(name.removeprefix("Repo")) % 6 for name in shard}
+        assert all(f"Repo{idx}" in shard for idx in range(30) if idx % 6 in remotes)
@@ -0,0 +1,62 @@
+import requests
+import structlog
+from threading import Thread
+from uptainer.metrics import Metrics, MetricsServer
+
+log = structlog.get_logger()
+
+
+def test_metrics():
+    metrics = Metrics()
+    assert metrics.get("git_push_retries_total") == 0
+    threads = [Thread(target=lambda: [metrics.inc("git_push_retries_total") for _ in range(1000)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    metrics.inc("git_push_failures_total", 2)
+    assert metrics.snapshot() == {"git_push_retries_total": 4000, "git_push_failures_total": 2}
+
+
+def test_metrics_render(tmp_path):
+    metrics = Metrics()
+    metrics.inc("provider_pages_total", provider="GitHub")
+    metrics.inc("provider_pages_total", 2, provider='Docker"Hub')
+    metrics.set("provider_quota_remaining", 4999, provider="GitHub")
+    with metrics.span(log=log, stage="clone"):
+        pass
+    with metrics.span(log=log, stage="clone"):
+        pass
+    assert metrics.snapshot() == {
+        'provider_pages_total{provider="GitHub"}': 1,
+        'provider_pages_total{provider="Docker\\"Hub"}': 2,
+        'provider_quota_remaining{provider="GitHub"}': 4999,
+    }
+    lines = metrics.render().splitlines()
+    assert lines[:3] == [
+        "# TYPE uptainer_provider_pages counter",
+        'uptainer_provider_pages_total{provider="Docker\\"Hub"} 2',
+        'uptainer_provider_pages_total{provider="GitHub"} 1',
+    ]
+    assert 'uptainer_stage_seconds_count{stage="clone"} 2' in lines
+    assert lines[-1] == "# EOF"
+
+    metrics.write_textfile(tmp_path / "uptainer.prom")
+    content = (tmp_path / "uptainer.prom").read_text()
+    assert content.startswith("# TYPE uptainer_provider_pages_total counter\n")
+    assert "# EOF" not in content
+
+
+def test_metrics_server():
+    metrics = Metrics()
+    metrics.inc("git_push_retries_total")
+    server = MetricsServer(log=log, host="127.0.0.1", port=0, metrics=metrics)
+    server.start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    reply = requests.get(f"{url}/metrics", headers={"Accept": "application/openmetrics-text; version=1.0.0"})
+    assert reply.headers["Content-Type"].startswith("application/openmetrics-text")
+    assert "uptainer_git_push_retries_total 1" in reply.text
+    assert requests.get(f"{url}/metrics").headers["Content-Type"].startswith("text/plain")
+    assert requests.get(f"{url}/other").status_code == 404
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,39 @@
+import git
+import structlog
+from uptainer.git import Git
+from uptainer.mirror import MirrorCache
+
+log = structlog.get_logger()
+
+
+def test_mirror_checkout(tmp_path, git_remote):
+    cache = MirrorCache(log=log, cache_dir=tmp_path / "cache")
+    with cache.checkout(remote_url=git_remote, env={}) as mirror:
+        assert mirror["error"] == False
+        assert git.Repo(mirror["data"]).bare
+
+    seed = git.Repo(tmp_path / "seed")
+    (tmp_path / "seed" / "README.md").write_text("updated\n")
+    seed.index.add(["README.md"])
+    seed.index.commit("update", author=git.Actor("test", "test@example.com"))
+    seed.remotes.origin.push("main")
+    with cache.checkout(remote_url=git_remote, env={}) as mirror:
+        assert git.Repo(mirror["data"]).commit("main").message == "update"
+
+
+def test_mirror_clone(tmp_path, git_remote):
+    cache = MirrorCache(log=log, cache_dir=tmp_path / "cache")
+    git_obj = Git(log=log, remote_url=git_remote, branch="main", ssh_private_key="")
+    git_obj.work_directory = str(tmp_path / "workdir")
+    check = git_obj.clone_repo(mirror_cache=cache)
+    assert check["error"] == False
+    assert git_obj.repo.remotes.origin.url == git_remote
+    assert (tmp_path / "workdir" / "charts" / "verbacap" / "values.yaml").exists()
+
+
+def test_mirror_evict(tmp_path, git_remote):
+    cache = MirrorCache(log=log, cache_dir=tmp_path / "cache", max_size=1)
+    with cache.checkout(remote_url=git_remote, env={}) as mirror:
+        cache.evict()
+        assert cache.get_path(git_remote).exists()
+    assert not cache.get_path(git_remote).exists()
@@ -0,0 +1,32 @@
+import structlog
+from threading import Lock
+from time import sleep
+from structlog.contextvars import bind_contextvars, clear_contextvars, get_contextvars
+from uptainer.pipeline import Pipeline
+
+log = structlog.get_logger()
+
+
+def test_pipeline_limits():
+    running = {"registry": 0, "git": 0}
+    peaks = {"registry": 0, "git": 0}
+    lock = Lock()
+
+    def work(name):
+        with lock:
+            running[name] += 1
+            peaks[name] = max(peaks[name], running[name])
+        sleep(0.05)
+        with lock:
+            running[name] -= 1
+        return get_contextvars().get("reponame")
+
+    with Pipeline(log=log, registry=3, git=1) as pipeline:
+        bind_contextvars(reponame="Foo")
+        futures = [pipeline.submit("registry", work, "registry") for _ in range(9)]
+        futures += [pipeline.submit("git", work, "git") for _ in range(3)]
+        with pipeline.stage("git"):
+            work("git")
+        assert [future.result() for future in futures] == ["Foo"] * 12
+    clear_contextvars()
+    assert peaks == {"registry": 3, "git": 1}
@@ -0,0 +1,47 @@
+import pstats
+import structlog
+from time import sleep
+from uptainer.profiler import Profiler
+
+log = structlog.get_logger()
+
+
+def busy_function():
+    sleep(0.05)
+    return sum(range(10000))
+
+
+def test_profiler_cprofile(tmp_path):
+    profiler = Profiler(log=log, output_dir=tmp_path)
+    with profiler.profile(name="Foo/Bar", stage="lookup"):
+        busy_function()
+        with profiler.profile(name="Foo/Bar", stage="apply"):
+            busy_function()
+    with profiler.profile(name="Baz", stage="lookup"):
+        pass
+    assert sorted(profiler.results) == [("Baz", "lookup"), ("Foo/Bar", "lookup")]
+    assert profiler.results[("Foo/Bar", "lookup")]["seconds"] > profiler.results[("Baz", "lookup")]["seconds"]
+    assert profiler.results[("Foo/Bar", "lookup")]["memory_peak"] is None
+    stats = pstats.Stats(str(tmp_path / "Foo_Bar.lookup.prof"))
+    assert any(function[2] == "busy_function" for function in stats.stats)
+    report = profiler.write_report().read_text()
+    assert report.index("Foo/Bar [lookup]") < report.index("Baz [lookup]")
+    assert "busy_function" in report
+
+
+def test_profiler_sample_memory(tmp_path):
+    profiler = Profiler(log=log, output_dir=tmp_path, mode="sample")
+    profiler.memory = True
+    profiler.interval = 0.001
+    with profiler.profile(name="Foo", stage="apply"):
+        data = [str(idx) * 10 for idx in range(10000)]
+        busy_function()
+    profiler.close()
+    assert len(data) == 10000
+    assert profiler.results[("Foo", "apply")]["memory_peak"] > 0
+    assert (tmp_path / "Foo.apply.tracemalloc").exists()
+    folded = (tmp_path / "Foo.apply.folded").read_text()
+    assert "test_profiler.py:busy_function" in folded
+    report = profiler.write_report().read_text()
+    assert "Top functions by samples" in report
+    assert "test_profiler.py" in report.split("Top allocations")[1]
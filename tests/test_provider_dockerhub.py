@@ -18,7 +18,14 @@ def test_metadata():
 def test_image_version():
     provider_dh = DockerHub(log=log)
     image_versions = provider_dh.get_image_versions("library", "nginx")
-    assert len(image_versions["data"]) == 200
+    assert len(image_versions["data"]) == provider_dh.max_pages * provider_dh.page_size
 
     image_versions = provider_dh.get_image_versions("mirio", "githubapi-proxycache")
     assert image_versions["data"][0]["name"] == "latest"
+
+
+def test_tags_url_name_filter():
+    provider_dh = DockerHub(log=log)
+    assert provider_dh.supports_name_filter == True
+    assert "&name=" not in provider_dh.get_tags_url("library", "postgres")
+    assert provider_dh.get_tags_url("library", "postgres", name_filter="16.").endswith("&name=16.")
@@ -1,4 +1,9 @@
+import json
 import structlog
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from urllib.parse import parse_qs, urlparse
 from uptainer.providers.github import GitHub
 
 log = structlog.get_logger()
@@ -22,3 +27,40 @@ def test_image_version():
 
     image_version_pages = provider_obj.get_image_versions("immich-app", "immich-server")
     assert len(image_version_pages["data"]) > 50
+
+
+class PackagesHandler(BaseHTTPRequestHandler):
+    """Stub of the GitHub packages API, with 2 packages for each page."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/users/mirio/packages" or parse_qs(url.query)["package_type"] != ["container"]:
+            self.send_response(404)
+            self.end_headers()
+            return
+        page = int(parse_qs(url.query).get("page", ["1"])[0])
+        packages = [
+            {"name": f"image{number}", "updated_at": f"2024-11-{number + 10}T19:58:07Z"} for number in range(1, 4)
+        ]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if page == 1:
+            self.send_header("Link", f'<http://{self.headers["Host"]}{url.path}?{url.query}&page=2>; rel="next"')
+        self.end_headers()
+        self.wfile.write(json.dumps(packages[:2] if page == 1 else packages[2:]).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+def test_packages_updated():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PackagesHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    provider_obj = GitHub(log=log)
+    provider_obj.endpoint = f"http://127.0.0.1:{server.server_port}"
+    packages = provider_obj.get_packages_updated("mirio")
+    assert packages["error"] == False
+    assert sorted(packages["data"]) == ["image1", "image2", "image3"]
+    assert packages["data"]["image3"] == datetime(2024, 11, 13, 19, 58, 7, tzinfo=timezone.utc).timestamp()
+    assert provider_obj.get_packages_updated("other")["error"] == True
+    server.shutdown()
@@ -0,0 +1,91 @@
+import json
+import structlog
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from urllib.parse import parse_qs, urlparse
+from uptainer.config import Config
+from uptainer.metrics import METRICS
+from uptainer.providers.oci import OCI
+from uptainer.uptainer import UpTainer
+
+log = structlog.get_logger()
+TAGS = sorted([f"v1.{minor}.0" for minor in range(12)] + ["latest"])
+
+
+class RegistryHandler(BaseHTTPRequestHandler):
+    """Stub of a registry:2 server with token authentication."""
+
+    tokens = 0
+    requests = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        RegistryHandler.requests.append(self.path)
+        if url.path == "/token":
+            RegistryHandler.tokens += 1
+            assert query["scope"] == ["repository:mirio/charts/verbacap:pull"]
+            return self.reply(200, {"token": "secret", "expires_in": 300})
+        if self.headers.get("Authorization") != "Bearer secret":
+            self.send_response(401)
+            self.send_header(
+                "WWW-Authenticate",
+                f'Bearer realm="http://{self.headers["Host"]}/token",service="registry",'
+                'scope="repository:mirio/charts/verbacap:pull"',
+            )
+            self.end_headers()
+            return None
+        if url.path != "/v2/mirio/charts/verbacap/tags/list":
+            return self.reply(404, {"errors": [{"code": "NAME_UNKNOWN"}]})
+        size = int(query["n"][0])
+        tags = [tag for tag in TAGS if tag > query.get("last", [""])[0]][:size]
+        return self.reply(200, {"name": "mirio/charts/verbacap", "tags": tags})
+
+    def reply(self, status, content):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(json.dumps(content).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+def test_oci_tags(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RegistryHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    registry = f"127.0.0.1:{server.server_port}"
+    monkeypatch.setenv("OCI_INSECURE_REGISTRIES", registry)
+    monkeypatch.setenv("OCI_PAGE_SIZE", "5")
+    provider = OCI(log=log, registry=registry)
+
+    metadata = provider.get_metadata(f"{registry}/mirio/charts/verbacap")
+    assert metadata["data"] == {"parent": "mirio/charts", "project": "verbacap"}
+    assert provider.get_metadata("example.com/verbacap")["error"] == True
+
+    pages = METRICS.get("provider_pages_total", provider="OCI")
+    image_versions = provider.get_image_versions("mirio/charts", "verbacap")
+    assert [item["name"] for item in image_versions["data"]] == TAGS
+    assert METRICS.get("provider_pages_total", provider="OCI") == pages + 3
+    assert RegistryHandler.tokens == 1
+
+    RegistryHandler.requests = []
+    assert provider.get_image_versions("mirio/charts", "missing")["error"] == True
+    assert not any(path.startswith("/token") for path in RegistryHandler.requests)
+
+    config = Config()
+    config.load(
+        config={
+            "name": "Foo",
+            "image_repository": f"{registry}/mirio/charts/verbacap",
+            "git_ssh_url": "git@example.com:foo/bar.git",
+            "git_values_filename": "values.yaml",
+            "values_key": "image.tag",
+            "version_match": "v1.[0-9]+.[0-9]+",
+            "image_provider": "oci",
+        }
+    )
+    version = UpTainer(config=config, log=log).get_new_version()
+    server.shutdown()
+    assert version == {"error": False, "data": "v1.11.0"}
+    assert RegistryHandler.tokens == 1
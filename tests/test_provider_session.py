@@ -0,0 +1,52 @@
+import structlog
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from uptainer.providers.session import ProviderSession, get_session
+
+log = structlog.get_logger()
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    calls = 0
+
+    def do_GET(self):
+        FlakyHandler.calls += 1
+        if FlakyHandler.calls == 1:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+        elif FlakyHandler.calls == 2:
+            self.send_response(503)
+        else:
+            self.send_response(200)
+            self.send_header("X-RateLimit-Remaining", "4999")
+            self.send_header("X-RateLimit-Reset", "1700000000")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+def test_session_retry():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    session = ProviderSession(log=log, name="Test")
+    session.backoff = 0.01
+    response = session.get(f"http://127.0.0.1:{server.server_port}/tags")
+    server.shutdown()
+    assert response.status_code == 200
+    assert FlakyHandler.calls == 3
+    assert session.quota_remaining == 4999
+    assert session.quota_reset == 1700000000
+
+
+def test_session_unreachable():
+    session = ProviderSession(log=log, name="Test")
+    session.max_retries = 1
+    session.backoff = 0.01
+    assert session.get("http://127.0.0.1:1/tags") is None
+
+
+def test_session_shared():
+    assert get_session(name="Test", log=log) is get_session(name="Test", log=log)
+    assert get_session(name="Test", log=log) is not get_session(name="Other", log=log)
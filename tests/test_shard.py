@@ -0,0 +1,34 @@
+from uptainer.shard import get_shard, get_shard_key, parse_shard
+
+
+def test_parse_shard():
+    assert parse_shard("2/5") == (2, 5)
+    assert parse_shard(" 1 / 1 ") == (1, 1)
+    assert parse_shard("0/3") is None
+    assert parse_shard("4/3") is None
+    assert parse_shard("1/0") is None
+    assert parse_shard("1-3") is None
+
+
+def test_get_shard_key():
+    assert get_shard_key("git@github.com:foo/bar.git") == get_shard_key("git@github.com:foo/bar")
+    assert get_shard_key("https://github.com/foo/bar/") == "https://github.com/foo/bar"
+
+
+def test_get_shard():
+    keys = [f"git@github.com:org/repo{idx}.git" for idx in range(1000)]
+    assert all(get_shard(key, 1) == 1 for key in keys)
+    shards = {key: get_shard(key, 4) for key in keys}
+    assert shards == {key: get_shard(key, 4) for key in keys}
+    counts = [list(shards.values()).count(shard) for shard in range(1, 5)]
+    assert min(counts) > 200
+
+    # Adding a shard moves only the keys that go to the new one, about 1/5 of them.
+    grown = {key: get_shard(key, 5) for key in keys}
+    moved = [key for key in keys if grown[key] != shards[key]]
+    assert all(grown[key] == 5 for key in moved)
+    assert 150 < len(moved) < 250
+
+    # Removing a shard moves only its keys.
+    shrunk = {key: get_shard(key, 3) for key in keys}
+    assert all(shrunk[key] == shards[key] for key in keys if shards[key] != 4)
@@ -0,0 +1,28 @@
+import structlog
+from uptainer.config import Config
+from uptainer.state import StateStore
+from uptainer.typer import TyperRepoState
+
+log = structlog.get_logger()
+
+
+def test_state(tmp_path):
+    config = Config()
+    config.load(config={
+        "name": "Foo",
+        "image_repository": "ghcr.io/mirio/verbacap",
+        "git_ssh_url": "git@github.com:Mirio/verbacap-chart.git",
+        "git_values_filename": "values.yaml",
+        "values_key": "image.tag",
+        "version_match": "v1.[0-9]+.[0-9]+",
+    })
+    store = StateStore(log=log, db_file=tmp_path / "state.db")
+    assert store.get(config=config) is None
+    assert store.is_unchanged(config=config, upstream_version="v1.0.1", remote_sha="abc") == False
+
+    store.set(config=config, state=TyperRepoState(upstream_version="v1.0.1", remote_sha="abc", current_version="v1.0.1"))
+    store_reloaded = StateStore(log=log, db_file=tmp_path / "state.db")
+    assert store_reloaded.get(config=config)["current_version"] == "v1.0.1"
+    assert store_reloaded.is_unchanged(config=config, upstream_version="v1.0.1", remote_sha="abc") == True
+    assert store_reloaded.is_unchanged(config=config, upstream_version="v1.0.2", remote_sha="abc") == False
+    assert store_reloaded.is_unchanged(config=config, upstream_version="v1.0.1", remote_sha="def") == False
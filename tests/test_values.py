@@ -0,0 +1,98 @@
+import structlog
+from uptainer.values import ValuesFile
+
+log = structlog.get_logger()
+
+VALUES = """# Helm values
+image:
+  repository: ghcr.io/mirio/verbacap  # upstream image
+  tag: "v1.0.0"
+sidecar:
+  tag: 1.9
+
+containers:
+  - name: app
+    image:
+      tag: 'v2.0.0'
+"""
+
+
+def test_values_get(tmp_path):
+    fpath = tmp_path / "values.yaml"
+    fpath.write_text(VALUES)
+    values_file = ValuesFile(log=log, fpath=str(fpath))
+    assert values_file.get(key="image.tag")["data"] == "v1.0.0"
+    assert values_file.get(key="sidecar.tag")["data"] == "1.9"
+    assert values_file.get(key="containers[0].image.tag")["data"] == "v2.0.0"
+    assert values_file.get(key="image.missing")["data"] is None
+    assert values_file.get(key="image")["error"] == True
+
+
+def test_values_set(tmp_path):
+    fpath = tmp_path / "values.yaml"
+    fpath.write_text(VALUES)
+    values_file = ValuesFile(log=log, fpath=str(fpath))
+    assert values_file.set(key="image.tag", value="v1.0.0")["changed"] == False
+    assert values_file.set(key="image.tag", value="v1.10.0")["changed"] == True
+    assert values_file.set(key="sidecar.tag", value="1.10")["changed"] == True
+    assert values_file.set(key="containers[0].image.tag", value="v2.1.0")["changed"] == True
+    values_file.save()
+    expected = (
+        VALUES.replace('"v1.0.0"', '"v1.10.0"').replace("tag: 1.9", "tag: '1.10'").replace("'v2.0.0'", "'v2.1.0'")
+    )
+    assert fpath.read_text() == expected
+    assert ValuesFile(log=log, fpath=str(fpath)).get(key="sidecar.tag")["data"] == "1.10"
+
+
+def test_values_set_missing_key(tmp_path):
+    fpath = tmp_path / "values.yaml"
+    fpath.write_text(VALUES)
+    values_file = ValuesFile(log=log, fpath=str(fpath))
+    values_file.set(key="image.tag", value="v1.1.0")
+    assert values_file.set(key="image.pullPolicy", value="Always")["changed"] == True
+    values_file.save()
+    reloaded = ValuesFile(log=log, fpath=str(fpath))
+    assert reloaded.get(key="image.pullPolicy")["data"] == "Always"
+    assert reloaded.get(key="image.tag")["data"] == "v1.1.0"
+
+
+def test_values_invalid(tmp_path):
+    fpath = tmp_path / "values.yaml"
+    fpath.write_text("image: [\n")
+    assert ValuesFile(log=log, fpath=str(fpath)).error == True
+
+
+def test_values_set_anchor(tmp_path):
+    fpath = tmp_path / "values.yaml"
+    fpath.write_text("image:\n  tag: &t v1.0.0  # pinned\n  digest: !!str abc\nother: *t\n")
+    values_file = ValuesFile(log=log, fpath=str(fpath))
+    assert values_file.set(key="image.tag", value="v1.1.0")["changed"] == True
+    assert values_file.set(key="image.digest", value="def")["changed"] == True
+    values_file.save()
+    assert fpath.read_text() == "image:\n  tag: &t v1.1.0  # pinned\n  digest: !!str def\nother: *t\n"
+    reloaded = ValuesFile(log=log, fpath=str(fpath))
+    assert reloaded.get(key="other")["data"] == "v1.1.0"
+
+
+def test_values_set_alias(tmp_path):
+    fpath = tmp_path / "values.yaml"
+    fpath.write_text("image:\n  tag: &t v1.0.0\nother: *t\n")
+    values_file = ValuesFile(log=log, fpath=str(fpath))
+    assert values_file.set(key="other", value="v2.0.0")["changed"] == True
+    values_file.save()
+    reloaded = ValuesFile(log=log, fpath=str(fpath))
+    assert reloaded.get(key="other")["data"] == "v2.0.0"
+    assert reloaded.get(key="image.tag")["data"] == "v1.0.0"
+
+
+def test_values_set_block_scalar(tmp_path):
+    fpath = tmp_path / "values.yaml"
+    fpath.write_text('image:\n  tag: |\n    v1\n  next: "a\n    b"\nanch: x\n')
+    values_file = ValuesFile(log=log, fpath=str(fpath))
+    assert values_file.set(key="image.tag", value="v2")["changed"] == True
+    assert values_file.set(key="image.next", value="c")["changed"] == True
+    values_file.save()
+    reloaded = ValuesFile(log=log, fpath=str(fpath))
+    assert reloaded.get(key="image.tag")["data"] == "v2"
+    assert reloaded.get(key="image.next")["data"] == "c"
+    assert reloaded.get(key="anch")["data"] == "x"
@@ -0,0 +1,71 @@
+from datetime import datetime
+from uptainer.versions import VersionIndex, get_literal_prefix, get_pattern, parse_constraint, parse_version, satisfies
+
+
+def test_parse_version():
+    assert parse_version("v1.2") == parse_version("1.2.0")
+    assert parse_version("1.2.3-rc.1") < parse_version("1.2.3")
+    assert parse_version("1.2.3-rc.2") < parse_version("1.2.3-rc.10")
+    assert parse_version("1.10.0") > parse_version("1.9.9")
+    assert parse_version("latest") is None
+    assert parse_version("1.25.3-alpine") == parse_version("1.25.3")
+    assert parse_version("1.25.3-slim") > parse_version("1.25.3-rc.1-alpine")
+    assert parse_version("1.0.0b1") < parse_version("1.0.0")
+
+
+def test_parse_constraint():
+    constraint = parse_constraint(">=1.2, <2")
+    assert satisfies(parse_version("1.2.0"), constraint) == True
+    assert satisfies(parse_version("1.99.1"), constraint) == True
+    assert satisfies(parse_version("2.0.0"), constraint) == False
+    assert satisfies(parse_version("1.1.9"), constraint) == False
+    assert satisfies(parse_version("2.0.0-rc.1"), constraint) == False
+    assert satisfies(parse_version("2.0.0-rc.1"), parse_constraint(">=2.0.0-rc.0")) == True
+    assert satisfies(parse_version("2.1.0-rc.1"), parse_constraint(">=2.0.0-rc.0")) == False
+    assert parse_constraint("=1.2")[0][0] == "=="
+    assert parse_constraint(">=foo") is None
+
+
+def test_get_pattern():
+    assert get_pattern("v[0-9]+") is get_pattern("v[0-9]+")
+
+
+def test_version_index():
+    tags = [
+        {"last_update": datetime(2024, 11, 16), "name": [f"v{major}.{minor}.0" for minor in range(20)]}
+        for major in range(5)
+    ]
+    tags.append({"last_update": datetime(2024, 11, 17), "name": "v3.0.0-rc.1"})
+    index = VersionIndex(tags=tags, pattern=r"v[0-9]+\.[0-9]+\.[0-9]+")
+    assert len(index) == 101
+    assert index.highest() == "v4.19.0"
+    assert index.highest(parse_constraint(">=1.2,<2")) == "v1.19.0"
+    assert index.highest(parse_constraint("<3")) == "v2.19.0"
+    assert index.highest(parse_constraint(">=3.0.0-rc.0,<3.0.0")) == "v3.0.0-rc.1"
+    assert index.highest(parse_constraint("<=2.5")) == "v2.5.0"
+    assert index.highest(parse_constraint(">2.5,!=2.19,<3.0.0-rc.1")) == "v2.18.0"
+    assert index.highest(parse_constraint("==1.3")) == "v1.3.0"
+    assert index.highest(parse_constraint(">5")) is None
+    assert VersionIndex(tags=tags, pattern=r"v[0-9]+\.[0-9]+\.[0-9]+$").highest(parse_constraint("<3")) == "v2.19.0"
+
+
+def test_version_index_suffix():
+    tags = [{"last_update": datetime(2024, 11, 16), "name": ["1.25.3-alpine", "1.26.0-alpine", "2.0.0-alpine"]}]
+    tags.append({"last_update": datetime(2024, 11, 17), "name": ["1.27.0-rc.1-alpine", "1.26.1"]})
+    index = VersionIndex(tags=tags, pattern=r"[0-9.]+(-rc\.[0-9]+)?-alpine")
+    constraint = parse_constraint(">=1.25,<2")
+    assert index.highest(constraint) == "1.26.0-alpine"
+    assert index.highest(parse_constraint(">=1.27.0-rc.0")) == "2.0.0-alpine"
+    assert index.highest(parse_constraint(">=1.27.0-rc.0,<1.27")) == "1.27.0-rc.1-alpine"
+    assert satisfies(parse_version("1.26.0-alpine"), constraint) == True
+    assert satisfies(parse_version("2.0.0-alpine"), constraint) == False
+
+
+def test_get_literal_prefix():
+    assert get_literal_prefix("v1.[0-9]+.[0-9]+") == "v1"
+    assert get_literal_prefix(r"^v1\.2\.[0-9]+$") == "v1.2."
+    assert get_literal_prefix("release-1?") == "release-"
+    assert get_literal_prefix("v1+") == "v1"
+    assert get_literal_prefix(r"\d+") == ""
+    assert get_literal_prefix("(?i)v1") == ""
+    assert get_literal_prefix("v1|v2") == ""
@@ -3,6 +3,8 @@ from datetime import datetime
 from uptainer.loader import Loader
 from uptainer.config import Config
 from uptainer.uptainer import UpTainer
+from uptainer.providers import get_provider_class
+from uptainer.providers.github import GitHub
 from pathlib import Path
 
 log = structlog.get_logger()
@@ -47,3 +49,58 @@ def test_detect_version():
         {'last_update': datetime(2024, 11, 16, 19, 58, 7), 'name': ['v1.0.1']}
     ])
     assert matched["data"] == "v1.0.1"
+
+
+def test_detect_version_selection():
+    loader_obj = Loader(log=log, config_file=Path("tests/assets/config.yaml"))
+    config = loader_obj.read_config()["data"]["repos"][0]
+    config_obj = Config()
+    config_obj.load(config=config)
+    config_obj.version_match = "v[0-9]+"
+    obj = UpTainer(config=config_obj, log=log)
+    tags = [
+        {'last_update': datetime(2024, 11, 16, 19, 58, 7), 'name': ['v1.2.0', 'latest']},
+        {'last_update': datetime(2024, 11, 15, 19, 58, 7), 'name': ['v2.1.0']},
+        {'last_update': datetime(2024, 11, 14, 19, 58, 7), 'name': ['v1.10.3']},
+    ]
+
+    assert obj.detect_version(tags=tags)["data"] == "v1.2.0"
+
+    config_obj.version_selection = "highest"
+    assert obj.detect_version(tags=tags)["data"] == "v2.1.0"
+
+    config_obj.version_constraint = ">=1.2,<2"
+    assert obj.detect_version(tags=tags)["data"] == "v1.10.3"
+
+    config_obj.version_selection = "latest"
+    assert obj.detect_version(tags=tags)["data"] == "v1.2.0"
+
+    config_obj.version_constraint = ">=3"
+    assert obj.detect_version(tags=tags)["error"] == True
+
+    config_obj.version_constraint = "~1.2"
+    assert obj.detect_version(tags=tags)["error"] == True
+
+
+def test_imageprovider_oci():
+    loader_obj = Loader(log=log, config_file=Path("tests/assets/config.yaml"))
+    config = loader_obj.read_config()["data"]["repos"][0]
+    config_obj = Config()
+    config_obj.load(config={**config, "image_provider": "oci"})
+    obj = UpTainer(config=config_obj, log=log)
+    provider = obj.get_image_provider(image_repository="quay.io/prometheus/node-exporter")
+    assert str(provider["data"]) == "OCI"
+    assert provider["data"].registry == "quay.io"
+    provider = obj.get_image_provider(image_repository="registry.example.com:5000/app")
+    assert provider["data"].registry == "registry.example.com:5000"
+    assert provider["data"].get_metadata("registry.example.com:5000/app")["data"] == {"parent": "", "project": "app"}
+    assert provider["data"].get_tags_url(parent="", project="app").startswith("https://registry.example.com:5000/v2/app/")
+
+    config_obj.image_provider = "missing"
+    assert obj.get_image_provider(image_repository="quay.io/prometheus/node-exporter")["error"] == True
+
+
+def test_provider_registry():
+    assert get_provider_class(hostname="GHCR.io") is GitHub
+    assert get_provider_class(hostname="docker.io").__name__ == "DockerHub"
+    assert get_provider_class(hostname="example.com") is None
@@ -0,0 +1,116 @@
+import os
+import structlog
+from threading import Thread
+from time import time
+from uptainer.loader import Loader
+from uptainer.watch import Watcher
+
+log = structlog.get_logger()
+
+
+def write_config(config_file, repos, mtime):
+    config_file.write_text(
+        "repos:\n"
+        + "".join(
+            f"  - name: {name}\n"
+            "    image_repository: ghcr.io/mirio/verbacap\n"
+            "    git_ssh_url: git@example.com:foo/bar.git\n"
+            "    git_values_filename: values.yaml\n"
+            "    values_key: image.tag\n"
+            f"    version_match: {match}\n"
+            + (f"    interval: {interval}\n" if interval else "")
+            for name, match, interval in repos
+        )
+    )
+    os.utime(config_file, ns=(mtime, mtime))
+
+
+def test_watch_schedule(tmp_path, monkeypatch):
+    config_file = tmp_path / "config.yaml"
+    write_config(config_file, [("Foo", "v1.*", 60), ("Bar", "v1.*", None)], mtime=1)
+    loader = Loader(log=log, config_file=config_file)
+    runs = []
+    monkeypatch.setattr(
+        loader, "run_configs", lambda configs: runs.append([config.name for config in configs]) or {"error": False}
+    )
+    watcher = Watcher(log=log, loader=loader)
+
+    assert watcher.reload() == True
+    assert watcher.reload() == False
+    assert watcher.run_due() == {"error": False}
+    assert runs == [["Foo", "Bar"]]
+    assert watcher.run_due() is None
+    assert watcher.scheduled["Bar"] - watcher.scheduled["Foo"] == 240
+
+    write_config(config_file, [("Foo", "v2.*", 60), ("Baz", "v1.*", None)], mtime=2)
+    assert watcher.reload() == True
+    assert sorted(watcher.scheduled) == ["Baz", "Foo"]
+    watcher.run_due()
+    assert runs[-1] == ["Foo", "Baz"]
+    assert watcher.get_wait(now=watcher.scheduled["Foo"] - 2) == 2
+
+    config_file.write_text("repos: [")
+    os.utime(config_file, ns=(3, 3))
+    assert watcher.reload() == False
+    assert sorted(watcher.configs) == ["Baz", "Foo"]
+
+    write_config(config_file, [("Foo", "v2.*", 60), ("Foo", "v3.*", None)], mtime=4)
+    assert watcher.reload() == False
+    assert watcher.configs["Foo"].version_match == "v2.*"
+
+    write_config(config_file, [("Foo", "v3.*", 60)], mtime=5)
+    monkeypatch.setattr(loader, "read_config", lambda: {"error": True, "data": {"repos": []}})
+    assert watcher.reload() == False
+    assert sorted(watcher.configs) == ["Baz", "Foo"]
+    monkeypatch.undo()
+    assert watcher.reload() == True
+    assert sorted(watcher.configs) == ["Foo"]
+
+
+def test_watch_revalidate_tags(tmp_path, monkeypatch):
+    config_file = tmp_path / "config.yaml"
+    write_config(config_file, [("Foo", "v1.*", 60)], mtime=1)
+    loader = Loader(log=log, config_file=config_file)
+    monkeypatch.setattr(loader, "run_configs", lambda configs: {"error": False})
+    key = loader.tag_cache.get_key(provider="GitHub", parent="mirio", project="verbacap")
+    loader.tag_cache.entries[key] = {"etag": "abc", "timestamp": time(), "data": [], "complete": True}
+    watcher = Watcher(log=log, loader=loader)
+    watcher.reload()
+    assert loader.tag_cache.is_expired(key) == False
+    watcher.run_due()
+    assert loader.tag_cache.is_expired(key) == True
+
+
+def test_watch_run(tmp_path, monkeypatch):
+    config_file = tmp_path / "config.yaml"
+    write_config(config_file, [("Foo", "v1.*", 1)], mtime=1)
+    loader = Loader(log=log, config_file=config_file)
+    runs = []
+    monkeypatch.setattr(loader, "run_configs", lambda configs: runs.append(len(configs)) or {"error": False})
+    watcher = Watcher(log=log, loader=loader)
+    watcher.run(max_runs=2)
+    assert runs == [1, 1]
+
+    thread = Thread(target=watcher.run)
+    thread.start()
+    watcher.stop()
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+
+
+def test_watch_adaptive_interval(tmp_path):
+    config_file = tmp_path / "config.yaml"
+    write_config(config_file, [("Foo", "v1.*", 60)], mtime=1)
+    loader = Loader(log=log, config_file=config_file)
+    watcher = Watcher(log=log, loader=loader)
+    watcher.reload()
+    config = watcher.configs["Foo"]
+    assert watcher.get_interval(config) == 60
+
+    loader.run_config.watch_max_interval = 3600
+    assert watcher.get_interval(config) == 60
+    loader.release_times["Foo"] = [time() - 60 * 86400, time() - 90 * 86400]
+    assert watcher.get_interval(config) == 3600
+    config.min_interval = 10
+    loader.release_times["Foo"] = [time() - 100]
+    assert 10 <= watcher.get_interval(config) < 60
@@ -0,0 +1,73 @@
+import json
+import pytest
+import requests
+import structlog
+from hashlib import sha256
+from hmac import new
+from uptainer.loader import Loader
+from uptainer.watch import Watcher, get_image_key
+from uptainer.webhook import WebhookServer
+from tests.test_watch import write_config
+
+log = structlog.get_logger()
+
+
+@pytest.fixture
+def webhook(tmp_path, monkeypatch):
+    monkeypatch.setenv("WEBHOOK_SECRET", "secret")
+    config_file = tmp_path / "config.yaml"
+    write_config(config_file, [("Foo", "v1.*", 3600), ("Bar", "v1.*", 3600)], mtime=1)
+    config_file.write_text(config_file.read_text().replace("ghcr.io/mirio/verbacap", "mirio/verbacap", 1))
+    loader = Loader(log=log, config_file=config_file)
+    watcher = Watcher(log=log, loader=loader)
+    watcher.reload()
+    watcher.pop_due(now=float("inf"))
+    server = WebhookServer(log=log, watcher=watcher, host="127.0.0.1", port=0)
+    server.start()
+    yield watcher, f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_image_key():
+    assert get_image_key("nginx") == "docker.io/library/nginx"
+    assert get_image_key("docker.io/_/nginx") == "docker.io/library/nginx"
+    assert get_image_key("Mirio/verbacap") == "docker.io/mirio/verbacap"
+    assert get_image_key("https://ghcr.io/Mirio/verbacap") == "ghcr.io/mirio/verbacap"
+    assert get_image_key("registry.example.com:5000/app") == "registry.example.com:5000/app"
+
+
+def test_webhook_dockerhub(webhook):
+    watcher, url = webhook
+    payload = {"push_data": {"tag": "v1.0.1"}, "repository": {"repo_name": "mirio/verbacap"}}
+    assert requests.post(url, json=payload).status_code == 401
+    reply = requests.post(f"{url}?token=secret", json=payload)
+    assert reply.status_code == 202
+    assert reply.json() == {"image": "docker.io/mirio/verbacap", "triggered": ["Foo"]}
+    assert sorted(watcher.scheduled) == ["Foo"]
+    due = watcher.scheduled["Foo"]
+    requests.post(f"{url}?token=secret", json=payload)
+    assert watcher.scheduled["Foo"] == due
+    assert requests.post(f"{url}?token=secret", data=b"[").status_code == 400
+
+
+def test_webhook_github(webhook):
+    watcher, url = webhook
+    key = watcher.loader.tag_cache.get_key(provider="GitHub", parent="Mirio", project="verbacap")
+    watcher.loader.tag_cache.entries[key] = {"etag": "abc", "timestamp": 1e12, "data": []}
+    payload = {
+        "action": "published",
+        "registry_package": {"name": "verbacap", "package_type": "CONTAINER", "owner": {"login": "Mirio"}},
+    }
+    body = json.dumps(payload).encode()
+    headers = {"X-GitHub-Event": "registry_package", "Content-Type": "application/json"}
+    assert requests.post(url, data=body, headers={**headers, "X-Hub-Signature-256": "sha256=00"}).status_code == 401
+    signature = "sha256=" + new(b"secret", body, sha256).hexdigest()
+    reply = requests.post(url, data=body, headers={**headers, "X-Hub-Signature-256": signature})
+    assert reply.json()["triggered"] == ["Bar"]
+
+    watcher.loader.run_configs = lambda configs: {"error": False}
+    watcher.pop_due(now=float("inf"))
+    watcher.schedule(name="Bar", due=0)
+    watcher.run_due()
+    assert watcher.loader.tag_cache.is_expired(key) == True